@@ -0,0 +1,276 @@
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+
+from benchmarks.synthetic import generate_audio_files, generate_library, song_rows
+from src.logic.database import Database
+
+SEARCH_QUERIES = ["lo", "love", "night dre", "artist 12", "café", "nino", "rock", "zzzz"]
+
+
+def measure(fn: Callable[[], object], repeat: int) -> dict:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {
+        "runs": repeat,
+        "min_ms": round(timings[0], 4),
+        "median_ms": round(statistics.median(timings), 4),
+        "p95_ms": round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 4),
+    }
+
+
+def bench_writes(workdir: str, repeat: int, files: int) -> dict:
+    results = {}
+    database = Database(os.path.join(workdir, "writes.db"))
+    rows = iter(song_rows(repeat * 2, seed=1))
+    results["add_song"] = measure(lambda: database.add_song(*next(rows)), repeat)
+
+    batches = iter(song_rows(repeat * 1000, seed=2)[i::repeat] for i in range(repeat))
+    results["add_songs_1000"] = measure(lambda: database.add_songs(next(batches)), repeat)
+
+    if files:
+        from src.logic.library_import import import_files
+
+        paths = generate_audio_files(os.path.join(workdir, "audio"), files)
+        runs = min(repeat, 3)
+        databases = [Database(os.path.join(workdir, f"import{run}.db")) for run in range(runs)]
+        targets = iter(databases)
+        results[f"import_files_{files}"] = measure(lambda: import_files(next(targets), paths), runs)
+        for target in databases:
+            target.close()
+    database.close()
+    return results
+
+
+def bench_library(workdir: str, size: int, repeat: int) -> dict:
+    results = {}
+    db_path = os.path.join(workdir, f"library_{size}.db")
+    start = time.perf_counter()
+    generate_library(db_path, size).close()
+    results["generate_library"] = {"runs": 1, "median_ms": round((time.perf_counter() - start) * 1000, 4)}
+
+    database = Database(db_path)
+    rng = random.Random(0)
+    playlist_ids = [row[0] for row in database.get_playlists()]
+
+    for query in SEARCH_QUERIES:
+        results[f"search_songs[{query}]"] = measure(lambda: database.search_songs(query), repeat)
+    results["get_playlist_songs"] = measure(
+        lambda: database.get_playlist_songs(rng.choice(playlist_ids)), repeat
+    )
+    results["get_songs_page"] = measure(lambda: database.get_songs_page(rng.randint(0, size), 500), repeat)
+    results["get_statistics"] = measure(database.get_statistics, repeat)
+
+    from src.logic.playlist_export import export_library, export_playlist
+    from src.logic.playlist_import import import_playlist
+
+    export_path = os.path.join(workdir, "playlist.json")
+    results["export_playlist"] = measure(
+        lambda: export_playlist(database, export_path, rng.choice(playlist_ids)), repeat
+    )
+    results["export_all_playlists"] = measure(
+        lambda: export_playlist(database, os.path.join(workdir, "playlists.jsonl")), 1
+    )
+    results["export_library"] = measure(
+        lambda: export_library(database, os.path.join(workdir, "library.jsonl")), 1
+    )
+
+    entries = [{"title": s[1], "artist": s[2]} for s in database.get_songs_page(0, min(size, 5000))]
+    with open(export_path, "w", encoding="utf-8") as f:
+        json.dump(entries, f)
+    names = iter(range(repeat))
+    results[f"import_playlist_{len(entries)}"] = measure(
+        lambda: import_playlist(database, export_path, f"Imported {next(names)}"), min(repeat, 5)
+    )
+
+    results.update(bench_library_view(database, repeat))
+    results.update(bench_api(database, repeat))
+    database.close()
+    results.update(bench_startup(db_path, min(repeat, 5)))
+    return results
+
+
+def bench_api(database: Database, repeat: int) -> dict:
+    import http.client
+    from concurrent.futures import ThreadPoolExecutor
+    from src.logic.api_server import ApiServer
+
+    rng = random.Random(0)
+    song_ids = [song[0] for song in database.get_songs_page(0, 5000)]
+    playlist_ids = [row[0] for row in database.get_playlists()]
+    server = ApiServer(database, port=0)
+    server.start()
+
+    def get(connection: http.client.HTTPConnection, path: str) -> None:
+        connection.request("GET", path)
+        connection.getresponse().read()
+
+    def client(_) -> None:
+        connection = http.client.HTTPConnection(server.host, server.port)
+        for _ in range(25):
+            get(connection, f"/songs/{rng.choice(song_ids)}")
+        connection.close()
+
+    results = {}
+    connection = http.client.HTTPConnection(server.host, server.port)
+    try:
+        results["api_song"] = measure(lambda: get(connection, f"/songs/{rng.choice(song_ids)}"), repeat)
+        results["api_search"] = measure(lambda: get(connection, "/songs?q=love&limit=50"), repeat)
+        results["api_playlist"] = measure(lambda: get(connection, f"/playlists/{rng.choice(playlist_ids)}"), repeat)
+        # 8 keep-alive clients, 25 requests each
+        with ThreadPoolExecutor(8) as pool:
+            results["api_concurrent_200"] = measure(lambda: list(pool.map(client, range(8))), min(repeat, 5))
+    finally:
+        connection.close()
+        server.close()
+    return results
+
+
+def bench_library_view(database: Database, repeat: int) -> dict:
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    try:
+        from PyQt6.QtWidgets import QApplication, QListView
+        from src.ui.library_model import LibraryModel
+        from src.ui.query_runner import QueryRunner
+    except ImportError as e:
+        return {"library_refresh": {"skipped": str(e)}}
+
+    app = QApplication.instance() or QApplication([])
+    queries = QueryRunner(database)
+    model = LibraryModel(queries)
+    view = QListView()
+    view.setUniformItemSizes(True)
+    view.setModel(model)
+    view.resize(400, 600)
+    view.show()
+
+    def refresh() -> None:
+        model.show_library()
+        while model.loading: #The first page arrives from the query thread
+            app.processEvents()
+        app.processEvents()
+
+    def search() -> None:
+        model.show_songs(database.search_songs("love"))
+        app.processEvents()
+
+    results = {
+        "library_refresh": measure(refresh, repeat),
+        "library_search_refresh": measure(search, repeat),
+    }
+    view.close()
+    queries.close()
+    return results
+
+
+def bench_startup(db_path: str, repeat: int) -> dict:
+    # Time from constructing the window to the library being usable
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    try:
+        from PyQt6.QtWidgets import QApplication
+        import PyQt6.QtMultimedia  # noqa: F401
+        from src.logic import startup
+        from src.ui.main_window import MainWindow
+    except ImportError as e:
+        return {"startup": {"skipped": str(e)}}
+
+    app = QApplication.instance() or QApplication([])
+    runs = {}
+    for _ in range(repeat):
+        startup.reset()
+        window = MainWindow(db_path)
+        window.show()
+        while "library shown" not in startup.phases():
+            app.processEvents()
+        for phase, elapsed_ms in startup.phases().items():
+            runs.setdefault(phase, []).append(elapsed_ms)
+        window.close()
+    return {
+        f"startup[{phase}]": {"runs": len(timings), "median_ms": round(statistics.median(timings), 4)}
+        for phase, timings in runs.items()
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    # Returns a line for every timing that got slower than threshold x baseline
+    regressions = []
+    for size, metrics in results["sizes"].items():
+        for name, stats in metrics.items():
+            before = baseline.get("sizes", {}).get(size, {}).get(name, {})
+            if "median_ms" not in stats or "median_ms" not in before or before["median_ms"] <= 0:
+                continue
+            ratio = stats["median_ms"] / before["median_ms"]
+            stats["baseline_ratio"] = round(ratio, 3)
+            if ratio > threshold:
+                regressions.append(
+                    f"{size} {name}: {before['median_ms']:.3f} ms -> {stats['median_ms']:.3f} ms ({ratio:.2f}x)"
+                )
+    return regressions
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Spoopify benchmarks")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000],
+                        help="synthetic library sizes, e.g. 10000 100000 1000000")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--files", type=int, default=200, help="synthetic audio files to import")
+    parser.add_argument("--output", help="write JSON results here instead of stdout")
+    parser.add_argument("--baseline", help="JSON results to compare against")
+    parser.add_argument("--threshold", type=float, default=1.25,
+                        help="fail when a median is this many times slower than the baseline")
+    parser.add_argument("--workdir", help="keep generated data here instead of a temp dir")
+    args = parser.parse_args(argv)
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="spoopify-bench-")
+    os.makedirs(workdir, exist_ok=True)
+    results = {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "sizes": {},
+    }
+    try:
+        results["sizes"]["writes"] = bench_writes(workdir, args.repeat, args.files)
+        for size in args.sizes:
+            results["sizes"][str(size)] = bench_library(workdir, size, args.repeat)
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        results["regressions"] = regressions
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    for line in regressions:
+        print(f"REGRESSION {line}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+import os
+import random
+import struct
+import time
+import wave
+from src.logic.database import Database
+
+GENRES = [
+    "Rock", "Pop", "Jazz", "Hip-Hop", "Electronic", "Classical", "Metal",
+    "Folk", "Blues", "Reggae", "Indian Rap", "Chalga", "Unknown Genre",
+]
+WORDS = [
+    "love", "night", "café", "niño", "fire", "dream", "river", "ghost", "summer",
+    "heart", "city", "blue", "road", "light", "shadow", "gold", "rain", "über",
+    "dance", "storm", "moon", "star", "silence", "echo", "wild", "home", "zero",
+]
+
+# One silent MPEG-1 Layer III frame (128 kbit/s, 44.1 kHz, 417 bytes)
+MP3_FRAME = b"\xff\xfb\x90\x64" + bytes(413)
+
+
+def zipf_weights(count: int, exponent: float = 1.1) -> list[float]:
+    return [1.0 / (rank ** exponent) for rank in range(1, count + 1)]
+
+
+def _title(rng: random.Random) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 4))).title()
+
+
+def song_rows(count: int, seed: int = 0) -> list[tuple[str, str, str, str]]:
+    # Artist popularity is skewed: a few artists own most of the songs
+    rng = random.Random(seed)
+    artists = [f"Artist {i}" for i in range(max(1, count // 10))]
+    artist_weights = zipf_weights(len(artists), 0.8)
+    picked = rng.choices(artists, artist_weights, k=count)
+    return [
+        (_title(rng), artist, rng.choice(GENRES), f"/synthetic/{artist}/{i:07d}.mp3")
+        for i, artist in enumerate(picked)
+    ]
+
+
+def generate_library(
+    db_path: str,
+    songs: int,
+    playlists: int | None = None,
+    plays: int | None = None,
+    seed: int = 0,
+) -> Database:
+    # Builds a library of `songs` songs with `playlists` playlists
+    # (songs // 50 by default, 10-200 entries each) and `plays` plays
+    # (2 per song by default) skewed towards a few hits over 90 days
+    rng = random.Random(seed)
+    database = Database(db_path)
+    rows = song_rows(songs, seed)
+    for start in range(0, len(rows), 50_000):
+        database.add_songs(rows[start:start + 50_000])
+
+    if playlists is None:
+        playlists = max(10, songs // 50)
+    for number in range(playlists):
+        size = rng.randint(10, 200)
+        database.create_playlist(f"Playlist {number}", [rng.randint(1, songs) for _ in range(size)])
+
+    if plays is None:
+        plays = songs * 2
+    song_ids = list(range(1, songs + 1))
+    rng.shuffle(song_ids)
+    weights = zipf_weights(songs)
+    now = time.time()
+    for start in range(0, plays, 100_000):
+        batch = min(100_000, plays - start)
+        picked = rng.choices(song_ids, weights, k=batch)
+        database.record_plays([(song_id, int(now - rng.random() * 90 * 86400)) for song_id in picked])
+    return database
+
+
+def write_mp3(path: str, title: str, artist: str, genre: str, frames: int = 40) -> None:
+    from mutagen.easyid3 import EasyID3
+    from mutagen.id3 import ID3
+
+    with open(path, "wb") as f:
+        f.write(MP3_FRAME * frames)
+    ID3().save(path)
+    tags = EasyID3(path)
+    tags["title"] = title
+    tags["artist"] = artist
+    tags["genre"] = genre
+    tags.save()
+
+
+def write_wav(path: str, title: str, artist: str, genre: str, seconds: float = 0.5) -> None:
+    from mutagen.id3 import TCON, TIT2, TPE1
+    from mutagen.wave import WAVE
+
+    with wave.open(path, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(8000)
+        f.writeframes(struct.pack("<h", 0) * int(8000 * seconds))
+    audio = WAVE(path)
+    audio.add_tags()
+    audio.tags.add(TIT2(encoding=3, text=title))
+    audio.tags.add(TPE1(encoding=3, text=artist))
+    audio.tags.add(TCON(encoding=3, text=genre))
+    audio.save()
+
+
+def generate_audio_files(directory: str, count: int, seed: int = 0) -> list[str]:
+    # Every fourth file is a WAV, the rest are MP3s, spread over artist folders
+    rng = random.Random(seed)
+    paths = []
+    for number, (title, artist, genre, _) in enumerate(song_rows(count, seed)):
+        folder = os.path.join(directory, artist)
+        os.makedirs(folder, exist_ok=True)
+        if number % 4 == 3:
+            path = os.path.join(folder, f"{number:06d}.wav")
+            write_wav(path, title, artist, genre)
+        else:
+            path = os.path.join(folder, f"{number:06d}.mp3")
+            write_mp3(path, title, artist, genre, frames=rng.randint(20, 60))
+        paths.append(path)
+    return paths
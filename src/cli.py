@@ -0,0 +1,278 @@
+import argparse
+import sys
+
+# Headless entry point: python -m src <command>. Only argparse is imported
+# up front; each command imports what it needs, so nothing here loads Qt
+# or mutagen unless the command actually reads tags or opens the window.
+
+DEFAULT_DB = "music_player.db"
+
+
+def _open_database(args):
+    from src.logic.database import Database
+
+    return Database(args.db)
+
+
+def _print_progress(done: int, total: int) -> None:
+    print(f"\r{done}/{total}", end="", file=sys.stderr, flush=True)
+    if done == total:
+        print(file=sys.stderr)
+
+
+def _find_playlist(database, name: str) -> int | None:
+    return next((playlist_id for playlist_id, playlist_name in database.get_playlists() if playlist_name == name), None)
+
+
+def cmd_scan(args, database) -> int:
+    from src.logic.scanner import rescan_watch_folders, scan_folder
+
+    progress = None if args.quiet else _print_progress
+    if args.folders:
+        for folder in args.folders:
+            database.add_watch_folder(folder)
+            result = scan_folder(database, folder, progress=progress)
+            print(f"{folder}: {result.added} added, {result.updated} updated, "
+                  f"{result.removed} removed, {result.unchanged} unchanged")
+    else:
+        result = rescan_watch_folders(database, progress=progress)
+        print(f"{result.added} added, {result.updated} updated, "
+              f"{result.removed} removed, {result.unchanged} unchanged")
+    return 0
+
+
+def cmd_import(args, database) -> int:
+    from src.logic.library_import import import_files
+
+    added = import_files(database, args.files, progress=None if args.quiet else _print_progress)
+    print(f"{added} songs added")
+    return 0
+
+
+def cmd_dedupe(args, database) -> int:
+    from src.logic.dedupe import find_duplicates, merge_duplicates
+
+    result = find_duplicates(database, workers=args.workers)
+    print(f"{result.hashed} files hashed, {result.fully_hashed} fully, {result.missing} missing")
+    for group in result.groups:
+        print(f"{group[0].title} - {group[0].artist}")
+        for song in group:
+            print(f"    {song.id}\t{song.play_count}\t{song.file_path}")
+    if args.merge and result.groups:
+        print(f"{merge_duplicates(database, result.groups)} duplicates merged")
+    return 0
+
+
+def cmd_loudness(args, database) -> int:
+    from src.logic.loudness import analyze_library
+
+    result = analyze_library(database, workers=args.workers, progress=None if args.quiet else _print_progress)
+    print(f"{result.analyzed} analyzed, {result.failed} could not be decoded, {result.missing} missing")
+    if result.no_decoder:
+        print(f"{result.no_decoder} skipped, install ffmpeg to analyze them")
+    return 0
+
+
+def cmd_search(args, database) -> int:
+    for song_id, title, artist, genre, file_path, play_count in database.search_songs(args.query, limit=args.limit):
+        print(f"{song_id}\t{title}\t{artist}\t{genre}\t{play_count}\t{file_path}")
+    return 0
+
+
+def cmd_radio(args, database) -> int:
+    from src.logic.radio import build_radio
+
+    for song in build_radio(database, args.song_id, length=args.limit):
+        print(f"{song.id}\t{song.title}\t{song.artist}\t{song.genre}\t{song.play_count}\t{song.file_path}")
+    return 0
+
+
+def cmd_albums(args, database) -> int:
+    from src.logic.tags import format_duration
+
+    for album, artist, year, tracks, duration in database.get_albums():
+        print(f"{artist}\t{album}\t{year or ''}\t{tracks}\t{format_duration(duration)}")
+    return 0
+
+
+def cmd_stats(args, database) -> int:
+    print(database.get_statistics(limit=args.limit))
+    return 0
+
+
+def cmd_playlists(args, database) -> int:
+    for playlist_id, name in database.get_playlists():
+        print(f"{playlist_id}\t{name}\t{database.get_playlist_size(playlist_id)}")
+    for playlist_id, name, definition in database.get_smart_playlists():
+        rules = "; ".join(line.strip() for line in definition.splitlines() if line.strip())
+        print(f"{playlist_id}\t{name}\tsmart\t{rules}")
+    return 0
+
+
+def cmd_smart_create(args, database) -> int:
+    if not database.create_smart_playlist(args.name, "\n".join(args.rules)):
+        print(f"Smart playlist {args.name} already exists", file=sys.stderr)
+        return 1
+    return 0
+
+
+def cmd_smart_show(args, database) -> int:
+    playlist = [pid for pid, name, _ in database.get_smart_playlists() if name == args.name]
+    if not playlist:
+        print(f"No smart playlist named {args.name}", file=sys.stderr)
+        return 1
+    for song in database.get_smart_playlist_songs(playlist[0]):
+        print(f"{song.id}\t{song.title}\t{song.artist}\t{song.genre}\t{song.play_count}\t{song.file_path}")
+    return 0
+
+
+def cmd_playlist_import(args, database) -> int:
+    import os
+    from src.logic.playlist_import import import_playlist
+
+    name = args.name or os.path.splitext(os.path.basename(args.file))[0]
+    result = import_playlist(database, args.file, name, fuzzy=not args.exact)
+    if result.matched + result.fuzzy == 0:
+        print("No matching songs found in the library", file=sys.stderr)
+        return 1
+    for existing in result.existing:
+        print(f"Playlist {existing} already exists", file=sys.stderr)
+    if not result.created:
+        return 1
+    print(f"Playlist {', '.join(result.playlists)}: {result.matched} matched, "
+          f"{result.fuzzy} matched approximately, {result.missing} not found")
+    return 0
+
+
+def cmd_playlist_export(args, database) -> int:
+    from src.logic.playlist_export import export_playlist
+
+    playlist_id = None
+    if args.name is not None:
+        playlist_id = _find_playlist(database, args.name)
+        if playlist_id is None:
+            print(f"No playlist named {args.name}", file=sys.stderr)
+            return 1
+    print(f"{export_playlist(database, args.file, playlist_id)} entries exported")
+    return 0
+
+
+def cmd_export_library(args, database) -> int:
+    from src.logic.playlist_export import export_library
+
+    print(f"{export_library(database, args.file)} entries exported")
+    return 0
+
+
+def cmd_serve(args, database) -> int:
+    import threading
+    from src.logic.api_server import ApiServer
+
+    server = ApiServer(database, host=args.host, port=args.port, allow_remote=args.allow_remote)
+    server.start()
+    print(f"Serving the library API on http://{server.host}:{server.port}, Ctrl+C to stop", file=sys.stderr)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m src", description="Spoopify")
+    parser.add_argument("--db", default=DEFAULT_DB, help=f"library database (default: {DEFAULT_DB})")
+    commands = parser.add_subparsers(dest="command", metavar="command")
+
+    commands.add_parser("gui", help="open the player window (default)")
+
+    scan = commands.add_parser("scan", help="add and scan folders, or rescan all watched folders")
+    scan.add_argument("folders", nargs="*")
+    scan.add_argument("-q", "--quiet", action="store_true")
+    scan.set_defaults(handler=cmd_scan)
+
+    add = commands.add_parser("import", help="add audio files to the library")
+    add.add_argument("files", nargs="+")
+    add.add_argument("-q", "--quiet", action="store_true")
+    add.set_defaults(handler=cmd_import)
+
+    dedupe = commands.add_parser("dedupe", help="find songs with identical file content")
+    dedupe.add_argument("--merge", action="store_true", help="merge duplicates into the oldest copy")
+    dedupe.add_argument("--workers", type=int, help="hashing processes (default: one per CPU)")
+    dedupe.set_defaults(handler=cmd_dedupe)
+
+    loudness = commands.add_parser("loudness", help="analyze loudness for volume normalization")
+    loudness.add_argument("--workers", type=int, help="analysis processes (default: one per CPU)")
+    loudness.add_argument("-q", "--quiet", action="store_true")
+    loudness.set_defaults(handler=cmd_loudness)
+
+    search = commands.add_parser("search", help="search the library")
+    search.add_argument("query")
+    search.add_argument("-n", "--limit", type=int, default=50)
+    search.set_defaults(handler=cmd_search)
+
+    radio = commands.add_parser("radio", help="list songs to play after a song, by id")
+    radio.add_argument("song_id", type=int)
+    radio.add_argument("-n", "--limit", type=int, default=50)
+    radio.set_defaults(handler=cmd_radio)
+
+    albums = commands.add_parser("albums", help="list albums with track count and length")
+    albums.set_defaults(handler=cmd_albums)
+
+    stats = commands.add_parser("stats", help="print listening statistics")
+    stats.add_argument("-n", "--limit", type=int, default=3)
+    stats.set_defaults(handler=cmd_stats)
+
+    playlists = commands.add_parser("playlists", help="list playlists")
+    playlists.set_defaults(handler=cmd_playlists)
+
+    smart_create = commands.add_parser("smart-create", help="create a smart playlist from rules")
+    smart_create.add_argument("name")
+    smart_create.add_argument("rules", nargs="+", help='e.g. "genre = Rock" "plays >= 5" "limit 100"')
+    smart_create.set_defaults(handler=cmd_smart_create)
+
+    smart_show = commands.add_parser("smart-show", help="list the songs of a smart playlist")
+    smart_show.add_argument("name")
+    smart_show.set_defaults(handler=cmd_smart_show)
+
+    playlist_import = commands.add_parser("playlist-import", help="import a .json/.jsonl/.m3u/.m3u8/.xspf playlist")
+    playlist_import.add_argument("file")
+    playlist_import.add_argument("--name", help="playlist name (default: file name)")
+    playlist_import.add_argument("--exact", action="store_true", help="skip approximate matching")
+    playlist_import.set_defaults(handler=cmd_playlist_import)
+
+    playlist_export = commands.add_parser("playlist-export", help="export one playlist, or all of them")
+    playlist_export.add_argument("file", help=".json, .jsonl or .m3u8")
+    playlist_export.add_argument("--name", help="playlist to export (default: all)")
+    playlist_export.set_defaults(handler=cmd_playlist_export)
+
+    library_export = commands.add_parser("export-library", help="export the whole library")
+    library_export.add_argument("file", help=".json, .jsonl or .m3u8")
+    library_export.set_defaults(handler=cmd_export_library)
+
+    serve = commands.add_parser("serve", help="serve the library API without the player")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8765)
+    serve.add_argument("--allow-remote", action="store_true",
+                       help="allow a --host other than localhost; the API has no authentication")
+    serve.set_defaults(handler=cmd_serve)
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.command in (None, "gui"):
+        from src.main import main as gui_main
+
+        gui_main(args.db)
+        return 0
+
+    database = _open_database(args)
+    try:
+        return args.handler(args, database)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        database.close()
@@ -0,0 +1,602 @@
+import asyncio
+import base64
+import hashlib
+import json
+import re
+import struct
+import threading
+from concurrent.futures import Future
+from datetime import date
+from http import HTTPStatus
+from typing import NamedTuple
+from urllib.parse import parse_qsl, urlsplit
+from src.logic.async_database import AsyncDatabase
+from src.logic.catalog import Song
+from src.logic.database import Database
+
+# Local HTTP/JSON API and WebSocket event stream for scripts and dashboards.
+#
+#   GET    /songs?q=<text>&limit=<n>         search, or /songs?after=<id> pages
+#   GET    /songs/<id>   /songs/<id>/radio?limit=<n>
+#   GET    /playlists                        regular and smart playlists
+#   POST   /playlists {"name", "song_ids"}
+#   GET    /playlists/<id>   PUT {"name"?, "song_ids"?}   DELETE
+#   POST   /smart-playlists {"name", "definition"}
+#   GET    /smart-playlists/<id>   DELETE
+#   GET    /stats?limit=<n>
+#   GET    /player   POST /player/play {"row"?}, pause, stop, next, previous
+#   PUT    /player/volume {"volume"}
+#   GET    /queue    POST /queue {"song_ids", "next"?, "play"?}
+#   GET    /events                           WebSocket, player snapshots
+#
+# The server runs its own asyncio loop on a background thread. Reads go
+# through AsyncDatabase, whose workers each take one of the database's
+# read-only connections, so identical concurrent requests are coalesced
+# and nothing waits on the GUI. Writes run on the loop's default executor.
+#
+# Player endpoints need a controller (see src/ui/remote_control.py):
+# controller.state() returns a dict and may be called from any thread,
+# controller.call(command, *args) returns a Future completed on the GUI
+# thread. Without one they answer 503.
+#
+# Requests whose Host or Origin isn't local are refused, so web pages
+# can't reach the API through the browser (DNS rebinding, cross-site POST).
+# Binding to any other address needs allow_remote=True, which also drops
+# the Host check (remote clients name this machine however they reach it);
+# the API has no authentication, so only do that on a trusted network.
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+READERS = 4
+LOCAL_HOSTS = ("localhost", "127.0.0.1", "::1")
+MAX_HEADER = 16 * 1024
+MAX_BODY = 1024 * 1024
+MAX_LIMIT = 500
+CONTROL_TIMEOUT = 5.0
+EVENT_BACKLOG = 16
+PLAYER_COMMANDS = ("play", "pause", "stop", "next", "previous")
+
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+OP_TEXT, OP_CLOSE, OP_PING, OP_PONG = 0x1, 0x8, 0x9, 0xA
+
+
+class ApiError(Exception):
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class Request(NamedTuple):
+    method: str
+    path: str
+    query: dict[str, str]
+    headers: dict[str, str]
+    body: bytes
+    keep_alive: bool
+
+    def json_body(self) -> dict:
+        try:
+            body = json.loads(self.body or b"{}")
+        except ValueError:
+            raise ApiError(HTTPStatus.BAD_REQUEST, "Body is not valid JSON")
+        if not isinstance(body, dict):
+            raise ApiError(HTTPStatus.BAD_REQUEST, "Body must be a JSON object")
+        return body
+
+
+def song_json(song: tuple) -> dict:
+    return dict(zip(Song._fields, song))
+
+
+def _encode(payload) -> bytes:
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _response(status: int, payload, keep_alive: bool) -> bytes:
+    body = _encode(payload)
+    head = (
+        f"HTTP/1.1 {int(status)} {HTTPStatus(status).phrase}\r\n"
+        "Content-Type: application/json; charset=utf-8\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+    )
+    return head.encode("latin-1") + body
+
+
+def _frame(opcode: int, payload: bytes) -> bytes:
+    # Unfragmented, unmasked server frame
+    length = len(payload)
+    if length < 126:
+        header = struct.pack("!BB", 0x80 | opcode, length)
+    elif length < 1 << 16:
+        header = struct.pack("!BBH", 0x80 | opcode, 126, length)
+    else:
+        header = struct.pack("!BBQ", 0x80 | opcode, 127, length)
+    return header + payload
+
+
+def _int_param(request: Request, name: str, default: int, maximum: int | None = None) -> int:
+    value = request.query.get(name)
+    if value is None:
+        return default
+    if not value.isdigit():
+        raise ApiError(HTTPStatus.BAD_REQUEST, f"{name} must be a whole number")
+    return min(int(value), maximum) if maximum is not None else int(value)
+
+
+def _field(body: dict, name: str, kind: type, required: bool = True):
+    value = body.get(name)
+    if value is None and not required:
+        return None
+    # bool is an int, but never a valid id or row
+    if not isinstance(value, kind) or (kind is int and isinstance(value, bool)):
+        raise ApiError(HTTPStatus.BAD_REQUEST, f"{name} must be a {kind.__name__}")
+    return value
+
+
+def _song_ids(body: dict, required: bool = True) -> list[int] | None:
+    song_ids = _field(body, "song_ids", list, required)
+    if song_ids is not None and not all(isinstance(i, int) and not isinstance(i, bool) for i in song_ids):
+        raise ApiError(HTTPStatus.BAD_REQUEST, "song_ids must be a list of song ids")
+    return song_ids
+
+
+def _hostname(value: str) -> str | None:
+    try:
+        return urlsplit(value if "//" in value else f"//{value}").hostname
+    except ValueError:
+        return None
+
+
+# Database work run on the pools; each function takes the database first
+
+def _require_songs(database: Database, song_ids: list[int]) -> list[Song]:
+    songs = {song.id: song for song in database.get_songs(song_ids)}
+    missing = [song_id for song_id in song_ids if song_id not in songs]
+    if missing:
+        raise ApiError(HTTPStatus.BAD_REQUEST, f"Unknown song ids: {missing[:10]}")
+    return [songs[song_id] for song_id in song_ids]
+
+
+def _require_playlist(database: Database, playlist_id: int, smart: bool = False) -> None:
+    if not database.playlist_exists(playlist_id, smart):
+        raise ApiError(HTTPStatus.NOT_FOUND, "No such playlist")
+
+
+def _list_playlists(database: Database) -> list[dict]:
+    playlists = [{"id": pid, "name": name, "smart": False} for pid, name in database.get_playlists()]
+    playlists += [
+        {"id": pid, "name": name, "smart": True, "definition": definition}
+        for pid, name, definition in database.get_smart_playlists()
+    ]
+    return playlists
+
+
+def _playlist_songs(database: Database, playlist_id: int) -> list[Song]:
+    _require_playlist(database, playlist_id)
+    return database.get_playlist_songs(playlist_id)
+
+
+def _smart_playlist_songs(database: Database, playlist_id: int) -> list[Song]:
+    _require_playlist(database, playlist_id, smart=True)
+    return database.get_smart_playlist_songs(playlist_id)
+
+
+def _create_playlist(database: Database, name: str, song_ids: list[int]) -> int:
+    _require_songs(database, song_ids)
+    if not database.create_playlist(name, song_ids):
+        raise ApiError(HTTPStatus.CONFLICT, f"Playlist {name} already exists")
+    return next(pid for pid, playlist_name in database.get_playlists() if playlist_name == name)
+
+
+def _update_playlist(database: Database, playlist_id: int, name: str | None, song_ids: list[int] | None) -> None:
+    _require_playlist(database, playlist_id)
+    if song_ids is not None:
+        _require_songs(database, song_ids)
+    if not database.update_playlist(playlist_id, name, song_ids):
+        raise ApiError(HTTPStatus.CONFLICT, f"Playlist {name} already exists")
+
+
+def _delete_playlist(database: Database, playlist_id: int, smart: bool) -> None:
+    _require_playlist(database, playlist_id, smart)
+    if smart:
+        database.delete_smart_playlist(playlist_id)
+    else:
+        database.delete_playlist(playlist_id)
+
+
+def _create_smart_playlist(database: Database, name: str, definition: str) -> int:
+    if not database.create_smart_playlist(name, definition): #ValueError for bad rules
+        raise ApiError(HTTPStatus.CONFLICT, f"Playlist {name} already exists")
+    return next(pid for pid, playlist_name, _ in database.get_smart_playlists() if playlist_name == name)
+
+
+def _statistics(database: Database, limit: int) -> dict:
+    month_start = date.today().replace(day=1)
+
+    def ranked(rows: list[tuple]) -> list[dict]:
+        return [{"name": name, "plays": plays} for name, plays in rows]
+
+    return {
+        "top_songs": [
+            {"title": title, "artist": artist, "plays": plays}
+            for title, artist, plays in database.get_top_songs(limit)
+        ],
+        "top_artists": ranked(database.get_top_artists(limit)),
+        "top_genres": ranked(database.get_top_genres(limit)),
+        "top_artists_this_month": ranked(database.get_top_artists(limit, month_start)),
+    }
+
+
+def _radio(database: Database, song_id: int, limit: int) -> list[Song]:
+    from src.logic.radio import build_radio
+
+    return build_radio(database, song_id, length=limit)
+
+
+class ApiServer:
+    def __init__(self, database: Database, controller=None, host: str = DEFAULT_HOST,
+                 port: int = DEFAULT_PORT, readers: int = READERS, allow_remote: bool = False) -> None:
+        if host not in LOCAL_HOSTS and not allow_remote:
+            raise ValueError(f"Refusing to serve on non-local address {host}, the API has no authentication (allow_remote / --allow-remote)")
+        self.database = database
+        self.controller = controller
+        self.host = host
+        self.port = port #The bound port once started, useful with port=0
+        self.queries = AsyncDatabase(database, workers=readers)
+        self._check_host = not allow_remote
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._stopping: asyncio.Event | None = None
+        self._thread: threading.Thread | None = None
+        self._error: OSError | None = None
+        self._clients: set[asyncio.Task] = set()
+        self._subscribers: set[asyncio.Queue] = set()
+        self._routes = [
+            (method, re.compile(pattern), handler) for method, pattern, handler in (
+                ("GET", r"/songs", self._songs),
+                ("GET", r"/songs/(\d+)", self._song),
+                ("GET", r"/songs/(\d+)/radio", self._radio),
+                ("GET", r"/playlists", self._playlists),
+                ("POST", r"/playlists", self._create_playlist),
+                ("GET", r"/playlists/(\d+)", self._playlist),
+                ("PUT", r"/playlists/(\d+)", self._update_playlist),
+                ("DELETE", r"/playlists/(\d+)", self._delete_playlist),
+                ("POST", r"/smart-playlists", self._create_smart_playlist),
+                ("GET", r"/smart-playlists/(\d+)", self._smart_playlist),
+                ("DELETE", r"/smart-playlists/(\d+)", self._delete_smart_playlist),
+                ("GET", r"/stats", self._stats),
+                ("GET", r"/player", self._player),
+                ("POST", rf"/player/(?:{'|'.join(PLAYER_COMMANDS)})", self._player_command),
+                ("PUT", r"/player/volume", self._volume),
+                ("GET", r"/queue", self._queue),
+                ("POST", r"/queue", self._enqueue),
+            )
+        ]
+
+    def start(self) -> None:
+        # Serves on a background thread; raises OSError when the port can't
+        # be bound
+        ready = threading.Event()
+        self._thread = threading.Thread(target=asyncio.run, args=(self._main(ready),), name="api-server", daemon=True)
+        self._thread.start()
+        ready.wait()
+        if self._error is not None:
+            self._thread.join()
+            self._thread = None
+            self.queries.close()
+            raise self._error
+
+    def close(self) -> None:
+        if self._thread is None:
+            return
+        self._loop.call_soon_threadsafe(self._stopping.set)
+        self._thread.join()
+        self._thread = None
+        self.queries.close()
+
+    def publish(self, event: str, data: dict) -> None:
+        # Sends {"event": event, **data} to every /events client. Thread-safe.
+        if self._loop is None:
+            return
+        try:
+            self._loop.call_soon_threadsafe(self._broadcast, {"event": event, **data})
+        except RuntimeError: #Loop already closed
+            pass
+
+    async def _main(self, ready: threading.Event) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._stopping = asyncio.Event()
+        try:
+            server = await asyncio.start_server(self._serve_client, self.host, self.port, limit=MAX_HEADER)
+        except OSError as e:
+            self._error = e
+            ready.set()
+            return
+        self.port = server.sockets[0].getsockname()[1]
+        ready.set()
+        async with server:
+            await self._stopping.wait()
+            server.close()
+            for task in self._clients:
+                task.cancel()
+            await asyncio.gather(*self._clients, return_exceptions=True)
+
+    # HTTP
+
+    async def _serve_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        task = asyncio.current_task()
+        self._clients.add(task)
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                    if request is None:
+                        break
+                    self._check_origin(request)
+                except ApiError as e:
+                    writer.write(_response(e.status, {"error": e.message}, False))
+                    await writer.drain()
+                    break
+                if request.path == "/events" and request.headers.get("upgrade", "").lower() == "websocket":
+                    await self._websocket(request, reader, writer)
+                    break
+                status, payload = await self._dispatch(request)
+                writer.write(_response(status, payload, request.keep_alive))
+                await writer.drain()
+                if not request.keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except asyncio.CancelledError:
+            #Closed by close(); not re-raised, asyncio.start_server reports a
+            #cancelled handler as an unhandled error on some Python versions
+            pass
+        finally:
+            self._clients.discard(task)
+            writer.close()
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Request | None:
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.IncompleteReadError: #Client closed the connection
+            return None
+        except asyncio.LimitOverrunError:
+            raise ApiError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, "Request header too large")
+
+        lines = head.decode("latin-1").split("\r\n")
+        parts = lines[0].split(" ")
+        if len(parts) != 3 or not parts[2].startswith("HTTP/1."):
+            raise ApiError(HTTPStatus.BAD_REQUEST, "Malformed request line")
+        method, target, version = parts
+        headers = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(":")
+            if name:
+                headers[name.strip().lower()] = value.strip()
+
+        if "transfer-encoding" in headers:
+            raise ApiError(HTTPStatus.NOT_IMPLEMENTED, "Chunked request bodies aren't supported")
+        length = headers.get("content-length", "0")
+        if not length.isdigit():
+            raise ApiError(HTTPStatus.BAD_REQUEST, "Invalid Content-Length")
+        if int(length) > MAX_BODY:
+            raise ApiError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Request body too large")
+        body = await reader.readexactly(int(length)) if int(length) else b""
+
+        connection = headers.get("connection", "").lower()
+        keep_alive = connection == "keep-alive" if version == "HTTP/1.0" else connection != "close"
+        url = urlsplit(target)
+        return Request(method, url.path.rstrip("/") or "/", dict(parse_qsl(url.query)), headers, body, keep_alive)
+
+    def _check_origin(self, request: Request) -> None:
+        if self._check_host and _hostname(request.headers.get("host", "")) not in LOCAL_HOSTS:
+            raise ApiError(HTTPStatus.FORBIDDEN, "Only local requests are accepted")
+        origin = request.headers.get("origin")
+        if origin is not None and _hostname(origin) not in LOCAL_HOSTS:
+            raise ApiError(HTTPStatus.FORBIDDEN, "Cross-origin requests are not accepted")
+
+    async def _dispatch(self, request: Request) -> tuple[int, object]:
+        allowed = False
+        for method, pattern, handler in self._routes:
+            match = pattern.fullmatch(request.path)
+            if match is None:
+                continue
+            if method != request.method:
+                allowed = True
+                continue
+            try:
+                return HTTPStatus.OK, await handler(request, *map(int, match.groups()))
+            except ApiError as e:
+                return e.status, {"error": e.message}
+            except ValueError as e:
+                return HTTPStatus.BAD_REQUEST, {"error": str(e)}
+            except Exception as e:
+                return HTTPStatus.INTERNAL_SERVER_ERROR, {"error": f"{type(e).__name__}: {e}"}
+        if allowed:
+            return HTTPStatus.METHOD_NOT_ALLOWED, {"error": f"{request.method} not allowed on {request.path}"}
+        return HTTPStatus.NOT_FOUND, {"error": f"No such endpoint: {request.path}"}
+
+    async def _read(self, query, *args):
+        return await asyncio.wrap_future(self.queries.submit(query, *args))
+
+    async def _write(self, function, *args):
+        return await asyncio.to_thread(function, self.database, *args)
+
+    async def _control(self, command: str, *args):
+        if self.controller is None:
+            raise ApiError(HTTPStatus.SERVICE_UNAVAILABLE, "No player attached")
+        future: Future = self.controller.call(command, *args)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), CONTROL_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise ApiError(HTTPStatus.GATEWAY_TIMEOUT, "The player didn't respond")
+
+    # Library
+
+    async def _songs(self, request: Request) -> list[dict]:
+        limit = _int_param(request, "limit", 50, MAX_LIMIT)
+        search = request.query.get("q")
+        if search:
+            songs = await self._read("search_songs", search, limit)
+        else:
+            songs = await self._read("get_songs_page", _int_param(request, "after", 0), limit)
+        return [song_json(song) for song in songs]
+
+    async def _song(self, request: Request, song_id: int) -> dict:
+        songs = await self._read("get_songs", (song_id,))
+        if not songs:
+            raise ApiError(HTTPStatus.NOT_FOUND, "No such song")
+        return song_json(songs[0])
+
+    async def _radio(self, request: Request, song_id: int) -> list[dict]:
+        await self._song(request, song_id)
+        songs = await self._read(_radio, song_id, _int_param(request, "limit", 50, MAX_LIMIT))
+        return [song_json(song) for song in songs]
+
+    async def _playlists(self, request: Request) -> list[dict]:
+        return await self._read(_list_playlists)
+
+    async def _playlist(self, request: Request, playlist_id: int) -> list[dict]:
+        return [song_json(song) for song in await self._read(_playlist_songs, playlist_id)]
+
+    async def _create_playlist(self, request: Request) -> dict:
+        body = request.json_body()
+        playlist_id = await self._write(_create_playlist, _field(body, "name", str), _song_ids(body))
+        return {"id": playlist_id}
+
+    async def _update_playlist(self, request: Request, playlist_id: int) -> dict:
+        body = request.json_body()
+        name, song_ids = _field(body, "name", str, required=False), _song_ids(body, required=False)
+        if name is None and song_ids is None:
+            raise ApiError(HTTPStatus.BAD_REQUEST, "Nothing to update, send name and/or song_ids")
+        await self._write(_update_playlist, playlist_id, name, song_ids)
+        return {"id": playlist_id}
+
+    async def _delete_playlist(self, request: Request, playlist_id: int) -> dict:
+        await self._write(_delete_playlist, playlist_id, False)
+        return {"id": playlist_id}
+
+    async def _create_smart_playlist(self, request: Request) -> dict:
+        body = request.json_body()
+        name, definition = _field(body, "name", str), _field(body, "definition", str)
+        return {"id": await self._write(_create_smart_playlist, name, definition)}
+
+    async def _smart_playlist(self, request: Request, playlist_id: int) -> list[dict]:
+        return [song_json(song) for song in await self._read(_smart_playlist_songs, playlist_id)]
+
+    async def _delete_smart_playlist(self, request: Request, playlist_id: int) -> dict:
+        await self._write(_delete_playlist, playlist_id, True)
+        return {"id": playlist_id}
+
+    async def _stats(self, request: Request) -> dict:
+        return await self._read(_statistics, _int_param(request, "limit", 10, MAX_LIMIT))
+
+    # Player
+
+    async def _player(self, request: Request) -> dict:
+        if self.controller is None:
+            raise ApiError(HTTPStatus.SERVICE_UNAVAILABLE, "No player attached")
+        return self.controller.state()
+
+    async def _player_command(self, request: Request) -> dict:
+        command = request.path.rsplit("/", 1)[1]
+        args = ()
+        if command == "play":
+            row = _field(request.json_body(), "row", int, required=False)
+            args = () if row is None else (row,)
+        await self._control(command, *args)
+        return self.controller.state()
+
+    async def _volume(self, request: Request) -> dict:
+        volume = _field(request.json_body(), "volume", int)
+        if not 0 <= volume <= 100:
+            raise ApiError(HTTPStatus.BAD_REQUEST, "volume must be between 0 and 100")
+        await self._control("volume", volume)
+        return self.controller.state()
+
+    async def _queue(self, request: Request) -> dict:
+        current, songs = await self._control("queue")
+        return {"current": current if current >= 0 else None, "songs": [song_json(song) for song in songs]}
+
+    async def _enqueue(self, request: Request) -> dict:
+        body = request.json_body()
+        song_ids = _song_ids(body)
+        after_current = bool(_field(body, "next", bool, required=False))
+        play = bool(_field(body, "play", bool, required=False))
+        if self.controller is None:
+            raise ApiError(HTTPStatus.SERVICE_UNAVAILABLE, "No player attached")
+        songs = await self._read(_require_songs, tuple(song_ids))
+        await self._control("enqueue", songs, after_current, play)
+        return {"queued": len(songs)}
+
+    # WebSocket events
+
+    async def _websocket(self, request: Request, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        key = request.headers.get("sec-websocket-key")
+        if request.method != "GET" or not key:
+            writer.write(_response(HTTPStatus.BAD_REQUEST, {"error": "Invalid WebSocket handshake"}, False))
+            await writer.drain()
+            return
+        accept = base64.b64encode(hashlib.sha1((key + WS_GUID).encode("latin-1")).digest()).decode("ascii")
+        writer.write((
+            "HTTP/1.1 101 Switching Protocols\r\n"
+            "Upgrade: websocket\r\n"
+            "Connection: Upgrade\r\n"
+            f"Sec-WebSocket-Accept: {accept}\r\n\r\n"
+        ).encode("latin-1"))
+
+        # Events are full snapshots, so a client that falls behind only
+        # misses intermediate ones (see _broadcast)
+        events: asyncio.Queue[bytes] = asyncio.Queue(EVENT_BACKLOG)
+        if self.controller is not None:
+            events.put_nowait(_frame(OP_TEXT, _encode({"event": "player", **self.controller.state()})))
+        self._subscribers.add(events)
+        sender = asyncio.create_task(self._send_events(events, writer))
+        try:
+            await self._read_frames(reader, writer)
+        finally:
+            self._subscribers.discard(events)
+            sender.cancel()
+
+    def _broadcast(self, event: dict) -> None:
+        frame = _frame(OP_TEXT, _encode(event))
+        for events in self._subscribers:
+            if events.full():
+                events.get_nowait()
+            events.put_nowait(frame)
+
+    @staticmethod
+    async def _send_events(events: asyncio.Queue, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                writer.write(await events.get())
+                await writer.drain()
+        except ConnectionError:
+            pass
+
+    @staticmethod
+    async def _read_frames(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        # Answers pings and the closing handshake; messages from the client
+        # are ignored
+        while True:
+            first, second = await reader.readexactly(2)
+            opcode, length = first & 0x0F, second & 0x7F
+            if length == 126:
+                length = struct.unpack("!H", await reader.readexactly(2))[0]
+            elif length == 127:
+                length = struct.unpack("!Q", await reader.readexactly(8))[0]
+            if not second & 0x80 or length > MAX_BODY: #Clients must mask their frames
+                writer.write(_frame(OP_CLOSE, struct.pack("!H", 1002)))
+                await writer.drain()
+                return
+            mask = await reader.readexactly(4)
+            data = await reader.readexactly(length)
+            payload = bytes(byte ^ mask[i % 4] for i, byte in enumerate(data)) if opcode >= OP_CLOSE else b""
+            if opcode == OP_CLOSE:
+                writer.write(_frame(OP_CLOSE, payload[:2]))
+                await writer.drain()
+                return
+            if opcode == OP_PING:
+                writer.write(_frame(OP_PONG, payload))
+                await writer.drain()
@@ -0,0 +1,137 @@
+import sqlite3
+import threading
+from collections import Counter
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+from src.logic.database import Database
+
+
+class QueryCancelled(Exception):
+    pass
+
+
+class AsyncDatabase:
+    # Runs Database reads on a small thread pool and returns futures.
+    #
+    # A query is a Database method name or a function called as
+    # fn(database, *args). Submitting a query identical to one still queued
+    # or running returns that query's future (coalescing). Queries on a
+    # channel supersede each other: submitting a new one cancels the
+    # previous one, or interrupts its SQLite read if it already runs.
+    # Superseded futures fail with QueryCancelled. `counters` tracks what
+    # happened to every request, for tuning.
+
+    COUNTERS = ("submitted", "coalesced", "completed", "failed", "cancelled", "interrupted", "dropped")
+
+    def __init__(self, database: Database, workers: int = 2) -> None:
+        self.database = database
+        self.counters = Counter(dict.fromkeys(self.COUNTERS, 0))
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="db-query")
+        self._lock = threading.Lock()
+        self._in_flight: dict[tuple, Future] = {}
+        self._channels: dict[str, Future] = {}
+        self._running: dict[Future, int] = {}
+        self._stale: set[Future] = set()
+
+    def submit(self, query: str | Callable, *args, channel: str | None = None) -> Future:
+        key = (query, args)
+        try:
+            hash(key)
+        except TypeError: #Unhashable arguments (lists) are never coalesced
+            key = None
+        with self._lock:
+            self.counters["submitted"] += 1
+            future = self._in_flight.get(key)
+            if future is not None and future not in self._stale:
+                self.counters["coalesced"] += 1
+            else:
+                future = Future()
+                if key is not None:
+                    self._in_flight[key] = future
+                self._pool.submit(self._run, future, query, args)
+            if channel is not None:
+                previous = self._channels.get(channel)
+                self._channels[channel] = future
+                if previous is not None and previous is not future:
+                    self._cancel(previous)
+        return future
+
+    def cancel(self, channel: str) -> None:
+        # Cancels the latest query on a channel, e.g. a search whose text
+        # was cleared
+        with self._lock:
+            future = self._channels.pop(channel, None)
+            if future is not None:
+                self._cancel(future)
+
+    def _cancel(self, future: Future) -> None:
+        # Caller holds the lock
+        if future.done() or future in self._stale:
+            return
+        if future.cancel():
+            self.counters["cancelled"] += 1
+            self._forget(future)
+            return
+        self._stale.add(future)
+        thread_id = self._running.get(future)
+        if thread_id is not None:
+            self.database.interrupt(thread_id)
+
+    def _forget(self, future: Future) -> None:
+        # Caller holds the lock
+        for key, pending in list(self._in_flight.items()):
+            if pending is future:
+                del self._in_flight[key]
+        for channel, pending in list(self._channels.items()):
+            if pending is future:
+                del self._channels[channel]
+
+    def _run(self, future: Future, query: str | Callable, args: tuple) -> None:
+        if not future.set_running_or_notify_cancel():
+            return
+        with self._lock:
+            self._running[future] = threading.get_ident()
+        try:
+            if callable(query):
+                result = query(self.database, *args)
+            else:
+                result = getattr(self.database, query)(*args)
+        except BaseException as e:
+            result, error = None, e
+        else:
+            error = None
+
+        # Unregistered under the lock, so _cancel can't interrupt the next
+        # query this thread picks up
+        with self._lock:
+            del self._running[future]
+            stale = future in self._stale
+            self._stale.discard(future)
+            self._forget(future)
+            if stale and isinstance(error, sqlite3.OperationalError):
+                self.counters["interrupted"] += 1
+            elif stale:
+                self.counters["dropped"] += 1
+            elif error is not None:
+                self.counters["failed"] += 1
+            else:
+                self.counters["completed"] += 1
+
+        if stale:
+            future.set_exception(QueryCancelled())
+        elif error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def report(self) -> str:
+        with self._lock:
+            counts = "  ".join(f"{name} {self.counters[name]}" for name in self.COUNTERS)
+        return f"Background queries: {counts}"
+
+    def close(self) -> None:
+        # Cancels queued queries, interrupts running ones and waits for them
+        with self._lock:
+            for future in list(self._channels.values()) + list(self._in_flight.values()):
+                self._cancel(future)
+        self._pool.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,150 @@
+import threading
+from collections import OrderedDict
+from collections.abc import Callable, Iterable
+from itertools import islice
+from typing import NamedTuple
+from src.logic.connection import ConnectionManager
+
+SONG_COLUMNS = "id, title, artist, genre, file_path, play_count"
+CATALOG_CAPACITY = 100_000
+_ID_CHUNK = 500
+
+
+class Song(NamedTuple):
+    # A tuple with __slots__ = (): no per-instance __dict__, and it still
+    # indexes like the rows it replaced
+    id: int
+    title: str
+    artist: str
+    genre: str
+    file_path: str
+    play_count: int
+
+
+class SongCatalog:
+    # In-process copy of the songs table.
+    #
+    # Consistency model: SQLite stays the source of truth. Every Database
+    # write updates the catalog right after its transaction commits, so
+    # readers in this process always see at least their own writes. Changes
+    # made by another process or Database instance are only picked up after
+    # invalidate().
+    #
+    # Libraries up to `capacity` songs are loaded whole on first use and
+    # served entirely from memory. Larger libraries keep only the `capacity`
+    # most recently used songs and read the rest from SQLite.
+
+    def __init__(self, connections: ConnectionManager, capacity: int = CATALOG_CAPACITY) -> None:
+        self._connections = connections
+        self.capacity = capacity
+        self._lock = threading.RLock()
+        self._songs: OrderedDict[int, Song] = OrderedDict()
+        self._loaded = False
+        self._complete = False
+        self._max_id = 0
+
+    def preload(self) -> None:
+        # Loads the catalog ahead of the first lookup, e.g. on a background thread
+        self._ensure_loaded()
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._songs.clear()
+            self._loaded = False
+            self._complete = False
+            self._max_id = 0
+
+    def _ensure_loaded(self) -> None:
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            with self._connections.read() as conn:
+                count, max_id = conn.execute("SELECT COUNT(*), COALESCE(MAX(id), 0) FROM songs").fetchone()
+                self._max_id = max_id
+                if count <= self.capacity:
+                    rows = conn.execute(f"SELECT {SONG_COLUMNS} FROM songs ORDER BY id")
+                    self._songs = OrderedDict((row[0], Song(*row)) for row in rows)
+                    self._complete = True
+            self._loaded = True
+
+    def _fetch(self, where: str, params: list) -> list[Song]:
+        with self._connections.read() as conn:
+            rows = conn.execute(f"SELECT {SONG_COLUMNS} FROM songs WHERE {where}", params)
+            return [Song(*row) for row in rows]
+
+    def _fetch_in(self, column: str, values: list) -> list[Song]:
+        songs = []
+        for start in range(0, len(values), _ID_CHUNK):
+            chunk = values[start:start + _ID_CHUNK]
+            placeholders = ", ".join("?" * len(chunk))
+            songs.extend(self._fetch(f"{column} IN ({placeholders})", chunk))
+        return songs
+
+    def _store(self, songs: Iterable[Song]) -> None:
+        # Caller holds the lock
+        for song in songs:
+            self._songs[song.id] = song
+            self._max_id = max(self._max_id, song.id)
+            if not self._complete:
+                self._songs.move_to_end(song.id)
+        if not self._complete:
+            while len(self._songs) > self.capacity:
+                self._songs.popitem(last=False)
+        elif len(self._songs) > self.capacity:
+            self._complete = False
+
+    def get_many(self, song_ids: Iterable[int]) -> list[Song]:
+        # Returns songs in the order of song_ids, skipping unknown ids
+        self._ensure_loaded()
+        song_ids = list(song_ids)
+        with self._lock:
+            if self._complete:
+                return [self._songs[i] for i in song_ids if i in self._songs]
+            # Hits are taken now: storing the fetched songs may evict them
+            found = {i: self._songs[i] for i in song_ids if i in self._songs}
+            missing = list({i for i in song_ids if i not in found})
+
+        if missing:
+            fetched = self._fetch_in("id", missing)
+            with self._lock:
+                self._store(fetched)
+            found.update((song.id, song) for song in fetched)
+        return [found[i] for i in song_ids if i in found]
+
+    def filter(self, predicate: Callable[[Song], bool], limit: int | None = None) -> list[Song] | None:
+        # Matching songs in id order, or None when the catalog doesn't hold
+        # the whole library and the caller has to ask SQLite instead
+        self._ensure_loaded()
+        with self._lock:
+            if not self._complete:
+                return None
+            songs = list(self._songs.values())
+        return list(islice((song for song in songs if predicate(song)), limit))
+
+    def songs_added(self) -> None:
+        # New rows always get ids above everything seen so far. A partial
+        # catalog doesn't need them until they are asked for.
+        if not self._loaded or not self._complete:
+            return
+        with self._lock:
+            self._store(self._fetch("id > ? ORDER BY id", [self._max_id]))
+
+    def songs_changed(self, file_paths: Iterable[str]) -> None:
+        if not self._loaded:
+            return
+        songs = self._fetch_in("file_path", list(file_paths))
+        with self._lock:
+            self._store(songs)
+
+    def songs_removed(self, song_ids: Iterable[int]) -> None:
+        with self._lock:
+            for song_id in song_ids:
+                self._songs.pop(song_id, None)
+
+    def play_count_added(self, song_id: int, count: int = 1) -> None:
+        with self._lock:
+            song = self._songs.get(song_id)
+            if song is not None:
+                self._songs[song_id] = song._replace(play_count=song.play_count + count)
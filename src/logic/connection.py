@@ -0,0 +1,124 @@
+import sqlite3
+import threading
+from collections.abc import Iterator
+from contextlib import contextmanager
+from src.logic import instrumentation
+
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -65536",
+    "PRAGMA mmap_size = 268435456",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA foreign_keys = ON",
+)
+
+
+class ConnectionManager:
+    # One locked writer running explicit transactions plus a pool of
+    # read-only connections that see committed data through WAL.
+    # In-memory databases can't be shared, so reads go through the writer.
+    # interrupt() aborts whatever a thread is reading right now.
+
+    def __init__(self, db_name: str, max_readers: int = 4, cached_statements: int = 256) -> None:
+        self.db_name = db_name
+        self.max_readers = max_readers
+        self.cached_statements = cached_statements
+        self._shared = db_name == ":memory:" or db_name == ""
+        self._write_lock = threading.RLock()
+        self._depth = 0
+        self._readers: list[sqlite3.Connection] = []
+        self._readers_lock = threading.Lock()
+        self._busy: dict[int, list[sqlite3.Connection]] = {}
+        self._closed = False
+        self._writer = self._open()
+
+    def _open(self, readonly: bool = False) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.db_name,
+            isolation_level=None,
+            check_same_thread=False,
+            cached_statements=self.cached_statements,
+            factory=instrumentation.TimedConnection if instrumentation.is_enabled() else sqlite3.Connection,
+        )
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        if readonly:
+            conn.execute("PRAGMA query_only = ON")
+        return conn
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        with self._write_lock:
+            if self._closed:
+                raise sqlite3.ProgrammingError("Database is closed")
+            if self._depth:
+                # Nested scope joins the transaction that is already open
+                self._depth += 1
+                try:
+                    yield self._writer
+                finally:
+                    self._depth -= 1
+                return
+
+            self._writer.execute("BEGIN IMMEDIATE")
+            self._depth = 1
+            try:
+                yield self._writer
+            except BaseException:
+                self._writer.execute("ROLLBACK")
+                raise
+            else:
+                self._writer.execute("COMMIT")
+            finally:
+                self._depth = 0
+
+    @contextmanager
+    def read(self) -> Iterator[sqlite3.Connection]:
+        if self._shared:
+            with self._write_lock:
+                yield self._writer
+            return
+
+        with self._readers_lock:
+            if self._closed:
+                raise sqlite3.ProgrammingError("Database is closed")
+            conn = self._readers.pop() if self._readers else None
+        if conn is None:
+            conn = self._open(readonly=True)
+        thread_id = threading.get_ident()
+        with self._readers_lock:
+            self._busy.setdefault(thread_id, []).append(conn)
+
+        try:
+            yield conn
+        finally:
+            with self._readers_lock:
+                busy = self._busy[thread_id]
+                busy.remove(conn)
+                if not busy:
+                    del self._busy[thread_id]
+                if self._closed or len(self._readers) >= self.max_readers:
+                    conn.close()
+                else:
+                    self._readers.append(conn)
+
+    def interrupt(self, thread_id: int) -> bool:
+        # The read fails with OperationalError("interrupted"). Returns False
+        # when that thread isn't inside read(). Writes are never interrupted.
+        with self._readers_lock:
+            busy = self._busy.get(thread_id, ())
+            for conn in busy:
+                conn.interrupt()
+            return bool(busy)
+
+    def close(self) -> None:
+        with self._write_lock, self._readers_lock:
+            if self._closed:
+                return
+            self._closed = True
+            for conn in self._readers:
+                conn.close()
+            self._readers.clear()
+            self._writer.execute("PRAGMA optimize")
+            self._writer.close()
@@ -1,165 +1,795 @@
+import json
+import os
+import re
 import sqlite3
+import time
+from datetime import date
+from collections.abc import Iterable, Iterator
+from src.logic.catalog import Song, SongCatalog
+from src.logic.connection import ConnectionManager
+from src.logic.migrations import SCHEMA_VERSION, migrate
+from src.logic.normalize import match_key
+from src.logic.smart_playlists import compile_playlist, parse_smart_playlist
+from src.logic.tags import TrackMetadata
+from src.logic.write_behind import WriteBehindQueue
+
+SEARCH_WORD = re.compile(r"\w+")
+SEARCH_CANDIDATES = 2000
+LIBRARY_COLUMNS = "id, title, artist, genre, file_path, play_count, album, track, year, duration"
+
+# Library orders and the columns they sort by. Each ends with id so the
+# tuple is unique and works as a keyset cursor; all have a matching index.
+SORT_ORDERS = {
+    "added": ("id",),
+    "album": ("album", "track", "id"),
+    "artist": ("artist_key", "album", "track", "id"),
+    "year": ("year", "album", "track", "id"),
+    "duration": ("duration", "id"),
+}
+
+FTS_TRIGGERS = (
+    """
+    CREATE TRIGGER IF NOT EXISTS songs_fts_insert AFTER INSERT ON songs BEGIN
+        INSERT INTO songs_fts (rowid, title, artist, genre)
+        VALUES (new.id, new.title, new.artist, new.genre);
+    END;
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS songs_fts_delete AFTER DELETE ON songs BEGIN
+        INSERT INTO songs_fts (songs_fts, rowid, title, artist, genre)
+        VALUES ('delete', old.id, old.title, old.artist, old.genre);
+    END;
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS songs_fts_update AFTER UPDATE OF title, artist, genre ON songs BEGIN
+        INSERT INTO songs_fts (songs_fts, rowid, title, artist, genre)
+        VALUES ('delete', old.id, old.title, old.artist, old.genre);
+        INSERT INTO songs_fts (rowid, title, artist, genre)
+        VALUES (new.id, new.title, new.artist, new.genre);
+    END;
+    """,
+)
 
 class Database:
     def __init__(self, db_name: str = "music_player.db") -> None:
         self.db_name = db_name
+        self._connections = ConnectionManager(db_name)
+        self.has_fts = False
         self._create_tables()
-    
-    def _get_connection(self) -> sqlite3.Connection:
-        return sqlite3.connect(self.db_name)
+        self.catalog = SongCatalog(self._connections)
+        self._plays = WriteBehindQueue(self.record_plays)
+
+    def close(self) -> None:
+        self._plays.close()
+        self._connections.close()
+
+    def flush(self) -> None:
+        self._plays.flush()
+
+    def interrupt(self, thread_id: int) -> bool:
+        # Aborts the read the given thread is running, see AsyncDatabase
+        return self._connections.interrupt(thread_id)
 
     def _create_tables(self) -> None:
-        query_songs = """
-        CREATE TABLE IF NOT EXISTS songs (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            title TEXT NOT NULL,
-            artist TEXT,
-            genre TEXT,
-            file_path TEXT NOT NULL UNIQUE,
-            play_count INTEGER DEFAULT 0
+        # An up-to-date database only needs two reads instead of a write
+        # transaction re-running every CREATE ... IF NOT EXISTS
+        with self._connections.read() as conn:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            has_fts = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'songs_fts'").fetchone()
+        if version == SCHEMA_VERSION and has_fts:
+            self.has_fts = True
+            return
+
+        with self._connections.transaction() as conn:
+            migrate(conn)
+            self.has_fts = self._create_search_index(conn)
+
+    def _create_search_index(self, conn: sqlite3.Connection) -> bool:
+        query_fts = """
+        CREATE VIRTUAL TABLE songs_fts USING fts5(
+            title, artist, genre,
+            content='songs',
+            content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2',
+            prefix='2 3'
         );
         """
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'songs_fts'"
+        ).fetchone()
+        if not exists:
+            try:
+                conn.execute(query_fts)
+            except sqlite3.OperationalError: #SQLite built without FTS5
+                return False
+            conn.execute("INSERT INTO songs_fts (songs_fts) VALUES ('rebuild')")
+        for trigger in FTS_TRIGGERS:
+            conn.execute(trigger)
+        return True
+    
+    def add_song(self, title: str, artist: str, genre: str, file_path: str) -> None:
+        self.add_songs([(title, artist, genre, file_path)])
 
-        query_playlists = """
-        CREATE TABLE IF NOT EXISTS playlists (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL UNIQUE
-        );
+    @staticmethod
+    def _with_match_keys(songs: Iterable[tuple]) -> Iterable[tuple]:
+        # Pads (title, artist, genre, file_path) rows to full TrackMetadata
+        for song in songs:
+            yield tuple(TrackMetadata(*song)) + (match_key(song[0]), match_key(song[1]))
+
+    def add_songs(self, songs: Iterable[tuple]) -> int:
+        # Rows are TrackMetadata or (title, artist, genre, file_path).
+        # Paths merged into another song (see merge_songs) are skipped.
+        query = """
+        INSERT OR IGNORE INTO songs (
+            title, artist, genre, file_path, album, duration, track, year, bitrate, title_key, artist_key, added_at
+        )
+        SELECT ?1, ?2, ?3, ?4, ?5, ?6, ?7, ?8, ?9, ?10, ?11, CAST(strftime('%s', 'now') AS INTEGER)
+        WHERE NOT EXISTS (SELECT 1 FROM song_aliases WHERE file_path = ?4)
         """
+        with self._connections.transaction() as conn:
+            # rowcount only counts the songs rows, total_changes would include
+            # what the search index triggers write
+            added = conn.executemany(query, self._with_match_keys(songs)).rowcount
+        if added:
+            self.catalog.songs_added()
+        return added
 
-        query_playlist_songs = """
-        CREATE TABLE IF NOT EXISTS playlist_songs (
-            playlist_id INTEGER,
-            song_id INTEGER,
-            FOREIGN KEY(playlist_id) REFERENCES playlists(id),
-            FOREIGN KEY(song_id) REFERENCES songs(id)
-        );
+    def save_scanned_songs(self, songs: Iterable[tuple[TrackMetadata, int, int]]) -> int:
+        # Rows are (metadata, size, mtime_ns). Inserts new songs, updates the
+        # tags of known ones and records the stat they were read at.
+        # Returns the number of new songs.
+        query_song = """
+        INSERT INTO songs (
+            title, artist, genre, file_path, album, duration, track, year, bitrate, title_key, artist_key, added_at
+        )
+        SELECT ?1, ?2, ?3, ?4, ?5, ?6, ?7, ?8, ?9, ?10, ?11, CAST(strftime('%s', 'now') AS INTEGER)
+        WHERE NOT EXISTS (SELECT 1 FROM song_aliases WHERE file_path = ?4)
+        ON CONFLICT(file_path) DO UPDATE SET
+            title = excluded.title,
+            artist = excluded.artist,
+            genre = excluded.genre,
+            album = excluded.album,
+            duration = excluded.duration,
+            track = excluded.track,
+            year = excluded.year,
+            bitrate = excluded.bitrate,
+            title_key = excluded.title_key,
+            artist_key = excluded.artist_key
         """
+        query_index = """
+        INSERT OR REPLACE INTO file_index (file_path, size, mtime_ns)
+        SELECT ?1, ?2, ?3
+        WHERE EXISTS (SELECT 1 FROM songs WHERE file_path = ?1)
+        """
+        songs = list(songs)
+        with self._connections.transaction() as conn:
+            last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM songs").fetchone()[0]
+            conn.executemany(query_song, self._with_match_keys(song[0] for song in songs))
+            conn.executemany(query_index, ((song[0].file_path, song[1], song[2]) for song in songs))
+            added = conn.execute("SELECT COUNT(*) FROM songs WHERE id > ?", (last_id,)).fetchone()[0]
+        self.catalog.songs_added()
+        self.catalog.songs_changed(song[0].file_path for song in songs)
+        return added
 
-        with self._get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute(query_songs)
-            cursor.execute(query_playlists)
-            cursor.execute(query_playlist_songs)
-            conn.commit()
-    
-    def add_song(self, title: str, artist: str, genre: str, file_path: str) -> None:
+    def remove_songs_by_path(self, file_paths: Iterable[str]) -> int:
+        rows = [(path,) for path in file_paths]
+        with self._connections.transaction() as conn:
+            song_ids = []
+            for row in rows:
+                found = conn.execute("SELECT id FROM songs WHERE file_path = ?", row).fetchone()
+                if found:
+                    song_ids.append(found)
+            conn.executemany("DELETE FROM file_index WHERE file_path = ?", rows)
+            conn.executemany("DELETE FROM songs WHERE id = ?", song_ids)
+        self.catalog.songs_removed(row[0] for row in song_ids)
+        return len(song_ids)
+
+    def add_watch_folder(self, path: str) -> bool:
+        try:
+            with self._connections.transaction() as conn:
+                conn.execute("INSERT INTO watch_folders (path) VALUES (?)", (os.path.abspath(path),))
+            return True
+        except sqlite3.IntegrityError: #If folder is already watched
+            return False
+
+    def remove_watch_folder(self, path: str) -> None:
+        path = os.path.abspath(path)
+        with self._connections.transaction() as conn:
+            conn.execute("DELETE FROM watch_folders WHERE path = ?", (path,))
+            conn.execute(
+                "DELETE FROM file_index WHERE file_path >= ? AND file_path < ?",
+                self._path_range(path)
+            )
+
+    def get_watch_folders(self) -> list[str]:
+        with self._connections.read() as conn:
+            return [row[0] for row in conn.execute("SELECT path FROM watch_folders")]
+
+    def get_file_index(self, folder: str) -> dict[str, tuple[int, int]]:
+        query = """
+        SELECT file_path, size, mtime_ns
+        FROM file_index
+        WHERE file_path >= ? AND file_path < ?
+        """
+        with self._connections.read() as conn:
+            rows = conn.execute(query, self._path_range(os.path.abspath(folder)))
+            return {path: (size, mtime_ns) for path, size, mtime_ns in rows}
+
+    def get_file_stats(self, file_paths: list[str]) -> dict[str, tuple[int, int]]:
+        # (size, mtime_ns) each path had when its tags were last read
+        stats = {}
+        with self._connections.read() as conn:
+            for start in range(0, len(file_paths), 500):
+                chunk = file_paths[start:start + 500]
+                placeholders = ", ".join("?" * len(chunk))
+                rows = conn.execute(
+                    f"SELECT file_path, size, mtime_ns FROM file_index WHERE file_path IN ({placeholders})", chunk
+                )
+                stats.update((path, (size, mtime_ns)) for path, size, mtime_ns in rows)
+        return stats
+
+    def get_aliases(self, folder: str) -> set[str]:
+        query = "SELECT file_path FROM song_aliases WHERE file_path >= ? AND file_path < ?"
+        with self._connections.read() as conn:
+            return {row[0] for row in conn.execute(query, self._path_range(os.path.abspath(folder)))}
+
+    def get_hash_state(self, after_id: int = 0, limit: int = 5000) -> list[tuple]:
+        # (id, file_path, file_size, file_mtime_ns) of the next page of songs;
+        # size and mtime are NULL until the song has been hashed
+        query = """
+        SELECT id, file_path, file_size, file_mtime_ns
+        FROM songs
+        WHERE id > ?
+        ORDER BY id
+        LIMIT ?
+        """
+        with self._connections.read() as conn:
+            return conn.execute(query, (after_id, limit)).fetchall()
+
+    def save_partial_hashes(self, rows: Iterable[tuple[int, int, int, bytes, bytes | None]]) -> None:
+        # Rows are (song_id, size, mtime_ns, partial_hash, content_hash or None)
+        query = """
+        UPDATE songs
+        SET file_size = ?2, file_mtime_ns = ?3, partial_hash = ?4, content_hash = ?5
+        WHERE id = ?1
+        """
+        with self._connections.transaction() as conn:
+            conn.executemany(query, rows)
+
+    def get_unhashed_collisions(self) -> list[tuple[int, str]]:
+        # Songs that share a partial hash with another song but have no full hash yet
+        query = """
+        SELECT id, file_path
+        FROM songs
+        WHERE content_hash IS NULL AND partial_hash IN (
+            SELECT partial_hash FROM songs
+            WHERE partial_hash IS NOT NULL
+            GROUP BY partial_hash
+            HAVING COUNT(*) > 1
+        )
+        """
+        with self._connections.read() as conn:
+            return conn.execute(query).fetchall()
+
+    def save_content_hashes(self, rows: Iterable[tuple[int, bytes]]) -> None:
+        # Rows are (song_id, content_hash)
+        with self._connections.transaction() as conn:
+            conn.executemany("UPDATE songs SET content_hash = ?2 WHERE id = ?1", rows)
+
+    def get_loudness_state(self, after_id: int = 0, limit: int = 5000) -> list[tuple]:
+        # (id, file_path, file_size, file_mtime_ns) of the next page of songs,
+        # with the stat of the last loudness analysis (NULL if never analyzed)
+        query = """
+        SELECT s.id, s.file_path, l.file_size, l.file_mtime_ns
+        FROM songs s
+        LEFT JOIN song_loudness l ON l.song_id = s.id
+        WHERE s.id > ?
+        ORDER BY s.id
+        LIMIT ?
+        """
+        with self._connections.read() as conn:
+            return conn.execute(query, (after_id, limit)).fetchall()
+
+    def save_loudness(self, rows: Iterable[tuple[int, int, int, float | None, float | None]]) -> None:
+        # Rows are (song_id, size, mtime_ns, loudness, peak)
+        query = """
+        INSERT OR REPLACE INTO song_loudness (song_id, file_size, file_mtime_ns, loudness, peak)
+        VALUES (?, ?, ?, ?, ?)
+        """
+        with self._connections.transaction() as conn:
+            conn.executemany(query, rows)
+
+    def get_all_loudness(self) -> list[tuple[str, float | None, float]]:
+        # (file_path, loudness, peak) of every song analyzed successfully
+        query = """
+        SELECT s.file_path, l.loudness, l.peak
+        FROM song_loudness l
+        JOIN songs s ON s.id = l.song_id
+        WHERE l.peak IS NOT NULL
+        """
+        with self._connections.read() as conn:
+            return conn.execute(query).fetchall()
+
+    def get_duplicate_groups(self) -> list[list[Song]]:
+        # Songs with identical content, oldest first within each group
+        query = """
+        SELECT content_hash, id, title, artist, genre, file_path, play_count
+        FROM songs
+        WHERE content_hash IN (
+            SELECT content_hash FROM songs
+            WHERE content_hash IS NOT NULL
+            GROUP BY content_hash
+            HAVING COUNT(*) > 1
+        )
+        ORDER BY content_hash, id
+        """
+        self.flush()
+        groups: dict[bytes, list[Song]] = {}
+        with self._connections.read() as conn:
+            for content_hash, *song in conn.execute(query):
+                groups.setdefault(content_hash, []).append(Song(*song))
+        return list(groups.values())
+
+    def merge_songs(self, groups: Iterable[list[int]]) -> int:
+        # Merges every song of a group into the group's first song: plays,
+        # play counts, playlist entries and radio affinity move over, the other songs are
+        # deleted and their paths remembered in song_aliases.
+        # Returns the number of songs removed.
+        query_play_count = """
+        UPDATE songs
+        SET play_count = play_count + (SELECT COALESCE(SUM(play_count), 0) FROM songs WHERE id IN ({ids})),
+            last_played = MAX(last_played, (SELECT COALESCE(MAX(last_played), 0) FROM songs WHERE id IN ({ids})))
+        WHERE id = ?
+        """
+        query_daily = """
+        INSERT INTO daily_plays (dimension, day, key, plays)
+        SELECT 'song', day, ?, plays FROM daily_plays
+        WHERE dimension = 'song' AND key IN ({ids})
+        ON CONFLICT(dimension, day, key) DO UPDATE SET plays = plays + excluded.plays
+        """
+        query_affinity = """
+        INSERT INTO song_affinity (song_a, song_b, weight)
+        SELECT ?, song_b, weight FROM song_affinity
+        WHERE song_a IN ({ids}) AND song_b != ?
+        ON CONFLICT(song_a, song_b) DO UPDATE SET weight = weight + excluded.weight
+        """
+        query_affinity_reverse = """
+        INSERT INTO song_affinity (song_a, song_b, weight)
+        SELECT song_a, ?, weight FROM song_affinity
+        WHERE song_b IN ({ids}) AND song_a != ?
+        ON CONFLICT(song_a, song_b) DO UPDATE SET weight = weight + excluded.weight
+        """
+        self.flush()
+        removed = []
+        kept_paths = []
+        with self._connections.transaction() as conn:
+            for keep_id, *duplicate_ids in groups:
+                if not duplicate_ids:
+                    continue
+                ids = ", ".join("?" * len(duplicate_ids))
+                params = (keep_id, *duplicate_ids)
+                conn.execute(query_play_count.format(ids=ids), (*duplicate_ids, *duplicate_ids, keep_id))
+                conn.execute(f"UPDATE plays SET song_id = ? WHERE song_id IN ({ids})", params)
+                conn.execute(query_daily.format(ids=ids), params)
+                conn.execute(f"DELETE FROM daily_plays WHERE dimension = 'song' AND key IN ({ids})", duplicate_ids)
+                conn.execute(query_affinity.format(ids=ids), (keep_id, *duplicate_ids, keep_id))
+                conn.execute(query_affinity_reverse.format(ids=ids), (keep_id, *duplicate_ids, keep_id))
+                conn.execute(f"UPDATE playlist_songs SET song_id = ? WHERE song_id IN ({ids})", params)
+                conn.execute(f"UPDATE song_aliases SET song_id = ? WHERE song_id IN ({ids})", params)
+                conn.execute(
+                    f"INSERT OR REPLACE INTO song_aliases (file_path, song_id) "
+                    f"SELECT file_path, ? FROM songs WHERE id IN ({ids})", params
+                )
+                conn.execute(
+                    f"DELETE FROM file_index WHERE file_path IN (SELECT file_path FROM songs WHERE id IN ({ids}))",
+                    duplicate_ids
+                )
+                conn.execute(f"DELETE FROM songs WHERE id IN ({ids})", duplicate_ids)
+                kept_paths.extend(row[0] for row in conn.execute("SELECT file_path FROM songs WHERE id = ?", (keep_id,)))
+                removed.extend(duplicate_ids)
+        self.catalog.songs_removed(removed)
+        self.catalog.songs_changed(kept_paths)
+        return len(removed)
+
+    @staticmethod
+    def _path_range(folder: str) -> tuple[str, str]:
+        # Every path below folder sorts between "folder/" and "folder0"
+        prefix = os.path.join(folder, "")
+        return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+    def get_songs(self, song_ids: Iterable[int]) -> list[tuple]:
+        return self.catalog.get_many(song_ids)
+
+    def get_library_page(self, order: str = "added", after: tuple | None = None, limit: int = 500) -> list[tuple]:
+        # Rows are LIBRARY_COLUMNS followed by the sort key of the row; pass
+        # the last row's key as `after` to get the next page
+        columns = SORT_ORDERS[order]
+        key = ", ".join(columns)
+        where = f"WHERE ({key}) > ({', '.join('?' * len(columns))})" if after else ""
+        query = f"SELECT {LIBRARY_COLUMNS}, {key} FROM songs {where} ORDER BY {key} LIMIT ?"
+        with self._connections.read() as conn:
+            return conn.execute(query, (*(after or ()), limit)).fetchall()
+
+    def get_albums(self) -> list[tuple[str, str, int, int, float]]:
+        # (album, artist, year, tracks, duration) for every album, by artist
+        query = """
+        SELECT album, MIN(artist), MAX(year), COUNT(*), SUM(duration)
+        FROM songs
+        WHERE album != ''
+        GROUP BY artist_key, album
+        ORDER BY artist_key, album
+        """
+        with self._connections.read() as conn:
+            return conn.execute(query).fetchall()
+
+    def get_total_duration(self, song_ids: list[int]) -> float:
+        # Counts every occurrence, so a song queued twice is counted twice
+        counts: dict[int, int] = {}
+        for song_id in song_ids:
+            counts[song_id] = counts.get(song_id, 0) + 1
+        unique = list(counts)
+        total = 0.0
+        with self._connections.read() as conn:
+            for start in range(0, len(unique), 500):
+                chunk = unique[start:start + 500]
+                placeholders = ", ".join("?" * len(chunk))
+                rows = conn.execute(f"SELECT id, duration FROM songs WHERE id IN ({placeholders})", chunk)
+                total += sum(duration * counts[song_id] for song_id, duration in rows)
+        return total
+
+    def get_neighbors(self, song_ids: Iterable[int], limit: int = 50) -> dict[int, list[tuple[int, float]]]:
+        # The `limit` strongest (song_id, weight) affinity entries of each
+        # song, i.e. the top of its row in the sparse affinity matrix
+        query = """
+        SELECT song_b, weight FROM song_affinity
+        WHERE song_a = ?
+        ORDER BY weight DESC
+        LIMIT ?
+        """
+        with self._connections.read() as conn:
+            return {song_id: conn.execute(query, (song_id, limit)).fetchall() for song_id in song_ids}
+
+    def get_similar_songs(self, song_id: int, limit: int = 200) -> tuple[list[int], list[int]]:
+        # Ids of songs by the same artist and of the most played songs of the
+        # same genre, without the song itself. Unknown artists and genres
+        # aren't similar to anything.
+        query_artist = """
+        SELECT id FROM songs
+        WHERE artist_key = (SELECT artist_key FROM songs WHERE id = ?1 AND artist != 'Unknown Artist') AND id != ?1
+        LIMIT ?2
+        """
+        query_genre = """
+        SELECT id FROM songs
+        WHERE genre = (SELECT genre FROM songs WHERE id = ?1 AND genre != 'Unknown Genre') AND id != ?1
+        ORDER BY play_count DESC
+        LIMIT ?2
+        """
+        with self._connections.read() as conn:
+            artist = [row[0] for row in conn.execute(query_artist, (song_id, limit))]
+            genre = [row[0] for row in conn.execute(query_genre, (song_id, limit))]
+        return artist, genre
+
+    def get_songs_page(self, after_id: int = 0, limit: int = 500) -> list[tuple]:
         query = """
-        INSERT OR IGNORE INTO songs (title, artist, genre, file_path)
-        VALUES (?, ?, ?, ?)
-        """
-        with self._get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute(query, (title, artist, genre, file_path))
-            conn.commit()
-
-    def get_all_songs(self) -> list[tuple]:
-        query = "SELECT id, title, artist, genre, file_path, play_count FROM songs"
-        with self._get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute(query)
-            return cursor.fetchall()
-
-    def increment_play_count(self, song_id: int) -> None:
-        query = "UPDATE songs SET play_count = play_count + 1 WHERE id = ?"
-        with self._get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute(query, (song_id,))
-            conn.commit()
-
-    def search_songs(self, search: str) -> list[tuple]:
+        SELECT id, title, artist, genre, file_path, play_count
+        FROM songs
+        WHERE id > ?
+        ORDER BY id
+        LIMIT ?
+        """
+        with self._connections.read() as conn:
+            return conn.execute(query, (after_id, limit)).fetchall()
+
+    def increment_play_count(self, song_id: int, played_at: float | None = None) -> None:
+        # Plays are buffered and written in batches, see flush()
+        if played_at is None:
+            played_at = time.time()
+        self._plays.put((song_id, int(played_at)))
+
+    def record_plays(self, plays: list[tuple[int, int]]) -> None:
+        # Writes (song_id, played_at) plays right away, in one transaction.
+        # The plays_aggregate trigger bumps play_count and the statistics.
+        # Plays of songs removed since they were buffered are dropped.
+        query = "INSERT INTO plays (song_id, played_at) SELECT ?, ? WHERE EXISTS (SELECT 1 FROM songs WHERE id = ?)"
+        with self._connections.transaction() as conn:
+            conn.executemany(query, ((song_id, played_at, song_id) for song_id, played_at in plays))
+        for song_id, _ in plays:
+            self.catalog.play_count_added(song_id)
+
+    def search_songs(self, search: str, limit: int = 500) -> list[tuple]:
+        # Every word must match the start of a word in title, artist or genre.
+        # Only the first SEARCH_CANDIDATES hits are ranked (title weighs most),
+        # so very broad prefixes stay as cheap as narrow ones.
+        words = SEARCH_WORD.findall(search)
+        if not self.has_fts or not words:
+            return self._search_songs_like(search, limit)
+
+        match = " ".join(f'"{word}"*' for word in words)
+        sql = """
+        SELECT s.id, s.title, s.artist, s.genre, s.file_path, s.play_count
+        FROM (
+            SELECT rowid, bm25(songs_fts, 10.0, 5.0, 1.0) AS score
+            FROM songs_fts
+            WHERE songs_fts MATCH ?
+            LIMIT ?
+        ) hits
+        JOIN songs s ON s.id = hits.rowid
+        ORDER BY hits.score
+        LIMIT ?
+        """
+        with self._connections.read() as conn:
+            return conn.execute(sql, (match, max(limit, SEARCH_CANDIDATES), limit)).fetchall()
+
+    def _search_songs_like(self, search: str, limit: int) -> list[tuple]:
+        needle = search.casefold()
+        songs = self.catalog.filter(lambda song: needle in song.title.casefold() or needle in song.artist.casefold(), limit)
+        if songs is not None:
+            return songs
+
         search_term = f"%{search}%"
         sql = """
         SELECT id, title, artist, genre, file_path, play_count 
         FROM songs 
         WHERE title LIKE ? OR artist LIKE ?
+        LIMIT ?
         """
 
-        with self._get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute(sql, (search_term, search_term))
-            return cursor.fetchall()
+        with self._connections.read() as conn:
+            return conn.execute(sql, (search_term, search_term, limit)).fetchall()
     
     def create_playlist(self, name: str, song_ids: list[int]) -> bool:
-        with self._get_connection() as conn:
-            cursor = conn.cursor()
-            try:
-                cursor.execute("INSERT INTO playlists (name) VALUES (?)", (name,))
+        try:
+            with self._connections.transaction() as conn:
+                cursor = conn.execute("INSERT INTO playlists (name) VALUES (?)", (name,))
                 playlist_id = cursor.lastrowid
-                for song_id in song_ids:
-                    cursor.execute("INSERT INTO playlist_songs (playlist_id, song_id) VALUES (?, ?)", (playlist_id, song_id))
-                conn.commit()
-                return True
-            except sqlite3.IntegrityError: #If paylist name exists
-                return False
+                conn.executemany(
+                    "INSERT INTO playlist_songs (playlist_id, position, song_id) VALUES (?, ?, ?)",
+                    ((playlist_id, position, song_id) for position, song_id in enumerate(song_ids))
+                )
+            return True
+        except sqlite3.IntegrityError: #If paylist name exists
+            return False
 
     def get_playlists(self) -> list[tuple]:
-        with self._get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT id, name FROM playlists")
-            return cursor.fetchall()
+        with self._connections.read() as conn:
+            return conn.execute("SELECT id, name FROM playlists").fetchall()
+
+    def playlist_exists(self, playlist_id: int, smart: bool = False) -> bool:
+        table = "smart_playlists" if smart else "playlists"
+        with self._connections.read() as conn:
+            return conn.execute(f"SELECT 1 FROM {table} WHERE id = ?", (playlist_id,)).fetchone() is not None
 
     def get_playlist_songs(self, playlist_id: int) -> list[tuple]:
+        query = "SELECT song_id FROM playlist_songs WHERE playlist_id = ? ORDER BY position"
+        with self._connections.read() as conn:
+            song_ids = [row[0] for row in conn.execute(query, (playlist_id,))]
+        return self.catalog.get_many(song_ids)
+
+    def get_playlist_size(self, playlist_id: int) -> int:
+        query = "SELECT COUNT(*) FROM playlist_songs WHERE playlist_id = ?"
+        with self._connections.read() as conn:
+            return conn.execute(query, (playlist_id,)).fetchone()[0]
+
+    def iter_playlist_entries(self, playlist_id: int | None = None) -> Iterator[tuple]:
+        # Streams (playlist_name, title, artist, genre, file_path, play_count)
+        # for one playlist, or every playlist when playlist_id is None
         query = """
-        SELECT s.id, s.title, s.artist, s.genre, s.file_path, s.play_count
-        FROM songs s
-        JOIN playlist_songs link ON s.id = link.song_id
-        WHERE link.playlist_id = ?
+        SELECT p.name, s.title, s.artist, s.genre, s.file_path, s.play_count
+        FROM playlists p
+        JOIN playlist_songs link ON link.playlist_id = p.id
+        JOIN songs s ON s.id = link.song_id
+        {where}
+        ORDER BY p.id, link.position
         """
-        with self._get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute(query, (playlist_id,))
-            return cursor.fetchall()
+        if playlist_id is None:
+            query, params = query.format(where=""), ()
+        else:
+            query, params = query.format(where="WHERE p.id = ?"), (playlist_id,)
+        with self._connections.read() as conn:
+            yield from conn.execute(query, params)
+
+    def iter_library(self) -> Iterator[tuple]:
+        # Streams (title, artist, genre, file_path, play_count) for every song
+        self.flush()
+        query = "SELECT title, artist, genre, file_path, play_count FROM songs ORDER BY id"
+        with self._connections.read() as conn:
+            yield from conn.execute(query)
+
+    def update_playlist(self, playlist_id: int, name: str | None = None, song_ids: list[int] | None = None) -> bool:
+        # Renames the playlist and/or replaces its songs. False when it
+        # doesn't exist or the new name is taken.
+        try:
+            with self._connections.transaction() as conn:
+                if conn.execute("SELECT 1 FROM playlists WHERE id = ?", (playlist_id,)).fetchone() is None:
+                    return False
+                if name is not None:
+                    conn.execute("UPDATE playlists SET name = ? WHERE id = ?", (name, playlist_id))
+                if song_ids is not None:
+                    conn.execute("DELETE FROM playlist_songs WHERE playlist_id = ?", (playlist_id,))
+                    conn.executemany(
+                        "INSERT INTO playlist_songs (playlist_id, position, song_id) VALUES (?, ?, ?)",
+                        ((playlist_id, position, song_id) for position, song_id in enumerate(song_ids))
+                    )
+            return True
+        except sqlite3.IntegrityError:
+            return False
 
     def delete_playlist(self, playlist_id: int) -> None:
-        with self._get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("DELETE FROM playlist_songs WHERE playlist_id = ?", (playlist_id,))
-            cursor.execute("DELETE FROM playlists WHERE id = ?", (playlist_id,))
-            conn.commit()
+        with self._connections.transaction() as conn:
+            conn.execute("DELETE FROM playlists WHERE id = ?", (playlist_id,))
     
-    def get_statistics(self) -> str:
-        with self._get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT title, artist, play_count FROM songs ORDER BY play_count DESC LIMIT 1")
-            top_song = cursor.fetchone()
-
-            cursor.execute("""
-                SELECT artist, SUM(play_count) as total 
-                FROM songs 
-                WHERE artist != 'Unknown Artist' 
-                GROUP BY artist 
-                ORDER BY total DESC LIMIT 1
-            """)
-            top_artist = cursor.fetchone()
-
-            cursor.execute("""
-                SELECT genre, SUM(play_count) as total 
-                FROM songs 
-                WHERE genre != 'Unknown Genre' 
-                GROUP BY genre 
-                ORDER BY total DESC LIMIT 1
-            """)
-            top_genre = cursor.fetchone()
-
-            lines = ["STATS"]
-            
-            if top_song and top_song[2] > 0:
-                lines.append(f"Top song:\n{top_song[0]} - {top_song[1]} ({top_song[2]} times streamed)")
-            else:
-                lines.append("Top song:\nno data")
+    def create_smart_playlist(self, name: str, definition: str) -> bool:
+        # Raises ValueError when the rules don't parse
+        parse_smart_playlist(definition)
+        try:
+            with self._connections.transaction() as conn:
+                conn.execute("INSERT INTO smart_playlists (name, definition) VALUES (?, ?)", (name, definition))
+            return True
+        except sqlite3.IntegrityError: #If playlist name exists
+            return False
 
-            if top_artist and top_artist[1] > 0:
-                lines.append(f"Top artist:\n{top_artist[0]} ({top_artist[1]} times streamed)")
-            else:
-                lines.append("Top artist:\nno data")
+    def get_smart_playlists(self) -> list[tuple[int, str, str]]:
+        with self._connections.read() as conn:
+            return conn.execute("SELECT id, name, definition FROM smart_playlists").fetchall()
 
-            if top_genre and top_genre[1] > 0:
-                lines.append(f"Top genre:\n{top_genre[0]} ({top_genre[1]} times streamed)")
+    def get_smart_playlist_songs(self, playlist_id: int) -> list[tuple]:
+        # Served from smart_playlist_songs while the triggers haven't marked
+        # the playlist stale and the compiled parameters (day-based cutoffs)
+        # are the same as last time; otherwise the rules run once and the
+        # result replaces the cached one.
+        self.flush()
+        with self._connections.read() as conn:
+            row = conn.execute(
+                "SELECT definition, params, stale FROM smart_playlists WHERE id = ?", (playlist_id,)
+            ).fetchone()
+        if row is None:
+            return []
+        definition, cached_params, stale = row
+        compiled = compile_playlist(parse_smart_playlist(definition))
+        params = json.dumps(compiled.params)
+
+        query_cached = "SELECT song_id FROM smart_playlist_songs WHERE playlist_id = ? ORDER BY position"
+        if stale or params != cached_params:
+            with self._connections.transaction() as conn:
+                song_ids = [row[0] for row in conn.execute(compiled.sql, compiled.params)]
+                conn.execute("DELETE FROM smart_playlist_songs WHERE playlist_id = ?", (playlist_id,))
+                conn.executemany(
+                    "INSERT INTO smart_playlist_songs (playlist_id, position, song_id) VALUES (?, ?, ?)",
+                    ((playlist_id, position, song_id) for position, song_id in enumerate(song_ids))
+                )
+                conn.execute(
+                    "UPDATE smart_playlists SET columns = ?, params = ?, stale = 0 WHERE id = ?",
+                    (f",{','.join(compiled.columns)},", params, playlist_id)
+                )
+        else:
+            with self._connections.read() as conn:
+                song_ids = [row[0] for row in conn.execute(query_cached, (playlist_id,))]
+        return self.catalog.get_many(song_ids)
+
+    def delete_smart_playlist(self, playlist_id: int) -> None:
+        with self._connections.transaction() as conn:
+            conn.execute("DELETE FROM smart_playlists WHERE id = ?", (playlist_id,))
+
+    def get_top_songs(self, limit: int = 10, since: date | None = None) -> list[tuple]:
+        self.flush()
+        if since is None:
+            query = """
+            SELECT title, artist, play_count
+            FROM songs
+            WHERE play_count > 0
+            ORDER BY play_count DESC
+            LIMIT ?
+            """
+            params = (limit,)
+        else:
+            query = """
+            SELECT s.title, s.artist, top.total
+            FROM (
+                SELECT key, SUM(plays) AS total
+                FROM daily_plays
+                WHERE dimension = 'song' AND day >= ?
+                GROUP BY key
+                ORDER BY total DESC
+                LIMIT ?
+            ) top
+            JOIN songs s ON s.id = top.key
+            ORDER BY top.total DESC
+            """
+            params = (since.isoformat(), limit)
+        with self._connections.read() as conn:
+            return conn.execute(query, params).fetchall()
+
+    def get_top_artists(self, limit: int = 10, since: date | None = None) -> list[tuple]:
+        return self._get_top("artist", "Unknown Artist", limit, since)
+
+    def get_top_genres(self, limit: int = 10, since: date | None = None) -> list[tuple]:
+        return self._get_top("genre", "Unknown Genre", limit, since)
+
+    def _get_top(self, dimension: str, unknown: str, limit: int, since: date | None) -> list[tuple]:
+        self.flush()
+        if since is None:
+            query = """
+            SELECT key, plays
+            FROM play_totals
+            WHERE dimension = ? AND key != ? AND plays > 0
+            ORDER BY plays DESC
+            LIMIT ?
+            """
+            params = (dimension, unknown, limit)
+        else:
+            query = """
+            SELECT key, SUM(plays) AS total
+            FROM daily_plays
+            WHERE dimension = ? AND day >= ? AND key != ?
+            GROUP BY key
+            ORDER BY total DESC
+            LIMIT ?
+            """
+            params = (dimension, since.isoformat(), unknown, limit)
+        with self._connections.read() as conn:
+            return conn.execute(query, params).fetchall()
+
+    def get_statistics(self, limit: int = 3) -> str:
+        month_start = date.today().replace(day=1)
+        lines = ["STATS"]
+
+        top_songs = self.get_top_songs(limit)
+        if top_songs:
+            lines.append("Top songs:")
+            for rank, (title, artist, plays) in enumerate(top_songs, 1):
+                lines.append(f"{rank}. {title} - {artist} ({plays} times streamed)")
+        else:
+            lines.append("Top songs:\nno data")
+
+        sections = (
+            ("Top artists", self.get_top_artists(limit)),
+            ("Top genres", self.get_top_genres(limit)),
+            ("Top artists this month", self.get_top_artists(limit, month_start)),
+        )
+        for label, rows in sections:
+            if rows:
+                lines.append(f"{label}:")
+                for rank, (name, plays) in enumerate(rows, 1):
+                    lines.append(f"{rank}. {name} ({plays} times streamed)")
             else:
-                lines.append("Top genre:\nno data")
-            
-            return "\n".join(lines)
+                lines.append(f"{label}:\nno data")
+
+        return "\n".join(lines)
+
+    def match_songs(self, entries: list[tuple[str | None, str | None, str | None]]) -> list[int | None]:
+        # Resolves (title, artist, file_path) entries to song ids in one pass:
+        # by file path first, then by normalized title and artist. Entries
+        # without an artist match on title alone. Unmatched entries are None.
+        query_entries = """
+        CREATE TEMP TABLE IF NOT EXISTS import_entries (
+            position INTEGER PRIMARY KEY,
+            file_path TEXT,
+            title_key TEXT NOT NULL,
+            artist_key TEXT NOT NULL
+        )
+        """
+        query_match = """
+        SELECT e.position, COALESCE(
+            (SELECT id FROM songs WHERE file_path = e.file_path),
+            (SELECT MIN(id) FROM songs
+             WHERE title_key = e.title_key AND title_key != ''
+               AND (artist_key = e.artist_key OR e.artist_key = ''))
+        )
+        FROM import_entries e
+        """
+        rows = (
+            (position, file_path, match_key(title), match_key(artist))
+            for position, (title, artist, file_path) in enumerate(entries)
+        )
+        song_ids: list[int | None] = [None] * len(entries)
+        with self._connections.transaction() as conn:
+            conn.execute(query_entries)
+            conn.execute("DELETE FROM import_entries")
+            conn.executemany("INSERT INTO import_entries VALUES (?, ?, ?, ?)", rows)
+            for position, song_id in conn.execute(query_match):
+                song_ids[position] = song_id
+            conn.execute("DELETE FROM import_entries")
+        return song_ids
 
     def get_song_by_meta(self, title: str, artist: str) -> tuple | None:
         sql = """
@@ -168,7 +798,5 @@ class Database:
         WHERE title = ? AND artist = ?
         LIMIT 1
         """
-        with self._get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute(sql, (title, artist))
-            return cursor.fetchone()
+        with self._connections.read() as conn:
+            return conn.execute(sql, (title, artist)).fetchone()
@@ -0,0 +1,120 @@
+import hashlib
+import multiprocessing
+import os
+from collections.abc import Callable, Iterable
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from src.logic.catalog import Song
+from src.logic.database import Database
+
+EDGE_SIZE = 64 * 1024
+READ_SIZE = 1024 * 1024
+PAGE_SIZE = 5000
+DIGEST_SIZE = 16
+
+
+@dataclass
+class DedupeResult:
+    hashed: int = 0
+    fully_hashed: int = 0
+    missing: int = 0
+    groups: list[list[Song]] = field(default_factory=list)
+
+
+def partial_hash(path: str) -> tuple[bytes, bytes | None] | None:
+    # Hashes the size plus the first and last EDGE_SIZE bytes. Files small
+    # enough to be read whole also get their full content hash.
+    # Runs in worker processes, so it must stay a module-level function.
+    try:
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            head = f.read(EDGE_SIZE)
+            if size <= 2 * EDGE_SIZE:
+                data = head + f.read()
+                partial = hashlib.blake2b(size.to_bytes(8, "little") + data, digest_size=DIGEST_SIZE)
+                return partial.digest(), hashlib.blake2b(data, digest_size=DIGEST_SIZE).digest()
+            f.seek(-EDGE_SIZE, os.SEEK_END)
+            tail = f.read(EDGE_SIZE)
+    except OSError:
+        return None
+    partial = hashlib.blake2b(size.to_bytes(8, "little") + head + tail, digest_size=DIGEST_SIZE)
+    return partial.digest(), None
+
+
+def content_hash(path: str) -> bytes | None:
+    digest = hashlib.blake2b(digest_size=DIGEST_SIZE)
+    try:
+        with open(path, "rb") as f:
+            while chunk := f.read(READ_SIZE):
+                digest.update(chunk)
+    except OSError:
+        return None
+    return digest.digest()
+
+
+def _changed_files(database: Database, result: DedupeResult) -> Iterable[list[tuple[int, str, int, int]]]:
+    # Pages of (song_id, path, size, mtime_ns) whose stat differs from the
+    # one their hash was computed from
+    after_id = 0
+    while page := database.get_hash_state(after_id, PAGE_SIZE):
+        after_id = page[-1][0]
+        changed = []
+        for song_id, path, size, mtime_ns in page:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                result.missing += 1
+                continue
+            if (stat.st_size, stat.st_mtime_ns) != (size, mtime_ns):
+                changed.append((song_id, path, stat.st_size, stat.st_mtime_ns))
+        if changed:
+            yield changed
+
+
+def find_duplicates(
+    database: Database,
+    workers: int | None = None,
+    progress: Callable[[int, int], None] | None = None,
+    is_cancelled: Callable[[], bool] | None = None,
+) -> DedupeResult:
+    # Two passes: cheap partial hashes for new or changed files, then full
+    # hashes only for songs whose partial hash collides with another one.
+    # Hashes are stored with the file's size and mtime, so a rerun only
+    # reads files that changed since.
+    result = DedupeResult()
+    # Spawned workers, since this usually runs on a thread of the GUI process
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        for changed in _changed_files(database, result):
+            hashes = pool.map(partial_hash, [path for _, path, _, _ in changed], chunksize=64)
+            rows = [
+                (song_id, size, mtime_ns, *hashed)
+                for (song_id, _, size, mtime_ns), hashed in zip(changed, hashes)
+                if hashed is not None
+            ]
+            database.save_partial_hashes(rows)
+            result.hashed += len(rows)
+            if progress is not None:
+                progress(result.hashed, 0)
+            if is_cancelled is not None and is_cancelled():
+                return result
+
+        collisions = database.get_unhashed_collisions()
+        for start in range(0, len(collisions), PAGE_SIZE):
+            chunk = collisions[start:start + PAGE_SIZE]
+            hashes = pool.map(content_hash, [path for _, path in chunk], chunksize=16)
+            rows = [(song_id, digest) for (song_id, _), digest in zip(chunk, hashes) if digest is not None]
+            database.save_content_hashes(rows)
+            result.fully_hashed += len(rows)
+            if progress is not None:
+                progress(start + len(chunk), len(collisions))
+            if is_cancelled is not None and is_cancelled():
+                return result
+
+    result.groups = database.get_duplicate_groups()
+    return result
+
+
+def merge_duplicates(database: Database, groups: Iterable[list[Song]]) -> int:
+    # Keeps the oldest song of each group. Returns the number of songs removed.
+    return database.merge_songs([song.id for song in group] for group in groups)
@@ -0,0 +1,273 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Iterable
+
+CHUNK_SIZE = 1024 * 1024
+DIGEST_SIZE = 16
+INDEX_FILE = "index.json"
+CACHED_NAME = re.compile(r"^[0-9a-f]{32}(\.\w+)?(\.part)?$")
+
+
+class FileCache:
+    # Local copies of audio files that live on slow disks or network mounts.
+    #
+    # prefetch() sets the files that are about to play. A background thread
+    # copies them in order, chunk by chunk and at most rate_limit bytes/s,
+    # so prefetching doesn't starve the song that is playing. A copy is
+    # only kept when the source's size and mtime didn't change while it was
+    # read; its hash is computed on the way.
+    #
+    # Copies are verified on the same thread: whenever a file enters the
+    # prefetch window its source is checked for changes, and copies from an
+    # earlier session are hashed again once. lookup() runs on the GUI
+    # thread, so it touches neither the source nor the copy's contents: it
+    # returns the cached copy once verified and the original path otherwise.
+    #
+    # At most max_bytes are kept. The least recently used copies are
+    # evicted first, never the ones in the current prefetch window.
+    # on_ready(path) is called from the background thread whenever a copy
+    # becomes usable, after copying or verifying it.
+
+    def __init__(self, directory: str, max_bytes: int, rate_limit: int | None = None,
+                 chunk_size: int = CHUNK_SIZE) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.rate_limit = rate_limit
+        self.chunk_size = chunk_size
+        self._cond = threading.Condition()
+        self._entries: OrderedDict[str, dict] = OrderedDict() #LRU first
+        self._verified: set[str] = set() #Checked since they entered the window
+        self._hashed: set[str] = set() #Digest checked this session
+        self._wanted: list[str] = []
+        self._failed: set[str] = set()
+        self._copying = None
+        self._closed = False
+        self.on_ready: Callable[[str], None] | None = None
+        os.makedirs(directory, exist_ok=True)
+        self._load_index()
+        self._thread = threading.Thread(target=self._run, name="file-cache", daemon=True)
+        self._thread.start()
+
+    @staticmethod
+    def cached_name(path: str) -> str:
+        digest = hashlib.blake2b(path.encode("utf-8", "surrogateescape"), digest_size=DIGEST_SIZE).hexdigest()
+        return digest + os.path.splitext(path)[1].lower()
+
+    def _load_index(self) -> None:
+        try:
+            with open(os.path.join(self.directory, INDEX_FILE), "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            entries = []
+        for entry in entries:
+            if os.path.exists(os.path.join(self.directory, entry["file"])):
+                self._entries[entry["path"]] = entry
+        # Interrupted copies and files the index lost track of
+        known = {entry["file"] for entry in self._entries.values()}
+        for name in os.listdir(self.directory):
+            if CACHED_NAME.match(name) and name not in known:
+                self._remove_file(name)
+
+    def _save_index(self) -> None:
+        # Caller holds the lock
+        path = os.path.join(self.directory, INDEX_FILE)
+        try:
+            with open(path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(list(self._entries.values()), f)
+            os.replace(path + ".tmp", path)
+        except OSError:
+            pass #Only costs re-copying after a restart
+
+    def _remove_file(self, name: str) -> None:
+        try:
+            os.remove(os.path.join(self.directory, name))
+        except OSError:
+            pass
+
+    def _drop(self, path: str) -> None:
+        # Caller holds the lock
+        entry = self._entries.pop(path, None)
+        if entry is not None:
+            self._verified.discard(path)
+            self._hashed.discard(path)
+            self._remove_file(entry["file"])
+            self._save_index()
+
+    @property
+    def size(self) -> int:
+        with self._cond:
+            return sum(entry["size"] for entry in self._entries.values())
+
+    def contains(self, path: str) -> bool:
+        with self._cond:
+            return path in self._entries
+
+    def lookup(self, path: str) -> str:
+        with self._cond:
+            entry = self._entries.get(path)
+            if entry is None or path not in self._verified:
+                return path
+            cached = os.path.join(self.directory, entry["file"])
+            if not os.path.exists(cached): #Local, unlike the source
+                self._drop(path)
+                return path
+            self._entries.move_to_end(path)
+        return cached
+
+    def prefetch(self, paths: Iterable[str]) -> None:
+        # Replaces the prefetch window; a copy in progress for a file that
+        # left the window is abandoned. Copies of files entering it are
+        # verified again before lookup() returns them.
+        with self._cond:
+            wanted = list(dict.fromkeys(paths))
+            self._verified.difference_update(set(wanted).difference(self._wanted))
+            self._wanted = wanted
+            self._failed.clear()
+            self._cond.notify_all()
+
+    def wait(self, timeout: float | None = None) -> bool:
+        # Blocks until the current window is copied (or failed)
+        with self._cond:
+            return self._cond.wait_for(lambda: self._next_wanted() is None and self._copying is None, timeout)
+
+    def close(self) -> None:
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+        with self._cond:
+            self._save_index()
+
+    def _next_wanted(self) -> str | None:
+        # Caller holds the lock
+        for path in self._wanted:
+            if path not in self._failed and (path not in self._entries or path not in self._verified):
+                return path
+        return None
+
+    def _make_room(self, size: int) -> bool:
+        # Caller holds the lock. Evicts until `size` more bytes fit.
+        total = sum(entry["size"] for entry in self._entries.values())
+        for path in list(self._entries):
+            if total + size <= self.max_bytes:
+                break
+            if path in self._wanted:
+                continue
+            total -= self._entries[path]["size"]
+            self._drop(path)
+        return total + size <= self.max_bytes
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._closed and (path := self._next_wanted()) is None:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                self._copying = path
+                cached = self._entries.get(path)
+            if cached is not None:
+                ready = self._verify(path, cached)
+            else:
+                entry = self._copy(path)
+                with self._cond:
+                    if entry is None:
+                        self._failed.add(path)
+                    else:
+                        self._entries[path] = entry
+                        self._verified.add(path)
+                        self._hashed.add(path)
+                        self._save_index()
+                ready = entry is not None
+            with self._cond:
+                self._copying = None
+                self._cond.notify_all()
+            if ready and self.on_ready is not None:
+                self.on_ready(path)
+
+    def _verify(self, path: str, entry: dict) -> bool:
+        # A copy that fails is dropped, the next pass copies the file again
+        try:
+            stat = os.stat(path)
+        except OSError:
+            stat = None #Source unreachable, a copy that checks out still plays
+        valid = stat is None or (stat.st_size, stat.st_mtime_ns) == (entry["size"], entry["mtime_ns"])
+        with self._cond:
+            hashed = path in self._hashed
+        if valid and not hashed:
+            valid = _file_digest(os.path.join(self.directory, entry["file"])) == entry["digest"]
+        with self._cond:
+            if self._entries.get(path) is not entry:
+                return False
+            if not valid:
+                self._drop(path)
+                return False
+            self._verified.add(path)
+            self._hashed.add(path)
+        return True
+
+    def _keep_copying(self, path: str) -> bool:
+        with self._cond:
+            return not self._closed and path in self._wanted
+
+    def _throttle(self, copied: int, started: float) -> None:
+        if not self.rate_limit:
+            return
+        delay = copied / self.rate_limit - (time.monotonic() - started)
+        if delay > 0:
+            with self._cond: #close() and prefetch() wake it up early
+                self._cond.wait(delay)
+
+    def _copy(self, path: str) -> dict | None:
+        name = self.cached_name(path)
+        target = os.path.join(self.directory, name)
+        partial = target + ".part"
+        try:
+            with open(path, "rb") as source:
+                before = os.fstat(source.fileno())
+                with self._cond:
+                    if not self._make_room(before.st_size):
+                        return None
+                digest = hashlib.blake2b(digest_size=DIGEST_SIZE)
+                started = time.monotonic()
+                copied = 0
+                with open(partial, "wb") as copy:
+                    while chunk := source.read(self.chunk_size):
+                        copy.write(chunk)
+                        digest.update(chunk)
+                        copied += len(chunk)
+                        if not self._keep_copying(path):
+                            raise InterruptedError
+                        self._throttle(copied, started)
+            after = os.stat(path)
+            if copied != before.st_size or (after.st_size, after.st_mtime_ns) != (before.st_size, before.st_mtime_ns):
+                raise InterruptedError #Changed while being copied
+            os.replace(partial, target)
+        except OSError: #InterruptedError included
+            self._remove_file(os.path.basename(partial))
+            return None
+        return {
+            "path": path,
+            "file": name,
+            "size": before.st_size,
+            "mtime_ns": before.st_mtime_ns,
+            "digest": digest.hexdigest(),
+        }
+
+
+def _file_digest(path: str) -> str | None:
+    digest = hashlib.blake2b(digest_size=DIGEST_SIZE)
+    try:
+        with open(path, "rb") as f:
+            while chunk := f.read(CHUNK_SIZE):
+                digest.update(chunk)
+    except OSError:
+        return None
+    return digest.hexdigest()
@@ -0,0 +1,181 @@
+import functools
+import sqlite3
+import threading
+import time
+from collections import deque
+
+# Opt-in timing for Database methods, window slots and SQL statements.
+# Nothing is wrapped until enable() runs, so the disabled cost is zero;
+# call it before creating Database/MainWindow instances.
+
+BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+SLOW_QUERY_MS = 20.0
+SLOW_QUERY_LOG_SIZE = 100
+
+_enabled = False
+_lock = threading.Lock()
+_stats: dict[str, dict] = {}
+_slow_queries: deque = deque(maxlen=SLOW_QUERY_LOG_SIZE)
+slow_query_ms = SLOW_QUERY_MS
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def enable(*classes: type, slow_ms: float = SLOW_QUERY_MS) -> None:
+    global _enabled, slow_query_ms
+    _enabled = True
+    slow_query_ms = slow_ms
+    for cls in classes:
+        instrument_class(cls)
+
+
+def reset() -> None:
+    with _lock:
+        _stats.clear()
+        _slow_queries.clear()
+
+
+def record(name: str, elapsed_ms: float, rows: int | None = None) -> None:
+    bucket = next((i for i, bound in enumerate(BUCKETS_MS) if elapsed_ms <= bound), len(BUCKETS_MS))
+    with _lock:
+        stats = _stats.get(name)
+        if stats is None:
+            stats = _stats[name] = {
+                "calls": 0, "total_ms": 0.0, "max_ms": 0.0, "rows": 0,
+                "histogram": [0] * (len(BUCKETS_MS) + 1),
+            }
+        stats["calls"] += 1
+        stats["total_ms"] += elapsed_ms
+        stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+        stats["histogram"][bucket] += 1
+        if rows is not None:
+            stats["rows"] += rows
+
+
+def _row_count(result) -> int | None:
+    if isinstance(result, (list, tuple, dict, set)):
+        return len(result)
+    return None
+
+
+def instrument_class(cls: type) -> None:
+    # Wraps every plain method defined on cls (not inherited ones)
+    import inspect
+
+    for name, member in list(vars(cls).items()):
+        if name.startswith("__") or not inspect.isfunction(member):
+            continue
+        if inspect.isgeneratorfunction(member) or getattr(member, "__instrumented__", False):
+            continue
+        setattr(cls, name, _timed(member, f"{cls.__name__}.{name}"))
+
+
+def _timed(fn, name: str):
+    # Qt calls slots with every signal argument and drops the ones a plain
+    # function can't take; the wrapper has to do the same
+    import inspect
+
+    parameters = inspect.signature(fn).parameters.values()
+    if any(p.kind == p.VAR_POSITIONAL for p in parameters):
+        max_args = None
+    else:
+        max_args = sum(1 for p in parameters if p.kind in (p.POSITIONAL_ONLY, p.POSITIONAL_OR_KEYWORD))
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        if max_args is not None:
+            args = args[:max_args]
+        start = time.perf_counter()
+        try:
+            result = fn(*args, **kwargs)
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+        record(name, elapsed_ms, _row_count(result))
+        return result
+
+    wrapper.__instrumented__ = True
+    return wrapper
+
+
+class TimedConnection(sqlite3.Connection):
+    # Connection factory used while instrumentation is enabled. Statements
+    # slower than slow_query_ms are logged together with their query plan.
+
+    def execute(self, sql: str, parameters=(), /) -> sqlite3.Cursor:
+        start = time.perf_counter()
+        cursor = super().execute(sql, parameters)
+        self._record(sql, parameters, start, cursor)
+        return cursor
+
+    def executemany(self, sql: str, parameters, /) -> sqlite3.Cursor:
+        start = time.perf_counter()
+        cursor = super().executemany(sql, parameters)
+        self._record(sql, None, start, cursor)
+        return cursor
+
+    def _record(self, sql: str, parameters, start: float, cursor: sqlite3.Cursor) -> None:
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        statement = " ".join(sql.split())
+        rows = cursor.rowcount if cursor.rowcount >= 0 else None
+        record(f"sql: {statement[:80]}", elapsed_ms, rows)
+        if elapsed_ms < slow_query_ms:
+            return
+
+        plan = []
+        if statement.upper().startswith(("SELECT", "WITH", "INSERT", "UPDATE", "DELETE")):
+            try:
+                plan = [row[3] for row in super().execute(f"EXPLAIN QUERY PLAN {sql}", parameters or ())]
+            except sqlite3.Error:
+                pass
+        with _lock:
+            _slow_queries.append({
+                "sql": statement,
+                "params": repr(parameters)[:200] if parameters is not None else "executemany",
+                "elapsed_ms": round(elapsed_ms, 3),
+                "plan": plan,
+                "at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            })
+
+
+def snapshot() -> dict:
+    with _lock:
+        timings = {}
+        for name, stats in sorted(_stats.items(), key=lambda item: -item[1]["total_ms"]):
+            timings[name] = dict(
+                stats,
+                total_ms=round(stats["total_ms"], 3),
+                max_ms=round(stats["max_ms"], 3),
+                mean_ms=round(stats["total_ms"] / stats["calls"], 3),
+                histogram=list(stats["histogram"]),
+            )
+        return {
+            "enabled": _enabled,
+            "buckets_ms": list(BUCKETS_MS) + ["inf"],
+            "slow_query_ms": slow_query_ms,
+            "timings": timings,
+            "slow_queries": list(_slow_queries),
+        }
+
+
+def report(limit: int = 25) -> str:
+    data = snapshot()
+    lines = [f"{'calls':>7} {'mean ms':>9} {'max ms':>9} {'rows':>8}  name"]
+    for name, stats in list(data["timings"].items())[:limit]:
+        lines.append(f"{stats['calls']:>7} {stats['mean_ms']:>9.3f} {stats['max_ms']:>9.3f} {stats['rows']:>8}  {name}")
+    if data["slow_queries"]:
+        lines.append("")
+        lines.append(f"Slow queries (over {data['slow_query_ms']} ms):")
+        for query in data["slow_queries"][-10:]:
+            lines.append(f"{query['elapsed_ms']:.1f} ms  {query['sql'][:120]}")
+            for step in query["plan"]:
+                lines.append(f"    {step}")
+    return "\n".join(lines)
+
+
+def dump(file_path: str) -> None:
+    import json
+
+    with open(file_path, "w", encoding="utf-8") as f:
+        json.dump(snapshot(), f, indent=2)
@@ -0,0 +1,61 @@
+import os
+from collections.abc import Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from src.logic.database import Database
+from src.logic.tags import TrackMetadata, read_metadata
+
+
+def read_metadata_in_chunks(
+    file_paths: list[str],
+    chunk_size: int = 500,
+    workers: int | None = None,
+    is_cancelled: Callable[[], bool] | None = None,
+) -> Iterator[list[TrackMetadata]]:
+    # Tags are parsed on a worker pool while finished results are handed
+    # out in chunks, so the caller can write each chunk in one transaction.
+    total = len(file_paths)
+    batch = []
+    pool = ThreadPoolExecutor(max_workers=workers)
+    try:
+        for done, song in enumerate(pool.map(read_metadata, file_paths), 1):
+            batch.append(song)
+            cancelled = is_cancelled is not None and is_cancelled()
+            if len(batch) >= chunk_size or done == total or cancelled:
+                yield batch
+                batch = []
+            if cancelled:
+                break
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def import_files(
+    database: Database,
+    file_paths: list[str],
+    chunk_size: int = 500,
+    workers: int | None = None,
+    progress: Callable[[int, int], None] | None = None,
+    is_cancelled: Callable[[], bool] | None = None,
+) -> int:
+    # Returns the number of songs that were not in the library yet. Files
+    # whose size and mtime match the last time their tags were read are
+    # not opened again.
+    total = len(file_paths)
+    known = database.get_file_stats(file_paths)
+    changed = {}
+    for path in file_paths:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        if known.get(path) != (stat.st_size, stat.st_mtime_ns):
+            changed[path] = (stat.st_size, stat.st_mtime_ns)
+
+    added = 0
+    done = total - len(changed)
+    for chunk in read_metadata_in_chunks(list(changed), chunk_size, workers, is_cancelled):
+        added += database.save_scanned_songs((song, *changed[song.file_path]) for song in chunk)
+        done += len(chunk)
+        if progress is not None:
+            progress(done, total)
+    return added
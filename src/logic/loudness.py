@@ -0,0 +1,241 @@
+import math
+import multiprocessing
+import os
+import shutil
+import subprocess
+import wave
+from collections.abc import Callable
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+from itertools import islice
+from src.logic.database import Database
+
+# Integrated loudness and sample peak per ITU-R BS.1770. Each 100 ms
+# sub-block is K-weighted in the frequency domain (its power spectrum times
+# the filter's squared magnitude response, summed per Parseval), so a whole
+# track is a handful of batched FFTs instead of a per-sample IIR filter.
+# 400 ms gating blocks with 75% overlap are the mean of four sub-blocks.
+# numpy is only imported by the analysis itself, which runs in worker
+# processes; playback only needs gain_factor().
+
+TARGET_LUFS = -18.0
+SUB_BLOCK_SECONDS = 0.1
+SUB_BLOCKS_PER_BLOCK = 4
+SUB_BLOCKS_PER_FFT = 600
+ABSOLUTE_GATE_LUFS = -70.0
+RELATIVE_GATE_LU = -10.0
+DECODE_RATE = 48000
+PAGE_SIZE = 5000
+SAVE_EVERY = 64
+
+
+@dataclass
+class LoudnessResult:
+    analyzed: int = 0
+    failed: int = 0
+    missing: int = 0
+    no_decoder: int = 0 #Not saved, analyzed once ffmpeg is installed
+
+
+class DecoderMissing(Exception):
+    pass
+
+
+def gain_factor(loudness: float | None, peak: float | None, target: float = TARGET_LUFS) -> float:
+    # Linear gain bringing a track to target loudness without pushing its
+    # peak above full scale
+    if loudness is None or peak is None:
+        return 1.0
+    gain = 10 ** ((target - loudness) / 20)
+    if peak > 0:
+        gain = min(gain, 1.0 / peak)
+    return gain
+
+
+def _read_wav(path: str):
+    import numpy as np
+
+    with wave.open(path, "rb") as f:
+        channels, width, rate = f.getnchannels(), f.getsampwidth(), f.getframerate()
+        data = f.readframes(f.getnframes())
+    if width == 1:
+        samples = (np.frombuffer(data, np.uint8).astype(np.float32) - 128) / 128
+    elif width == 2:
+        samples = np.frombuffer(data, "<i2").astype(np.float32) / 32768
+    elif width == 3:
+        raw = np.frombuffer(data, np.uint8).reshape(-1, 3).astype(np.int32)
+        ints = raw[:, 0] | (raw[:, 1] << 8) | (raw[:, 2] << 16)
+        samples = ((ints << 8) >> 8).astype(np.float32) / 8388608
+    elif width == 4:
+        samples = np.frombuffer(data, "<i4").astype(np.float32) / 2147483648
+    else:
+        raise ValueError(f"Unsupported sample width: {width}")
+    return samples.reshape(-1, channels), rate
+
+
+def _read_ffmpeg(path: str):
+    import numpy as np
+
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg is None:
+        raise DecoderMissing("ffmpeg is needed to decode this format")
+    command = [ffmpeg, "-v", "error", "-nostdin", "-i", path, "-f", "f32le", "-ac", "2", "-ar", str(DECODE_RATE), "-"]
+    output = subprocess.run(command, capture_output=True, check=True).stdout
+    return np.frombuffer(output, "<f4").reshape(-1, 2), DECODE_RATE
+
+
+def decode(path: str):
+    # Returns (samples as float32 frames x channels in [-1, 1], sample rate).
+    # WAV is read directly, anything else goes through ffmpeg if installed.
+    if path.lower().endswith(".wav"):
+        try:
+            return _read_wav(path)
+        except (wave.Error, EOFError):
+            pass #Not plain PCM, let ffmpeg try
+    return _read_ffmpeg(path)
+
+
+def _biquad_power(b: tuple, a: tuple, w):
+    import numpy as np
+
+    z = np.exp(-1j * w)
+    h = (b[0] + b[1] * z + b[2] * z ** 2) / (a[0] + a[1] * z + a[2] * z ** 2)
+    return np.abs(h) ** 2
+
+
+def k_weighting(rate: int, size: int):
+    # Squared magnitude response of the BS.1770 pre-filter (high shelf then
+    # high pass) at the rfft bins of a size-sample block. The filters are
+    # designed for any sample rate; at 48 kHz they match the coefficients
+    # published in the standard.
+    import numpy as np
+
+    w = 2 * np.pi * np.fft.rfftfreq(size, 1 / rate) / rate
+
+    gain, q, fc = 3.999843853973347, 0.7071752369554196, 1681.974450955533
+    k = math.tan(math.pi * fc / rate)
+    vh = 10 ** (gain / 20)
+    vb = vh ** 0.4996667741545416
+    shelf = _biquad_power(
+        (vh + vb * k / q + k * k, 2 * (k * k - vh), vh - vb * k / q + k * k),
+        (1 + k / q + k * k, 2 * (k * k - 1), 1 - k / q + k * k),
+        w,
+    )
+
+    q, fc = 0.5003270373253953, 38.13547087613982
+    k = math.tan(math.pi * fc / rate)
+    a0 = 1 + k / q + k * k
+    high_pass = _biquad_power((a0, -2 * a0, a0), (a0, 2 * (k * k - 1), 1 - k / q + k * k), w)
+    return shelf * high_pass
+
+
+def measure(samples, rate: int) -> tuple[float | None, float]:
+    # Returns (integrated loudness in LUFS or None for silence, sample peak)
+    import numpy as np
+
+    peak = float(np.max(np.abs(samples))) if samples.size else 0.0
+    size = int(rate * SUB_BLOCK_SECONDS)
+    count = len(samples) // size
+    if count < SUB_BLOCKS_PER_BLOCK:
+        return None, peak
+
+    # Parseval over the one-sided spectrum: interior bins count twice
+    weights = k_weighting(rate, size)
+    weights[1:(size + 1) // 2] *= 2
+    weights /= size * size
+
+    power = np.empty(count)
+    for start in range(0, count, SUB_BLOCKS_PER_FFT):
+        stop = min(start + SUB_BLOCKS_PER_FFT, count)
+        blocks = samples[start * size:stop * size].reshape(stop - start, size, -1)
+        spectrum = np.fft.rfft(blocks, axis=1)
+        power[start:stop] = np.einsum("bfc,f->b", spectrum.real ** 2 + spectrum.imag ** 2, weights)
+
+    windows = np.lib.stride_tricks.sliding_window_view(power, SUB_BLOCKS_PER_BLOCK)
+    blocks = windows.mean(axis=1)
+    with np.errstate(divide="ignore"):
+        levels = -0.691 + 10 * np.log10(blocks)
+    gated = blocks[levels > ABSOLUTE_GATE_LUFS]
+    if not gated.size:
+        return None, peak
+    threshold = -0.691 + 10 * np.log10(gated.mean()) + RELATIVE_GATE_LU
+    gated = blocks[(levels > ABSOLUTE_GATE_LUFS) & (levels > threshold)]
+    return float(-0.691 + 10 * np.log10(gated.mean())), peak
+
+
+def analyze_file(path: str) -> tuple[float | None, float | None]:
+    # Worker entry point. (None, None) means the file couldn't be decoded;
+    # DecoderMissing is raised when it can't be tried at all.
+    try:
+        samples, rate = decode(path)
+    except (OSError, ValueError, subprocess.CalledProcessError):
+        return None, None
+    return measure(samples, rate)
+
+
+def _pending(database: Database, result: LoudnessResult):
+    # (song_id, path, size, mtime_ns) of songs never analyzed or changed since
+    after_id = 0
+    while page := database.get_loudness_state(after_id, PAGE_SIZE):
+        after_id = page[-1][0]
+        for song_id, path, size, mtime_ns in page:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                result.missing += 1
+                continue
+            if (stat.st_size, stat.st_mtime_ns) != (size, mtime_ns):
+                yield song_id, path, stat.st_size, stat.st_mtime_ns
+
+
+def analyze_library(
+    database: Database,
+    workers: int | None = None,
+    progress: Callable[[int, int], None] | None = None,
+    is_cancelled: Callable[[], bool] | None = None,
+) -> LoudnessResult:
+    # One track per task on every core, with a few tasks queued per worker.
+    # Results are saved every SAVE_EVERY tracks, so a cancelled run resumes
+    # where it stopped.
+    result = LoudnessResult()
+    pending = list(_pending(database, result))
+    workers = workers or os.cpu_count() or 1
+    queued = iter(pending)
+    in_flight = {}
+    rows = []
+    done = 0
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        try:
+            while True:
+                for song_id, path, size, mtime_ns in islice(queued, 4 * workers - len(in_flight)):
+                    in_flight[pool.submit(analyze_file, path)] = (song_id, size, mtime_ns)
+                if not in_flight:
+                    break
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    key = in_flight.pop(future)
+                    try:
+                        loudness, peak = future.result()
+                    except DecoderMissing:
+                        result.no_decoder += 1
+                        continue
+                    rows.append((*key, loudness, peak))
+                    if peak is None:
+                        result.failed += 1
+                    else:
+                        result.analyzed += 1
+                done += len(finished)
+                if len(rows) >= SAVE_EVERY:
+                    database.save_loudness(rows)
+                    rows = []
+                if progress is not None:
+                    progress(done, len(pending))
+                if is_cancelled is not None and is_cancelled():
+                    break
+        finally:
+            for future in in_flight:
+                future.cancel()
+            if rows:
+                database.save_loudness(rows)
+    return result
@@ -0,0 +1,484 @@
+import sqlite3
+from collections.abc import Callable
+from src.logic.normalize import match_key
+
+
+def _create_base_schema(conn: sqlite3.Connection) -> None:
+    # Databases created before versioning already have some of these tables
+    query_songs = """
+    CREATE TABLE IF NOT EXISTS songs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        title TEXT NOT NULL,
+        artist TEXT,
+        genre TEXT,
+        file_path TEXT NOT NULL UNIQUE,
+        play_count INTEGER DEFAULT 0
+    );
+    """
+
+    query_playlists = """
+    CREATE TABLE IF NOT EXISTS playlists (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL UNIQUE
+    );
+    """
+
+    query_playlist_songs = """
+    CREATE TABLE IF NOT EXISTS playlist_songs (
+        playlist_id INTEGER,
+        song_id INTEGER,
+        FOREIGN KEY(playlist_id) REFERENCES playlists(id),
+        FOREIGN KEY(song_id) REFERENCES songs(id)
+    );
+    """
+
+    query_watch_folders = """
+    CREATE TABLE IF NOT EXISTS watch_folders (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        path TEXT NOT NULL UNIQUE
+    );
+    """
+
+    query_file_index = """
+    CREATE TABLE IF NOT EXISTS file_index (
+        file_path TEXT PRIMARY KEY,
+        size INTEGER NOT NULL,
+        mtime_ns INTEGER NOT NULL,
+        FOREIGN KEY(file_path) REFERENCES songs(file_path)
+    ) WITHOUT ROWID;
+    """
+
+    conn.execute(query_songs)
+    conn.execute(query_playlists)
+    conn.execute(query_playlist_songs)
+    conn.execute(query_watch_folders)
+    conn.execute(query_file_index)
+
+
+def _order_playlist_songs(conn: sqlite3.Connection) -> None:
+    # Playlist entries get a position and a (playlist_id, position) key.
+    # Existing entries keep their insertion order; dangling ones are dropped.
+    query_playlist_songs = """
+    CREATE TABLE playlist_songs_new (
+        playlist_id INTEGER NOT NULL,
+        position INTEGER NOT NULL,
+        song_id INTEGER NOT NULL,
+        PRIMARY KEY(playlist_id, position),
+        FOREIGN KEY(playlist_id) REFERENCES playlists(id) ON DELETE CASCADE,
+        FOREIGN KEY(song_id) REFERENCES songs(id) ON DELETE CASCADE
+    ) WITHOUT ROWID;
+    """
+
+    query_copy = """
+    INSERT INTO playlist_songs_new (playlist_id, position, song_id)
+    SELECT link.playlist_id,
+           ROW_NUMBER() OVER (PARTITION BY link.playlist_id ORDER BY link.rowid) - 1,
+           link.song_id
+    FROM playlist_songs link
+    JOIN playlists p ON p.id = link.playlist_id
+    JOIN songs s ON s.id = link.song_id
+    """
+
+    conn.execute(query_playlist_songs)
+    conn.execute(query_copy)
+    conn.execute("DROP TABLE playlist_songs")
+    conn.execute("ALTER TABLE playlist_songs_new RENAME TO playlist_songs")
+    conn.execute("CREATE INDEX playlist_songs_song ON playlist_songs (song_id)")
+
+
+def _add_play_log(conn: sqlite3.Connection) -> None:
+    # Every play is logged with its time. Triggers keep songs.play_count,
+    # all-time totals and per-day counts (by song, artist and genre) up to
+    # date, so statistics never aggregate over the whole library.
+    query_plays = """
+    CREATE TABLE plays (
+        id INTEGER PRIMARY KEY,
+        song_id INTEGER NOT NULL,
+        played_at INTEGER NOT NULL,
+        FOREIGN KEY(song_id) REFERENCES songs(id) ON DELETE CASCADE
+    );
+    """
+
+    query_totals = """
+    CREATE TABLE play_totals (
+        dimension TEXT NOT NULL,
+        key,
+        plays INTEGER NOT NULL,
+        PRIMARY KEY(dimension, key)
+    ) WITHOUT ROWID;
+    """
+
+    query_daily = """
+    CREATE TABLE daily_plays (
+        dimension TEXT NOT NULL,
+        day TEXT NOT NULL,
+        key,
+        plays INTEGER NOT NULL,
+        PRIMARY KEY(dimension, day, key)
+    ) WITHOUT ROWID;
+    """
+
+    query_trigger = """
+    CREATE TRIGGER plays_aggregate AFTER INSERT ON plays BEGIN
+        UPDATE songs SET play_count = play_count + 1 WHERE id = new.song_id;
+
+        INSERT INTO play_totals (dimension, key, plays)
+        SELECT 'artist', artist, 1 FROM songs WHERE id = new.song_id
+        UNION ALL
+        SELECT 'genre', genre, 1 FROM songs WHERE id = new.song_id
+        ON CONFLICT(dimension, key) DO UPDATE SET plays = plays + 1;
+
+        INSERT INTO daily_plays (dimension, day, key, plays)
+        SELECT 'song', date(new.played_at, 'unixepoch', 'localtime'), new.song_id, 1
+        UNION ALL
+        SELECT 'artist', date(new.played_at, 'unixepoch', 'localtime'), artist, 1
+        FROM songs WHERE id = new.song_id
+        UNION ALL
+        SELECT 'genre', date(new.played_at, 'unixepoch', 'localtime'), genre, 1
+        FROM songs WHERE id = new.song_id
+        ON CONFLICT(dimension, day, key) DO UPDATE SET plays = plays + 1;
+    END;
+    """
+
+    # Plays counted before the log existed have no time, so they only
+    # seed the all-time totals
+    query_seed = """
+    INSERT INTO play_totals (dimension, key, plays)
+    SELECT 'artist', artist, SUM(play_count) FROM songs GROUP BY artist
+    UNION ALL
+    SELECT 'genre', genre, SUM(play_count) FROM songs GROUP BY genre
+    """
+
+    conn.execute(query_plays)
+    conn.execute("CREATE INDEX plays_song ON plays (song_id)")
+    conn.execute(query_totals)
+    conn.execute("CREATE INDEX play_totals_rank ON play_totals (dimension, plays)")
+    conn.execute(query_daily)
+    conn.execute("CREATE INDEX songs_play_count ON songs (play_count)")
+    conn.execute(query_trigger)
+    conn.execute(query_seed)
+
+
+def _add_match_keys(conn: sqlite3.Connection) -> None:
+    # Normalized title/artist keys let playlist imports match songs with an
+    # index lookup. They are computed in Python, so existing rows are
+    # backfilled here and Database fills them on every insert.
+    conn.execute("ALTER TABLE songs ADD COLUMN title_key TEXT NOT NULL DEFAULT ''")
+    conn.execute("ALTER TABLE songs ADD COLUMN artist_key TEXT NOT NULL DEFAULT ''")
+    rows = conn.execute("SELECT id, title, artist FROM songs").fetchall()
+    conn.executemany(
+        "UPDATE songs SET title_key = ?, artist_key = ? WHERE id = ?",
+        ((match_key(title), match_key(artist), song_id) for song_id, title, artist in rows)
+    )
+    conn.execute("CREATE INDEX songs_match_key ON songs (title_key, artist_key)")
+
+
+def _add_content_hashes(conn: sqlite3.Connection) -> None:
+    # Content hashes for duplicate detection. file_size/file_mtime_ns are the
+    # stat the hashes were computed from, so unchanged files are not reread.
+    # partial_hash covers size plus head and tail, content_hash the whole
+    # file and is only computed when partial hashes collide.
+    # Paths of songs merged into another one are kept in song_aliases, so
+    # scans and imports don't add them again.
+    query_aliases = """
+    CREATE TABLE song_aliases (
+        file_path TEXT PRIMARY KEY,
+        song_id INTEGER NOT NULL,
+        FOREIGN KEY(song_id) REFERENCES songs(id) ON DELETE CASCADE
+    ) WITHOUT ROWID;
+    """
+
+    conn.execute("ALTER TABLE songs ADD COLUMN file_size INTEGER")
+    conn.execute("ALTER TABLE songs ADD COLUMN file_mtime_ns INTEGER")
+    conn.execute("ALTER TABLE songs ADD COLUMN partial_hash BLOB")
+    conn.execute("ALTER TABLE songs ADD COLUMN content_hash BLOB")
+    conn.execute("CREATE INDEX songs_partial_hash ON songs (partial_hash)")
+    conn.execute("CREATE INDEX songs_content_hash ON songs (content_hash)")
+    conn.execute(query_aliases)
+    conn.execute("CREATE INDEX song_aliases_song ON song_aliases (song_id)")
+
+
+def _add_loudness(conn: sqlite3.Connection) -> None:
+    # Loudness analysis per song with the stat it was computed from.
+    # loudness is NULL for silent tracks, both values are NULL when the file
+    # couldn't be decoded; either way it is only retried once the file changes.
+    # Files that need a missing decoder aren't stored, see _retry_failed_loudness.
+    query_loudness = """
+    CREATE TABLE song_loudness (
+        song_id INTEGER PRIMARY KEY,
+        file_size INTEGER NOT NULL,
+        file_mtime_ns INTEGER NOT NULL,
+        loudness REAL,
+        peak REAL,
+        FOREIGN KEY(song_id) REFERENCES songs(id) ON DELETE CASCADE
+    );
+    """
+    conn.execute(query_loudness)
+
+
+def _add_track_details(conn: sqlite3.Connection) -> None:
+    # Album, duration, track number, year and bitrate from the tags. The
+    # columns are NOT NULL so (column, ..., id) keyset pagination works.
+    # Clearing file_index makes the next rescan read every file once to
+    # fill them in; after that unchanged files are skipped again.
+    conn.execute("ALTER TABLE songs ADD COLUMN album TEXT NOT NULL DEFAULT ''")
+    conn.execute("ALTER TABLE songs ADD COLUMN duration REAL NOT NULL DEFAULT 0")
+    conn.execute("ALTER TABLE songs ADD COLUMN track INTEGER NOT NULL DEFAULT 0")
+    conn.execute("ALTER TABLE songs ADD COLUMN year INTEGER NOT NULL DEFAULT 0")
+    conn.execute("ALTER TABLE songs ADD COLUMN bitrate INTEGER NOT NULL DEFAULT 0")
+    conn.execute("CREATE INDEX songs_album ON songs (album, track)")
+    conn.execute("CREATE INDEX songs_artist_album ON songs (artist_key, album, track)")
+    conn.execute("CREATE INDEX songs_year ON songs (year, album, track)")
+    conn.execute("CREATE INDEX songs_duration ON songs (duration)")
+    conn.execute("DELETE FROM file_index")
+
+
+def _add_song_affinity(conn: sqlite3.Connection) -> None:
+    # Sparse song-to-song affinity for radio, stored symmetrically (a row
+    # for (a, b) and one for (b, a)) so a song's neighbours are one range
+    # of the primary key. Songs up to `window` places apart in a playlist
+    # add 1 / distance, songs played back to back less than `gap` seconds
+    # apart add 0.5. Triggers keep it current as playlist entries come and
+    # go and plays are logged; merge_songs moves it to the kept song.
+    window, gap = 10, 1800
+    query_affinity = """
+    CREATE TABLE song_affinity (
+        song_a INTEGER NOT NULL,
+        song_b INTEGER NOT NULL,
+        weight REAL NOT NULL,
+        PRIMARY KEY(song_a, song_b),
+        FOREIGN KEY(song_a) REFERENCES songs(id) ON DELETE CASCADE,
+        FOREIGN KEY(song_b) REFERENCES songs(id) ON DELETE CASCADE
+    ) WITHOUT ROWID;
+    """
+
+    # Playlists are written in position order, so each pair is counted
+    # once, when its later entry is inserted, and removed once on delete
+    query_playlist_insert = f"""
+    CREATE TRIGGER playlist_affinity_insert AFTER INSERT ON playlist_songs BEGIN
+        INSERT INTO song_affinity (song_a, song_b, weight)
+        SELECT * FROM (
+            SELECT new.song_id, song_id, 1.0 / ABS(position - new.position)
+            FROM playlist_songs
+            WHERE playlist_id = new.playlist_id
+              AND position BETWEEN new.position - {window} AND new.position + {window}
+              AND position != new.position AND song_id != new.song_id
+            UNION ALL
+            SELECT song_id, new.song_id, 1.0 / ABS(position - new.position)
+            FROM playlist_songs
+            WHERE playlist_id = new.playlist_id
+              AND position BETWEEN new.position - {window} AND new.position + {window}
+              AND position != new.position AND song_id != new.song_id
+        ) WHERE 1
+        ON CONFLICT(song_a, song_b) DO UPDATE SET weight = weight + excluded.weight;
+    END;
+    """
+
+    query_playlist_delete = f"""
+    CREATE TRIGGER playlist_affinity_delete AFTER DELETE ON playlist_songs BEGIN
+        UPDATE song_affinity
+        SET weight = weight - (
+            SELECT SUM(1.0 / ABS(position - old.position))
+            FROM playlist_songs
+            WHERE playlist_id = old.playlist_id
+              AND position BETWEEN old.position - {window} AND old.position + {window}
+              AND song_id = song_affinity.song_b
+        )
+        WHERE song_a = old.song_id AND song_b IN (
+            SELECT song_id FROM playlist_songs
+            WHERE playlist_id = old.playlist_id
+              AND position BETWEEN old.position - {window} AND old.position + {window}
+        );
+        UPDATE song_affinity
+        SET weight = weight - (
+            SELECT SUM(1.0 / ABS(position - old.position))
+            FROM playlist_songs
+            WHERE playlist_id = old.playlist_id
+              AND position BETWEEN old.position - {window} AND old.position + {window}
+              AND song_id = song_affinity.song_a
+        )
+        WHERE song_b = old.song_id AND song_a IN (
+            SELECT song_id FROM playlist_songs
+            WHERE playlist_id = old.playlist_id
+              AND position BETWEEN old.position - {window} AND old.position + {window}
+        );
+        DELETE FROM song_affinity
+        WHERE weight < 1e-9 AND song_a = old.song_id;
+        DELETE FROM song_affinity
+        WHERE weight < 1e-9 AND song_b = old.song_id AND song_a IN (
+            SELECT song_id FROM playlist_songs
+            WHERE playlist_id = old.playlist_id
+              AND position BETWEEN old.position - {window} AND old.position + {window}
+        );
+    END;
+    """
+
+    query_plays = f"""
+    CREATE TRIGGER plays_affinity AFTER INSERT ON plays BEGIN
+        INSERT INTO song_affinity (song_a, song_b, weight)
+        SELECT * FROM (
+            SELECT new.song_id, song_id, 0.5 FROM (
+                SELECT song_id, played_at FROM plays WHERE id < new.id ORDER BY id DESC LIMIT 1
+            ) WHERE song_id != new.song_id AND new.played_at - played_at BETWEEN 0 AND {gap}
+            UNION ALL
+            SELECT song_id, new.song_id, 0.5 FROM (
+                SELECT song_id, played_at FROM plays WHERE id < new.id ORDER BY id DESC LIMIT 1
+            ) WHERE song_id != new.song_id AND new.played_at - played_at BETWEEN 0 AND {gap}
+        ) WHERE 1
+        ON CONFLICT(song_a, song_b) DO UPDATE SET weight = weight + excluded.weight;
+    END;
+    """
+
+    query_seed_playlists = f"""
+    INSERT INTO song_affinity (song_a, song_b, weight)
+    SELECT a.song_id, b.song_id, SUM(1.0 / ABS(a.position - b.position))
+    FROM playlist_songs a
+    JOIN playlist_songs b
+      ON b.playlist_id = a.playlist_id
+     AND b.position BETWEEN a.position - {window} AND a.position + {window}
+    WHERE b.position != a.position AND b.song_id != a.song_id
+    GROUP BY a.song_id, b.song_id
+    """
+
+    query_seed_plays = f"""
+    WITH sessions AS (
+        SELECT song_id, previous FROM (
+            SELECT song_id, played_at,
+                   LAG(song_id) OVER (ORDER BY id) AS previous,
+                   LAG(played_at) OVER (ORDER BY id) AS previous_at
+            FROM plays
+        )
+        WHERE previous != song_id AND played_at - previous_at BETWEEN 0 AND {gap}
+    )
+    INSERT INTO song_affinity (song_a, song_b, weight)
+    SELECT * FROM (
+        SELECT song_id, previous, 0.5 FROM sessions
+        UNION ALL
+        SELECT previous, song_id, 0.5 FROM sessions
+    ) WHERE 1
+    ON CONFLICT(song_a, song_b) DO UPDATE SET weight = weight + excluded.weight
+    """
+
+    conn.execute(query_affinity)
+    conn.execute(query_seed_playlists)
+    conn.execute(query_seed_plays)
+    conn.execute("CREATE INDEX song_affinity_rank ON song_affinity (song_a, weight)")
+    conn.execute("CREATE INDEX song_affinity_song_b ON song_affinity (song_b)")
+    conn.execute("CREATE INDEX songs_genre_plays ON songs (genre, play_count)")
+    conn.execute(query_playlist_insert)
+    conn.execute(query_playlist_delete)
+    conn.execute(query_plays)
+
+
+def _add_smart_playlists(conn: sqlite3.Connection) -> None:
+    # Smart playlists keep their rules as text (see smart_playlists) and
+    # the ids they last evaluated to in smart_playlist_songs. `columns` are
+    # the songs columns the rules and order read, `params` the parameters
+    # of that evaluation. Triggers mark a playlist stale when a song is
+    # added, when one it contains is removed, or when one of its columns
+    # changes value; anything else leaves the cached ids valid.
+    # added_at is unknown (0) for songs added before this version.
+    query_smart_playlists = """
+    CREATE TABLE smart_playlists (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL UNIQUE,
+        definition TEXT NOT NULL,
+        columns TEXT NOT NULL DEFAULT '',
+        params TEXT,
+        stale INTEGER NOT NULL DEFAULT 1
+    );
+    """
+
+    query_smart_playlist_songs = """
+    CREATE TABLE smart_playlist_songs (
+        playlist_id INTEGER NOT NULL,
+        position INTEGER NOT NULL,
+        song_id INTEGER NOT NULL,
+        PRIMARY KEY(playlist_id, position),
+        FOREIGN KEY(playlist_id) REFERENCES smart_playlists(id) ON DELETE CASCADE
+    ) WITHOUT ROWID;
+    """
+
+    query_last_played = """
+    CREATE TRIGGER plays_last_played AFTER INSERT ON plays BEGIN
+        UPDATE songs SET last_played = new.played_at
+        WHERE id = new.song_id AND last_played < new.played_at;
+    END;
+    """
+
+    query_song_insert = """
+    CREATE TRIGGER smart_playlists_song_insert AFTER INSERT ON songs BEGIN
+        UPDATE smart_playlists SET stale = 1 WHERE stale = 0;
+    END;
+    """
+
+    query_song_delete = """
+    CREATE TRIGGER smart_playlists_song_delete AFTER DELETE ON songs BEGIN
+        UPDATE smart_playlists SET stale = 1
+        WHERE stale = 0 AND id IN (SELECT playlist_id FROM smart_playlist_songs WHERE song_id = old.id);
+    END;
+    """
+
+    changed = " OR ".join(
+        f"(old.{column} IS NOT new.{column} AND columns LIKE '%,{column},%')"
+        for column in ("genre", "artist_key", "album", "track", "year", "play_count", "added_at", "last_played")
+    )
+    query_song_update = f"""
+    CREATE TRIGGER smart_playlists_song_update
+    AFTER UPDATE OF genre, artist_key, album, track, year, play_count, added_at, last_played ON songs BEGIN
+        UPDATE smart_playlists SET stale = 1 WHERE stale = 0 AND ({changed});
+    END;
+    """
+
+    query_backfill = """
+    UPDATE songs SET last_played = (SELECT MAX(played_at) FROM plays WHERE song_id = songs.id)
+    WHERE id IN (SELECT song_id FROM plays)
+    """
+
+    conn.execute("ALTER TABLE songs ADD COLUMN added_at INTEGER NOT NULL DEFAULT 0")
+    conn.execute("ALTER TABLE songs ADD COLUMN last_played INTEGER NOT NULL DEFAULT 0")
+    conn.execute(query_backfill)
+    conn.execute("CREATE INDEX songs_added_at ON songs (added_at)")
+    conn.execute("CREATE INDEX songs_last_played ON songs (last_played)")
+    conn.execute(query_smart_playlists)
+    conn.execute(query_smart_playlist_songs)
+    conn.execute("CREATE INDEX smart_playlist_songs_song ON smart_playlist_songs (song_id)")
+    conn.execute(query_last_played)
+    conn.execute(query_song_insert)
+    conn.execute(query_song_delete)
+    conn.execute(query_song_update)
+
+
+def _retry_failed_loudness(conn: sqlite3.Connection) -> None:
+    # Failures used to be stored even when ffmpeg wasn't installed, which
+    # kept those files from ever being analyzed. They are analyzed again
+    # once; failures caused by a missing decoder are no longer stored.
+    conn.execute("DELETE FROM song_loudness WHERE peak IS NULL")
+
+
+# MIGRATIONS[n] upgrades a database from user_version n to n + 1.
+# Append new steps at the end, never edit or reorder released ones.
+MIGRATIONS: tuple[Callable[[sqlite3.Connection], None], ...] = (
+    _create_base_schema,
+    _order_playlist_songs,
+    _add_play_log,
+    _add_match_keys,
+    _add_content_hashes,
+    _add_loudness,
+    _add_track_details,
+    _add_song_affinity,
+    _add_smart_playlists,
+    _retry_failed_loudness,
+)
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def migrate(conn: sqlite3.Connection) -> int:
+    # Runs inside the caller's transaction, so a failed step leaves the
+    # database at its previous version. Returns the version found on disk.
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    for target in range(version + 1, SCHEMA_VERSION + 1):
+        MIGRATIONS[target - 1](conn)
+        conn.execute(f"PRAGMA user_version = {target}")
+    return version
@@ -0,0 +1,14 @@
+import re
+import unicodedata
+
+_NOT_WORD = re.compile(r"[\W_]+")
+
+
+def match_key(text: str | None) -> str:
+    # Case-folded, accent- and punctuation-free form used to match songs
+    # by title and artist: "Beyoncé - Halo!" -> "beyonce halo"
+    if not text:
+        return ""
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return _NOT_WORD.sub(" ", text.casefold()).strip()
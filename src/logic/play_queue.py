@@ -0,0 +1,124 @@
+import random
+from array import array
+from collections.abc import Iterable, Iterator
+
+
+class PlayQueue:
+    # Songs are kept as an id array in the order they were queued plus a
+    # permutation of that array giving the play order. Rows are positions in
+    # play order. Shuffling only permutes the play order, so unshuffle()
+    # restores the queued order.
+
+    def __init__(self) -> None:
+        self._ids = array("q")
+        self._songs: dict[int, tuple] = {}
+        self._order: list[int] = []
+        self.current = -1
+        self.shuffled = False
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def song_at(self, row: int) -> tuple:
+        return self._songs[self._ids[self._order[row]]]
+
+    def songs(self) -> Iterator[tuple]:
+        for index in self._order:
+            yield self._songs[self._ids[index]]
+
+    def song_ids(self) -> list[int]:
+        return [self._ids[index] for index in self._order]
+
+    def current_song(self) -> tuple | None:
+        if 0 <= self.current < len(self._order):
+            return self.song_at(self.current)
+        return None
+
+    def next_row(self) -> int | None:
+        if not self._order:
+            return None
+        return self.current + 1 if self.current < len(self._order) - 1 else 0
+
+    def previous_row(self) -> int | None:
+        if not self._order:
+            return None
+        return self.current - 1 if self.current > 0 else len(self._order) - 1
+
+    def clear(self) -> None:
+        self._ids = array("q")
+        self._songs.clear()
+        self._order = []
+        self.current = -1
+
+    def append(self, songs: Iterable[tuple]) -> int:
+        # Returns the number of songs added
+        start = len(self._ids)
+        for song in songs:
+            self._songs[song[0]] = song
+            self._ids.append(song[0])
+        self._order.extend(range(start, len(self._ids)))
+        return len(self._ids) - start
+
+    def insert_next(self, songs: Iterable[tuple]) -> tuple[int, int]:
+        # Queues songs right after the current one.
+        # Returns the first row and the number of songs inserted.
+        row = self.current + 1
+        start = len(self._ids)
+        count = self.append(songs)
+        self._order[row:] = self._order[start:] + self._order[row:start]
+        if not self.shuffled:
+            self._normalize()
+        return row, count
+
+    def remove_rows(self, rows: Iterable[int]) -> None:
+        rows = set(rows)
+        if not rows:
+            return
+        dropped = {self._order[row] for row in rows}
+        remap = {}
+        ids = array("q")
+        for index, song_id in enumerate(self._ids):
+            if index not in dropped:
+                remap[index] = len(ids)
+                ids.append(song_id)
+
+        # Current moves to the last kept row before it, so next() continues
+        # with whatever followed the removed song
+        self.current -= sum(1 for row in rows if row <= self.current)
+        self._ids = ids
+        self._order = [remap[index] for index in self._order if index not in dropped]
+        self._songs = {song_id: self._songs[song_id] for song_id in set(ids)}
+
+    def move_rows(self, source: int, count: int, destination: int) -> None:
+        # Same meaning of destination as QAbstractItemModel.moveRows
+        moved = self._order[source:source + count]
+        current_index = self._order[self.current] if self.current >= 0 else None
+        del self._order[source:source + count]
+        if destination > source:
+            destination -= count
+        self._order[destination:destination] = moved
+        if current_index is not None:
+            self.current = self._order.index(current_index)
+        if not self.shuffled:
+            self._normalize()
+
+    def shuffle(self) -> None:
+        # The current song moves to the top so the rest plays after it
+        current_index = self._order[self.current] if self.current >= 0 else None
+        random.shuffle(self._order)
+        if current_index is not None:
+            row = self._order.index(current_index)
+            self._order[0], self._order[row] = self._order[row], self._order[0]
+            self.current = 0
+        self.shuffled = True
+
+    def unshuffle(self) -> None:
+        if self.current >= 0:
+            self.current = self._order[self.current]
+        self._order = list(range(len(self._ids)))
+        self.shuffled = False
+
+    def _normalize(self) -> None:
+        # Outside shuffle mode the queued order is the play order
+        self._ids = array("q", (self._ids[index] for index in self._order))
+        self._order = list(range(len(self._ids)))
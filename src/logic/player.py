@@ -1,25 +1,207 @@
+import time
+from collections.abc import Callable
 from PyQt6.QtMultimedia import QMediaPlayer, QAudioOutput
-from PyQt6.QtCore import QUrl
-
-class AudioPlayer:
-    def __init__(self) -> None:
-        self.player = QMediaPlayer()
-        self.audio_output = QAudioOutput()
-        self.player.setAudioOutput(self.audio_output)
-        self.audio_output.setVolume(0.5)
-    
+from PyQt6.QtCore import QObject, QTimer, QUrl, pyqtSignal
+
+class AudioPlayer(QObject):
+    # Two decks: the active one plays while the standby deck already holds
+    # the next song (see preload), so advancing is a swap instead of a
+    # fresh open. With crossfade_ms > 0 the decks overlap by that long.
+    # track_gain(path) gives a per-song gain (e.g. loudness normalization)
+    # that scales the volume of whichever deck holds that song.
+    # resolve_path(path) gives the file to actually open (e.g. a local
+    # cached copy); paths everywhere else stay the library's.
+    # state_changed reports "playing", "paused" or "stopped" for the
+    # active deck only.
+    finished = pyqtSignal()
+    advanced = pyqtSignal(str)
+    switched = pyqtSignal(float)
+    state_changed = pyqtSignal(str)
+
+    STATES = {
+        QMediaPlayer.PlaybackState.PlayingState: "playing",
+        QMediaPlayer.PlaybackState.PausedState: "paused",
+        QMediaPlayer.PlaybackState.StoppedState: "stopped",
+    }
+
+    FADE_STEP_MS = 50
+
+    def __init__(self, crossfade_ms: int = 0, parent=None) -> None:
+        super().__init__(parent)
+        self.crossfade_ms = crossfade_ms
+        self.volume = 0.5
+        self.track_gain: Callable[[str], float] | None = None
+        self.resolve_path: Callable[[str], str] | None = None
+        self._gains = [1.0, 1.0]
+        self._decks = [self._create_deck(), self._create_deck()]
+        self._active = 0
+        self._current_path = None
+        self._preloaded_path = None
+        self._deferred_preload = None
+        self._switch_started = None
+        self._fading_deck = None
+        self._fade_started = 0.0
+        self._fade_timer = QTimer(self)
+        self._fade_timer.setInterval(self.FADE_STEP_MS)
+        self._fade_timer.timeout.connect(self._fade_step)
+
+    def _create_deck(self) -> tuple[QMediaPlayer, QAudioOutput]:
+        player = QMediaPlayer(self)
+        audio_output = QAudioOutput(self)
+        player.setAudioOutput(audio_output)
+        audio_output.setVolume(self.volume)
+        player.mediaStatusChanged.connect(lambda status, p=player: self._on_media_status_changed(p, status))
+        player.positionChanged.connect(lambda position, p=player: self._on_position_changed(p, position))
+        player.playbackStateChanged.connect(lambda state, p=player: self._on_playback_state_changed(p, state))
+        return player, audio_output
+
+    @property
+    def player(self) -> QMediaPlayer:
+        return self._decks[self._active][0]
+
+    @property
+    def audio_output(self) -> QAudioOutput:
+        return self._decks[self._active][1]
+
+    @property
+    def current_path(self) -> str | None:
+        return self._current_path
+
     def load_song(self, path: str) -> None:
-        self.player.setSource(QUrl.fromLocalFile(path))
+        self._finish_fade()
+        self._switch_started = time.perf_counter()
+        if path == self._preloaded_path:
+            self.player.stop()
+            self._swap_decks()
+        else:
+            self.player.setSource(self._url(path))
+            self._gains[self._active] = self._gain_for(path)
+        self._current_path = path
+        self._apply_volume()
+
+    def preload(self, path: str | None, reload: bool = False) -> None:
+        # reload opens the file again even if it is already preloaded, e.g.
+        # once resolve_path has a local copy of it
+        if self._fading_deck is not None: #Standby deck is still fading out
+            self._deferred_preload = path
+            return
+        standby = self._decks[1 - self._active][0]
+        if path == self._preloaded_path and not reload:
+            return
+        self._preloaded_path = path
+        self._gains[1 - self._active] = self._gain_for(path)
+        standby.setSource(self._url(path))
 
     def play(self) -> None:
         self.player.play()
 
     def pause(self) -> None:
+        self._finish_fade()
         self.player.pause()
 
     def stop(self) -> None:
+        self._finish_fade()
         self.player.stop()
 
     def set_volume(self, volume: int) -> None:
-        float_volume = volume / 100.0
-        self.audio_output.setVolume(float_volume)
\ No newline at end of file
+        self.volume = volume / 100.0
+        if self._fading_deck is None:
+            self._apply_volume()
+
+    def _url(self, path: str | None) -> QUrl:
+        if not path:
+            return QUrl()
+        if self.resolve_path is not None:
+            path = self.resolve_path(path)
+        return QUrl.fromLocalFile(path)
+
+    def _gain_for(self, path: str | None) -> float:
+        if path is None or self.track_gain is None:
+            return 1.0
+        return self.track_gain(path)
+
+    def _deck_volume(self, deck: int, scale: float = 1.0) -> float:
+        return min(1.0, self.volume * self._gains[deck] * scale)
+
+    def _apply_volume(self) -> None:
+        self.audio_output.setVolume(self._deck_volume(self._active))
+
+    def _swap_decks(self) -> None:
+        old_player = self.player
+        self._active = 1 - self._active
+        self._preloaded_path = None
+        old_player.setSource(QUrl())
+
+    def _advance(self) -> None:
+        path = self._preloaded_path
+        self._switch_started = time.perf_counter()
+        old_player = self.player
+        self._active = 1 - self._active
+        self._preloaded_path = None
+        self._current_path = path
+        if self._fading_deck is None:
+            self._apply_volume()
+            self.player.play()
+            old_player.stop()
+            old_player.setSource(QUrl())
+        else:
+            self.player.play()
+        self.advanced.emit(path)
+
+    def _on_media_status_changed(self, player: QMediaPlayer, status) -> None:
+        if player is not self.player or status != QMediaPlayer.MediaStatus.EndOfMedia:
+            return
+        if self._preloaded_path:
+            self._advance()
+        else:
+            self.finished.emit()
+
+    @property
+    def state(self) -> str:
+        return self.STATES[self.player.playbackState()]
+
+    def _on_playback_state_changed(self, player: QMediaPlayer, state) -> None:
+        if player is self.player:
+            self.state_changed.emit(self.STATES[state])
+
+    def _on_position_changed(self, player: QMediaPlayer, position: int) -> None:
+        if player is not self.player:
+            return
+        if self._switch_started is not None and position > 0:
+            self.switched.emit((time.perf_counter() - self._switch_started) * 1000)
+            self._switch_started = None
+
+        remaining = player.duration() - position
+        if self.crossfade_ms > 0 and self._preloaded_path and self._fading_deck is None \
+                and player.duration() > 0 and remaining <= self.crossfade_ms:
+            self._start_fade()
+
+    def _start_fade(self) -> None:
+        self._fading_deck = self._decks[self._active]
+        self._decks[1 - self._active][1].setVolume(0.0)
+        self._fade_started = time.perf_counter()
+        self._advance()
+        self._fade_timer.start()
+
+    def _fade_step(self) -> None:
+        elapsed = (time.perf_counter() - self._fade_started) * 1000
+        progress = min(elapsed / self.crossfade_ms, 1.0) if self.crossfade_ms else 1.0
+        self.audio_output.setVolume(self._deck_volume(self._active, progress))
+        if self._fading_deck is not None:
+            self._fading_deck[1].setVolume(self._deck_volume(1 - self._active, 1.0 - progress))
+        if progress >= 1.0:
+            self._finish_fade()
+
+    def _finish_fade(self) -> None:
+        self._fade_timer.stop()
+        if self._fading_deck is None:
+            return
+        player, audio_output = self._fading_deck
+        self._fading_deck = None
+        player.stop()
+        player.setSource(QUrl())
+        audio_output.setVolume(self.volume)
+        self._apply_volume()
+        if self._deferred_preload is not None:
+            path, self._deferred_preload = self._deferred_preload, None
+            self.preload(path)
@@ -0,0 +1,96 @@
+import json
+import os
+import tempfile
+from collections.abc import Iterable
+from typing import TextIO
+from src.logic.database import Database
+
+EXPORT_FORMATS = (".json", ".jsonl", ".m3u8")
+
+
+def _write_json(f: TextIO, entries: Iterable[dict]) -> int:
+    count = 0
+    f.write("[")
+    for entry in entries:
+        if count:
+            f.write(",\n")
+        f.write(json.dumps(entry, ensure_ascii=False, separators=(",", ":")))
+        count += 1
+    f.write("]\n")
+    return count
+
+
+def _write_jsonl(f: TextIO, entries: Iterable[dict]) -> int:
+    count = 0
+    for entry in entries:
+        f.write(json.dumps(entry, ensure_ascii=False, separators=(",", ":")))
+        f.write("\n")
+        count += 1
+    return count
+
+
+def _write_m3u8(f: TextIO, entries: Iterable[dict]) -> int:
+    count = 0
+    playlist = None
+    f.write("#EXTM3U\n")
+    for entry in entries:
+        if entry.get("playlist") != playlist:
+            playlist = entry["playlist"]
+            f.write(f"#PLAYLIST:{playlist}\n")
+        f.write(f"#EXTINF:-1,{entry['artist']} - {entry['title']}\n")
+        f.write(f"{entry['file_path']}\n")
+        count += 1
+    return count
+
+
+_WRITERS = {
+    ".json": _write_json,
+    ".jsonl": _write_jsonl,
+    ".m3u8": _write_m3u8,
+}
+
+
+def write_entries(file_path: str, entries: Iterable[dict]) -> int:
+    # Entries are written as they come into a temp file next to the target,
+    # which only replaces the target once it is complete
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension == ".m3u":
+        extension = ".m3u8"
+    writer = _WRITERS.get(extension)
+    if writer is None:
+        raise ValueError(f"Unsupported export format: {extension}")
+
+    directory = os.path.dirname(os.path.abspath(file_path))
+    fd, temp_path = tempfile.mkstemp(prefix=".export-", suffix=extension, dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8", newline="\n") as f:
+            count = writer(f, entries)
+            f.flush()
+            os.fsync(f.fileno())
+        mode = os.stat(file_path).st_mode if os.path.exists(file_path) else 0o644
+        os.chmod(temp_path, mode & 0o777)
+        os.replace(temp_path, file_path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+    return count
+
+
+def export_playlist(database: Database, file_path: str, playlist_id: int | None = None) -> int:
+    # Exports one playlist, or all of them when playlist_id is None.
+    # Returns the number of entries written.
+    entries = (
+        {"playlist": name, "title": title, "artist": artist, "file_path": path}
+        for name, title, artist, _, path, _ in database.iter_playlist_entries(playlist_id)
+    )
+    if playlist_id is not None:
+        entries = ({k: v for k, v in entry.items() if k != "playlist"} for entry in entries)
+    return write_entries(file_path, entries)
+
+
+def export_library(database: Database, file_path: str) -> int:
+    entries = (
+        {"title": title, "artist": artist, "genre": genre, "file_path": path, "play_count": play_count}
+        for title, artist, genre, path, play_count in database.iter_library()
+    )
+    return write_entries(file_path, entries)
@@ -0,0 +1,247 @@
+import json
+import os
+import xml.etree.ElementTree as ET
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass, field
+from difflib import SequenceMatcher
+from itertools import islice
+from typing import NamedTuple
+from urllib.parse import unquote, urlparse
+from src.logic.database import Database
+from src.logic.normalize import match_key
+
+READ_CHUNK = 64 * 1024
+FUZZY_THRESHOLD = 0.8
+FUZZY_CANDIDATES = 50 #Search hits scored per title or artist
+FUZZY_MAX_ENTRIES = 2000
+PLAYLIST_FORMATS = (".json", ".jsonl", ".m3u", ".m3u8", ".xspf")
+
+
+class PlaylistEntry(NamedTuple):
+    title: str | None
+    artist: str | None
+    file_path: str | None
+    playlist: str | None = None #Set in files holding several playlists
+
+
+@dataclass
+class PlaylistImportResult:
+    created: bool = False
+    matched: int = 0
+    fuzzy: int = 0
+    missing: int = 0
+    playlists: list[str] = field(default_factory=list) #Created
+    existing: list[str] = field(default_factory=list) #Skipped, name taken
+    cancelled: bool = False #Nothing was created
+
+
+def _location_to_path(location: str, base_dir: str) -> str:
+    if location.startswith("file://"):
+        return unquote(urlparse(location).path)
+    if "://" in location:
+        return location
+    return os.path.normpath(os.path.join(base_dir, location))
+
+
+def _json_entry(entry: dict) -> PlaylistEntry:
+    # Same shape export_playlist writes; "playlist" is only there when all
+    # playlists were exported to one file
+    if not isinstance(entry, dict):
+        raise ValueError("Playlist entries must be JSON objects")
+    return PlaylistEntry(entry.get("title"), entry.get("artist"), entry.get("file_path"), entry.get("playlist"))
+
+
+def _read_json(file_path: str) -> Iterator[PlaylistEntry]:
+    # Decodes one array element at a time, so only a chunk of the file is
+    # held in memory
+    decoder = json.JSONDecoder()
+    with open(file_path, "r", encoding="utf-8") as f:
+        buffer = f.read(READ_CHUNK)
+        pos = 0
+        started = False
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                pos += 1
+            if pos == len(buffer):
+                buffer = f.read(READ_CHUNK)
+                pos = 0
+                if not buffer:
+                    raise ValueError("Unexpected end of JSON playlist")
+                continue
+            if not started:
+                if buffer[pos] != "[":
+                    raise ValueError("JSON playlist must be a list")
+                started = True
+                pos += 1
+                continue
+            if buffer[pos] == "]":
+                return
+            try:
+                entry, pos = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                more = f.read(READ_CHUNK)
+                if not more:
+                    raise
+                buffer = buffer[pos:] + more
+                pos = 0
+                continue
+            if pos > READ_CHUNK:
+                buffer = buffer[pos:]
+                pos = 0
+            yield _json_entry(entry)
+
+
+def _read_jsonl(file_path: str) -> Iterator[PlaylistEntry]:
+    with open(file_path, "r", encoding="utf-8-sig") as f:
+        for line in f:
+            if line.strip():
+                yield _json_entry(json.loads(line))
+
+
+def _read_m3u(file_path: str) -> Iterator[PlaylistEntry]:
+    base_dir = os.path.dirname(os.path.abspath(file_path))
+    title = artist = playlist = None
+    with open(file_path, "r", encoding="utf-8-sig", errors="replace") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("#EXTINF:"):
+                # "#EXTINF:<seconds>,<artist> - <title>"
+                info = line.partition(",")[2]
+                artist, separator, title = info.partition(" - ")
+                if not separator:
+                    artist, title = None, info
+                continue
+            if line.startswith("#PLAYLIST:"): #Written by export_playlist for each playlist
+                playlist = line[len("#PLAYLIST:"):].strip() or None
+                continue
+            if line.startswith("#"):
+                continue
+            yield PlaylistEntry(title, artist, _location_to_path(line, base_dir), playlist)
+            title = artist = None
+
+
+def _read_xspf(file_path: str) -> Iterator[PlaylistEntry]:
+    base_dir = os.path.dirname(os.path.abspath(file_path))
+    for _, element in ET.iterparse(file_path, events=("end",)):
+        if element.tag.rpartition("}")[2] != "track":
+            continue
+        fields = {child.tag.rpartition("}")[2]: (child.text or "").strip() for child in element}
+        location = fields.get("location")
+        yield PlaylistEntry(
+            fields.get("title"),
+            fields.get("creator"),
+            _location_to_path(location, base_dir) if location else None,
+        )
+        element.clear()
+
+
+def read_playlist_entries(file_path: str) -> Iterator[PlaylistEntry]:
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension == ".json":
+        return _read_json(file_path)
+    if extension == ".jsonl":
+        return _read_jsonl(file_path)
+    if extension in (".m3u", ".m3u8"):
+        return _read_m3u(file_path)
+    if extension == ".xspf":
+        return _read_xspf(file_path)
+    raise ValueError(f"Unsupported playlist format: {extension}")
+
+
+class FuzzyMatcher:
+    # Fallback for entries match_songs couldn't resolve, shared by a whole
+    # import. Candidates come from the search index by title and by artist,
+    # so a typo in one of them still finds the song through the other. Each
+    # distinct title or artist is searched once and each distinct entry is
+    # scored once; after FUZZY_MAX_ENTRIES distinct entries the rest count as
+    # missing, so a file of mostly unknown songs can't run for hours.
+    def __init__(self, database: Database) -> None:
+        self.database = database
+        self._candidates: dict[str, list[tuple[int, str, str]]] = {}
+        self._matches: dict[tuple[str, str], int | None] = {}
+
+    def _search(self, text: str) -> list[tuple[int, str, str]]:
+        # (id, title key, artist key) of the songs the index finds for text
+        candidates = self._candidates.get(text)
+        if candidates is None:
+            songs = self.database.search_songs(text, limit=FUZZY_CANDIDATES)
+            candidates = self._candidates[text] = [(song[0], match_key(song[1]), match_key(song[2])) for song in songs]
+        return candidates
+
+    def match(self, entry: PlaylistEntry) -> int | None:
+        key = (match_key(entry.title), match_key(entry.artist))
+        if key in self._matches:
+            return self._matches[key]
+        if len(self._matches) >= FUZZY_MAX_ENTRIES:
+            return None
+        title, artist = key
+        candidates = {}
+        for text in key:
+            if text:
+                candidates.update((song[0], song) for song in self._search(text))
+
+        best_id, best_score = None, FUZZY_THRESHOLD
+        for song_id, song_title, song_artist in candidates.values():
+            title_match = SequenceMatcher(None, title, song_title)
+            artist_match = SequenceMatcher(None, artist, song_artist) if artist else None
+            # quick_ratio() is an upper bound of ratio(): most candidates are
+            # ruled out without the full comparison
+            if _score(title_match.quick_ratio(), artist_match and artist_match.quick_ratio()) < best_score:
+                continue
+            score = _score(title_match.ratio(), artist_match and artist_match.ratio())
+            if score >= best_score:
+                best_id, best_score = song_id, score
+        self._matches[key] = best_id
+        return best_id
+
+
+def _score(title: float, artist: float | None) -> float:
+    return title if artist is None else 0.7 * title + 0.3 * artist
+
+
+def import_playlist(
+    database: Database,
+    file_path: str,
+    name: str,
+    chunk_size: int = 5000,
+    fuzzy: bool = True,
+    progress: Callable[[int, int], None] | None = None,
+    is_cancelled: Callable[[], bool] | None = None,
+) -> PlaylistImportResult:
+    # Files exported with all playlists name them per entry; each becomes
+    # its own playlist. Entries without a playlist go to `name`. The entry
+    # count isn't known up front, so progress reports a total of 0.
+    result = PlaylistImportResult()
+    playlists: dict[str, list[int]] = {}
+    entries = read_playlist_entries(file_path)
+    matcher = FuzzyMatcher(database) if fuzzy else None
+    done = 0
+    while chunk := list(islice(entries, chunk_size)):
+        if is_cancelled is not None and is_cancelled():
+            result.cancelled = True
+            return result
+        matches = database.match_songs([entry[:3] for entry in chunk])
+        for entry, song_id in zip(chunk, matches):
+            if song_id is None and matcher is not None:
+                song_id = matcher.match(entry)
+                if song_id is not None:
+                    result.fuzzy += 1
+            elif song_id is not None:
+                result.matched += 1
+            if song_id is None:
+                result.missing += 1
+            else:
+                playlists.setdefault(entry.playlist or name, []).append(song_id)
+        done += len(chunk)
+        if progress is not None:
+            progress(done, 0)
+
+    for playlist_name, song_ids in playlists.items():
+        if database.create_playlist(playlist_name, song_ids):
+            result.playlists.append(playlist_name)
+        else:
+            result.existing.append(playlist_name)
+    result.created = bool(result.playlists)
+    return result
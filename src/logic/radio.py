@@ -0,0 +1,84 @@
+from collections.abc import Iterable
+from src.logic.catalog import Song
+from src.logic.database import Database
+
+# Radio scores candidates around a seed song from the sparse affinity
+# matrix kept in song_affinity (playlist neighbours and back to back
+# plays, see migrations) plus artist/genre similarity and popularity.
+# Only the seed's row and the rows of its strongest neighbours are read,
+# so the cost depends on NEIGHBORS, not on the size of the library.
+# numpy is imported on first use to keep startup fast.
+
+RADIO_LENGTH = 50
+NEIGHBORS = 50
+SIMILAR = 200
+TEMPERATURE = 0.5
+
+# Weights of the candidate features, in the order build_radio fills them:
+# direct affinity, two-step affinity, same artist, same genre, popularity
+FEATURE_WEIGHTS = (1.0, 0.5, 0.3, 0.15, 0.1)
+
+
+def _row_normalized(rows: list[tuple[int, float]]):
+    import numpy as np
+
+    ids = np.fromiter((song_id for song_id, _ in rows), np.int64, len(rows))
+    weights = np.fromiter((weight for _, weight in rows), np.float64, len(rows))
+    total = weights.sum()
+    return ids, weights / total if total > 0 else weights
+
+
+def build_radio(
+    database: Database,
+    seed_id: int,
+    length: int = RADIO_LENGTH,
+    exclude: Iterable[int] = (),
+    random_seed: int | None = None,
+) -> list[Song]:
+    # Up to `length` songs to play after seed_id, best first. The pick is
+    # sampled (Gumbel top-k over score / TEMPERATURE), so starting a radio
+    # twice from the same song doesn't give the same list.
+    import numpy as np
+
+    # One and two steps of a random walk from the seed
+    direct_ids, direct = _row_normalized(database.get_neighbors([seed_id], NEIGHBORS)[seed_id])
+    rows = database.get_neighbors(direct_ids.tolist(), NEIGHBORS)
+    second_ids, second = [direct_ids[:0]], [direct[:0]]
+    for song_id, step in zip(direct_ids.tolist(), direct):
+        ids, weights = _row_normalized(rows[song_id])
+        second_ids.append(ids)
+        second.append(weights * step)
+    artist, genre = database.get_similar_songs(seed_id, SIMILAR)
+
+    parts = [
+        (direct_ids, direct),
+        (np.concatenate(second_ids), np.concatenate(second)),
+        (np.array(artist, np.int64), np.ones(len(artist))),
+        (np.array(genre, np.int64), np.ones(len(genre))),
+    ]
+    all_ids = np.concatenate([ids for ids, _ in parts])
+    candidates, inverse = np.unique(all_ids, return_inverse=True)
+    features = np.zeros((len(candidates), len(FEATURE_WEIGHTS)))
+    start = 0
+    for column, (ids, values) in enumerate(parts):
+        np.add.at(features[:, column], inverse[start:start + len(ids)], values)
+        start += len(ids)
+
+    keep = ~np.isin(candidates, np.fromiter(exclude, np.int64))
+    keep &= candidates != seed_id
+    candidates, features = candidates[keep], features[keep]
+    if not len(candidates):
+        return []
+
+    songs = {song.id: song for song in database.get_songs(candidates.tolist())}
+    plays = np.array([songs[i].play_count if i in songs else 0 for i in candidates.tolist()], np.float64)
+    features[:, 4] = np.log1p(plays)
+    peaks = features.max(axis=0)
+    features /= np.where(peaks > 0, peaks, 1.0)
+    scores = features @ np.array(FEATURE_WEIGHTS)
+
+    rng = np.random.default_rng(random_seed)
+    with np.errstate(divide="ignore"):
+        keys = np.log(scores) / TEMPERATURE + rng.gumbel(size=len(scores))
+    order = np.argsort(-keys)[:length]
+    return [songs[i] for i in candidates[order].tolist() if i in songs]
@@ -0,0 +1,99 @@
+import os
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass
+from src.logic.database import Database
+from src.logic.library_import import read_metadata_in_chunks
+from src.logic.tags import AUDIO_EXTENSIONS
+
+
+@dataclass
+class ScanResult:
+    added: int = 0
+    updated: int = 0
+    removed: int = 0
+    unchanged: int = 0
+
+
+def walk_audio_files(root: str, unreadable: list[str] | None = None) -> Iterator[tuple[str, int, int]]:
+    # Yields (path, size, mtime_ns) for every audio file below root.
+    # Directories that can't be listed are reported through unreadable.
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif entry.is_file() and entry.name.lower().endswith(AUDIO_EXTENSIONS):
+                            stat = entry.stat()
+                            yield entry.path, stat.st_size, stat.st_mtime_ns
+                    except OSError:
+                        continue
+        except OSError:
+            if unreadable is not None:
+                unreadable.append(os.path.join(directory, ""))
+
+
+def scan_folder(
+    database: Database,
+    folder: str,
+    chunk_size: int = 500,
+    workers: int | None = None,
+    progress: Callable[[int, int], None] | None = None,
+    is_cancelled: Callable[[], bool] | None = None,
+) -> ScanResult:
+    result = ScanResult()
+    folder = os.path.abspath(folder)
+    if not os.path.isdir(folder): #Unmounted folders keep their songs
+        return result
+
+    known = database.get_file_index(folder)
+    aliases = database.get_aliases(folder) #Merged duplicates stay out of the library
+    changed = {}
+    unreadable = []
+    for path, size, mtime_ns in walk_audio_files(folder, unreadable):
+        if is_cancelled is not None and is_cancelled():
+            return result
+        if path in aliases:
+            continue
+        previous = known.pop(path, None)
+        if previous == (size, mtime_ns):
+            result.unchanged += 1
+            continue
+        if previous is None:
+            result.added += 1
+        else:
+            result.updated += 1
+        changed[path] = (size, mtime_ns)
+
+    deleted = [path for path in known if not path.startswith(tuple(unreadable))]
+    if deleted:
+        result.removed = database.remove_songs_by_path(deleted)
+
+    total = len(changed)
+    done = 0
+    for chunk in read_metadata_in_chunks(list(changed), chunk_size, workers, is_cancelled):
+        database.save_scanned_songs((song, *changed[song.file_path]) for song in chunk)
+        done += len(chunk)
+        if progress is not None:
+            progress(done, total)
+    return result
+
+
+def rescan_watch_folders(
+    database: Database,
+    progress: Callable[[int, int], None] | None = None,
+    is_cancelled: Callable[[], bool] | None = None,
+) -> ScanResult:
+    total = ScanResult()
+    for folder in database.get_watch_folders():
+        if is_cancelled is not None and is_cancelled():
+            break
+        result = scan_folder(database, folder, progress=progress, is_cancelled=is_cancelled)
+        total.added += result.added
+        total.updated += result.updated
+        total.removed += result.removed
+        total.unchanged += result.unchanged
+    return total
@@ -0,0 +1,163 @@
+import re
+import time
+from datetime import datetime, timedelta
+from typing import NamedTuple
+from src.logic.normalize import match_key
+
+# Smart playlists are written one rule or option per line:
+#
+#   genre = Rock
+#   plays >= 5
+#   days_since_played >= 90
+#   match any
+#   order plays
+#   limit 100
+#
+# and compiled to a parameterized WHERE clause over indexed songs columns.
+# Day counts are relative to local midnight, so the compiled parameters
+# (and with them the cached result, see Database.get_smart_playlist_songs)
+# only change once a day.
+
+SMART_PLAYLIST_HELP = (
+    "One rule per line: <field> <operator> <value>\n"
+    "Fields: genre, artist, album, year, plays, days_since_added, days_since_played\n"
+    "Operators: = != < <= > >= (genre, artist and album only = and !=)\n"
+    "Options: match all|any, order artist|added|plays|played|year, limit <n>"
+)
+
+RULE = re.compile(r"^\s*(\w+)\s*(<=|>=|!=|=|<|>)\s*(.+?)\s*$")
+OPTION = re.compile(r"^\s*(match|order|limit)\s+(\S+)\s*$", re.IGNORECASE)
+TEXT_OPERATORS = ("=", "!=")
+NUMBER_OPERATORS = ("=", "!=", "<", "<=", ">", ">=")
+
+# Field -> (songs column, is numeric)
+FIELDS = {
+    "genre": ("genre", False),
+    "artist": ("artist_key", False),
+    "album": ("album", False),
+    "year": ("year", True),
+    "plays": ("play_count", True),
+    "days_since_added": ("added_at", True),
+    "days_since_played": ("last_played", True),
+}
+
+# Order -> columns of the ORDER BY; each has a matching index
+ORDERS = {
+    "artist": "artist_key, album, track, id",
+    "added": "added_at DESC, id DESC",
+    "plays": "play_count DESC, id",
+    "played": "last_played DESC, id",
+    "year": "year, album, track, id",
+}
+
+ORDER_COLUMNS = {
+    "artist": ("artist_key", "album", "track"),
+    "added": ("added_at",),
+    "plays": ("play_count",),
+    "played": ("last_played",),
+    "year": ("year", "album", "track"),
+}
+
+
+class Rule(NamedTuple):
+    field: str
+    operator: str
+    value: str | int
+
+
+class SmartPlaylist(NamedTuple):
+    rules: tuple[Rule, ...]
+    match_all: bool = True
+    order: str = "artist"
+    limit: int | None = None
+
+
+class CompiledPlaylist(NamedTuple):
+    sql: str
+    params: tuple
+    columns: tuple[str, ...]
+
+
+def parse_smart_playlist(text: str) -> SmartPlaylist:
+    # Raises ValueError naming the first line that can't be understood
+    rules = []
+    match_all, order, limit = True, "artist", None
+    for line in text.splitlines():
+        if not line.strip() or line.lstrip().startswith("#"):
+            continue
+        option = OPTION.match(line)
+        if option:
+            name, value = option.group(1).lower(), option.group(2).lower()
+            if name == "match" and value in ("all", "any"):
+                match_all = value == "all"
+            elif name == "order" and value in ORDERS:
+                order = value
+            elif name == "limit" and value.isdigit() and int(value) > 0:
+                limit = int(value)
+            else:
+                raise ValueError(f"Invalid option: {line.strip()}")
+            continue
+
+        rule = RULE.match(line)
+        if not rule or rule.group(1).lower() not in FIELDS:
+            raise ValueError(f"Invalid rule: {line.strip()}")
+        field, operator, value = rule.group(1).lower(), rule.group(2), rule.group(3)
+        numeric = FIELDS[field][1]
+        if operator not in (NUMBER_OPERATORS if numeric else TEXT_OPERATORS):
+            raise ValueError(f"Operator {operator} can't be used with {field}")
+        if numeric:
+            if not value.isdigit():
+                raise ValueError(f"{field} needs a whole number: {line.strip()}")
+            value = int(value)
+        rules.append(Rule(field, operator, value))
+
+    if not rules:
+        raise ValueError("A smart playlist needs at least one rule")
+    return SmartPlaylist(tuple(rules), match_all, order, limit)
+
+
+def _days_since(column: str, operator: str, days: int, now: float) -> tuple[str, tuple]:
+    # "days since <column> <operator> days" as a range on the timestamp.
+    # Whatever happened today is 0 days ago, yesterday 1 day and so on.
+    midnight = datetime.fromtimestamp(now).replace(hour=0, minute=0, second=0, microsecond=0)
+
+    def start(n: int) -> int: #Start of the day n days ago
+        return int((midnight - timedelta(days=n)).timestamp())
+
+    if operator == "<=":
+        return f"{column} >= ?", (start(days),)
+    if operator == "<":
+        return f"{column} >= ?", (start(days - 1),)
+    if operator == ">=":
+        return f"{column} < ?", (start(days - 1),)
+    if operator == ">":
+        return f"{column} < ?", (start(days),)
+    if operator == "=":
+        return f"{column} >= ? AND {column} < ?", (start(days), start(days - 1))
+    return f"NOT ({column} >= ? AND {column} < ?)", (start(days), start(days - 1))
+
+
+def compile_playlist(playlist: SmartPlaylist, now: float | None = None) -> CompiledPlaylist:
+    # SELECT of the matching song ids in playlist order. Values are always
+    # bound, only column names from FIELDS/ORDERS end up in the SQL.
+    # columns lists every songs column the result depends on.
+    if now is None:
+        now = time.time()
+    conditions, params, columns = [], [], set(ORDER_COLUMNS[playlist.order])
+    for rule in playlist.rules:
+        column = FIELDS[rule.field][0]
+        columns.add(column)
+        if rule.field.startswith("days_since_"):
+            condition, values = _days_since(column, rule.operator, rule.value, now)
+        else:
+            value = match_key(rule.value) if rule.field == "artist" else rule.value
+            condition, values = f"{column} {rule.operator} ?", (value,)
+        conditions.append(f"({condition})")
+        params.extend(values)
+
+    joiner = " AND " if playlist.match_all else " OR "
+    sql = f"SELECT id FROM songs WHERE {joiner.join(conditions)} ORDER BY {ORDERS[playlist.order]}"
+    if playlist.limit is not None:
+        sql += " LIMIT ?"
+        params.append(playlist.limit)
+    return CompiledPlaylist(sql, tuple(params), tuple(sorted(columns)))
@@ -0,0 +1,35 @@
+import time
+from src.logic import instrumentation
+
+# Startup phases in ms since this module was imported, which src.main does
+# before anything else. SPOOPIFY_STARTUP_REPORT=1 prints them on exit.
+
+_started = time.perf_counter()
+_phases: list[tuple[str, float]] = []
+
+
+def reset() -> None:
+    global _started
+    _started = time.perf_counter()
+    _phases.clear()
+
+
+def mark(phase: str) -> float:
+    elapsed_ms = (time.perf_counter() - _started) * 1000
+    _phases.append((phase, elapsed_ms))
+    if instrumentation.is_enabled():
+        instrumentation.record(f"startup: {phase}", elapsed_ms)
+    return elapsed_ms
+
+
+def phases() -> dict[str, float]:
+    return {phase: round(elapsed_ms, 3) for phase, elapsed_ms in _phases}
+
+
+def report() -> str:
+    lines = ["Startup:"]
+    previous = 0.0
+    for phase, elapsed_ms in _phases:
+        lines.append(f"{elapsed_ms:9.1f} ms  (+{elapsed_ms - previous:7.1f})  {phase}")
+        previous = elapsed_ms
+    return "\n".join(lines)
@@ -0,0 +1,91 @@
+import os
+import re
+from typing import NamedTuple
+
+YEAR = re.compile(r"\d{4}")
+
+# Formats read_metadata (mutagen.File) understands and Qt can play
+AUDIO_EXTENSIONS = (".mp3", ".wav", ".flac", ".ogg", ".oga", ".opus", ".m4a", ".aiff", ".aif")
+
+# Easy tag keys (ID3 through EasyID3, MP4, Vorbis comments) and the raw ID3
+# frames holding the same fields, for WAV/AIFF files whose ID3 tags mutagen
+# doesn't wrap
+TAG_FRAMES = {
+    "title": "TIT2",
+    "artist": "TPE1",
+    "genre": "TCON",
+    "album": "TALB",
+    "tracknumber": "TRCK",
+    "date": "TDRC",
+}
+
+
+class TrackMetadata(NamedTuple):
+    title: str
+    artist: str
+    genre: str
+    file_path: str
+    album: str = ""
+    duration: float = 0.0
+    track: int = 0
+    year: int = 0
+    bitrate: int = 0
+
+
+def format_duration(seconds: float) -> str:
+    seconds = int(round(seconds))
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+
+def _first(tags, key: str) -> str | None:
+    if tags is None:
+        return None
+    try:
+        if hasattr(tags, "getall"): #Raw ID3
+            frames = tags.getall(TAG_FRAMES[key])
+            values = [str(value) for frame in frames for value in frame.text]
+        else:
+            values = tags.get(key)
+    except (KeyError, ValueError):
+        return None
+    if not values:
+        return None
+    return str(values[0]).strip() or None
+
+
+def _number(text: str | None) -> int:
+    # "3/12" -> 3
+    if not text:
+        return 0
+    head = text.split("/")[0].strip()
+    return int(head) if head.isdigit() else 0
+
+
+def read_metadata(file_path: str) -> TrackMetadata:
+    import mutagen #Imported on first use to keep startup fast
+
+    filename = os.path.basename(file_path)
+    title = os.path.splitext(filename)[0]
+    try:
+        audio = mutagen.File(file_path, easy=True)
+    except Exception:
+        audio = None
+    if audio is None:
+        return TrackMetadata(title, "Unknown Artist", "Unknown Genre", file_path)
+
+    tags = audio.tags
+    year = YEAR.search(_first(tags, "date") or "")
+    info = audio.info
+    return TrackMetadata(
+        _first(tags, "title") or title,
+        _first(tags, "artist") or "Unknown Artist",
+        _first(tags, "genre") or "Unknown Genre",
+        file_path,
+        _first(tags, "album") or "",
+        float(getattr(info, "length", 0.0) or 0.0),
+        _number(_first(tags, "tracknumber")),
+        int(year.group()) if year else 0,
+        int(getattr(info, "bitrate", 0) or 0) // 1000,
+    )
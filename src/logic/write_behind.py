@@ -0,0 +1,82 @@
+import atexit
+import threading
+import time
+from collections.abc import Callable
+
+
+class WriteBehindQueue:
+    # Buffers items in memory and hands them to `write` in batches from a
+    # background thread, once `max_items` are waiting or the oldest item is
+    # `max_delay` seconds old. close() (also run at interpreter exit) writes
+    # whatever is left. A failed batch is kept and retried on the next round.
+
+    def __init__(self, write: Callable[[list], None], max_items: int = 64, max_delay: float = 2.0) -> None:
+        self._write = write
+        self.max_items = max_items
+        self.max_delay = max_delay
+        self._pending: list = []
+        self._oldest = 0.0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def put(self, item) -> None:
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Write-behind queue is closed")
+            if not self._pending:
+                self._oldest = time.monotonic()
+            self._pending.append(item)
+            if len(self._pending) >= self.max_items or len(self._pending) == 1:
+                self._cond.notify()
+
+    def pending(self) -> int:
+        with self._cond:
+            return len(self._pending)
+
+    def flush(self) -> None:
+        with self._write_lock:
+            with self._cond:
+                items, self._pending = self._pending, []
+            if not items:
+                return
+            try:
+                self._write(items)
+            except BaseException:
+                with self._cond:
+                    self._pending[:0] = items
+                raise
+
+    def close(self) -> None:
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify()
+        atexit.unregister(self.close)
+        self._thread.join()
+        self.flush()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._closed:
+                    if self._pending:
+                        if len(self._pending) >= self.max_items:
+                            break
+                        remaining = self._oldest + self.max_delay - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self._cond.wait(remaining)
+                    else:
+                        self._cond.wait()
+                if self._closed:
+                    return
+            try:
+                self.flush()
+            except Exception:
+                with self._cond:
+                    self._oldest = time.monotonic()
@@ -1,16 +1,67 @@
+from src.logic import startup
+import atexit
+import os
 import sys
 from PyQt6.QtWidgets import QApplication
+from src.logic import instrumentation
+from src.logic.database import Database
+from src.logic.file_cache import FileCache
 from src.ui.main_window import MainWindow
 
+# SPOOPIFY_METRICS=<file.json> turns on instrumentation and writes the
+# collected metrics there on exit
+METRICS_ENV = "SPOOPIFY_METRICS"
+STARTUP_REPORT_ENV = "SPOOPIFY_STARTUP_REPORT"
+
+# SPOOPIFY_CACHE_DIR=<dir> copies upcoming songs there before they play,
+# for libraries on network mounts or slow disks. SPOOPIFY_CACHE_MB bounds
+# its size, SPOOPIFY_CACHE_RATE_KB limits copying in KiB/s.
+CACHE_DIR_ENV = "SPOOPIFY_CACHE_DIR"
+CACHE_SIZE_ENV = "SPOOPIFY_CACHE_MB"
+CACHE_RATE_ENV = "SPOOPIFY_CACHE_RATE_KB"
+DEFAULT_CACHE_MB = 2048
+
+# SPOOPIFY_API_PORT=<port> serves the local remote-control API there,
+# see src/logic/api_server.py
+API_PORT_ENV = "SPOOPIFY_API_PORT"
+
+# SPOOPIFY_CROSSFADE_MS=<ms> overlaps consecutive songs by that long
+CROSSFADE_ENV = "SPOOPIFY_CROSSFADE_MS"
+
+
+def _print_startup_report() -> None:
+    print(startup.report(), file=sys.stderr)
+
+
+def _open_file_cache() -> FileCache | None:
+    cache_dir = os.environ.get(CACHE_DIR_ENV)
+    if not cache_dir:
+        return None
+    size_mb = int(os.environ.get(CACHE_SIZE_ENV) or DEFAULT_CACHE_MB)
+    rate_kb = int(os.environ.get(CACHE_RATE_ENV) or 0)
+    return FileCache(cache_dir, size_mb * 1024 * 1024, rate_kb * 1024 or None)
+
+
+def main(db_name: str = "music_player.db") -> None:
+    startup.mark("imports")
+    metrics_path = os.environ.get(METRICS_ENV)
+    if metrics_path:
+        instrumentation.enable(Database, MainWindow)
+        atexit.register(instrumentation.dump, metrics_path)
+    if os.environ.get(STARTUP_REPORT_ENV):
+        atexit.register(_print_startup_report)
 
-def main() -> None:
     app = QApplication(sys.argv)
+    startup.mark("application created")
     
-    window = MainWindow()
+    api_port = os.environ.get(API_PORT_ENV)
+    crossfade_ms = int(os.environ.get(CROSSFADE_ENV) or 0)
+    window = MainWindow(db_name, _open_file_cache(), int(api_port) if api_port else None, crossfade_ms)
     window.show()
+    startup.mark("window shown")
     
     sys.exit(app.exec())
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
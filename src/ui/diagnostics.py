@@ -0,0 +1,56 @@
+from PyQt6.QtGui import QFont
+from PyQt6.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QPushButton, QPlainTextEdit, QFileDialog, QMessageBox
+)
+from src.logic import instrumentation, startup
+from src.logic.async_database import AsyncDatabase
+
+
+class DiagnosticsDialog(QDialog):
+    def __init__(self, parent=None, queries: AsyncDatabase | None = None) -> None:
+        super().__init__(parent)
+        self.queries = queries
+        self.setWindowTitle("Diagnostics")
+        self.resize(900, 500)
+
+        layout = QVBoxLayout(self)
+        self.text = QPlainTextEdit()
+        self.text.setReadOnly(True)
+        self.text.setLineWrapMode(QPlainTextEdit.LineWrapMode.NoWrap)
+        self.text.setFont(QFont("monospace"))
+        layout.addWidget(self.text)
+
+        buttons = QHBoxLayout()
+        btn_refresh = QPushButton("🔄 Refresh")
+        btn_refresh.clicked.connect(self.refresh)
+        btn_reset = QPushButton("🧹 Reset")
+        btn_reset.clicked.connect(self.reset)
+        btn_save = QPushButton("💾 Save JSON")
+        btn_save.clicked.connect(self.save)
+        buttons.addWidget(btn_refresh)
+        buttons.addWidget(btn_reset)
+        buttons.addStretch()
+        buttons.addWidget(btn_save)
+        layout.addLayout(buttons)
+
+        self.refresh()
+
+    def refresh(self) -> None:
+        sections = [startup.report()]
+        if self.queries is not None:
+            sections.append(self.queries.report())
+        sections.append(instrumentation.report(limit=100))
+        self.text.setPlainText("\n\n".join(sections))
+
+    def reset(self) -> None:
+        instrumentation.reset()
+        self.refresh()
+
+    def save(self) -> None:
+        file_path, _ = QFileDialog.getSaveFileName(self, "Save metrics", "metrics.json", "JSON (*.json)")
+        if not file_path:
+            return
+        try:
+            instrumentation.dump(file_path)
+        except OSError as e:
+            QMessageBox.critical(self, "Error", f"Could not save metrics: {e}")
@@ -0,0 +1,68 @@
+import threading
+from collections.abc import Callable
+from functools import partial
+from PyQt6.QtCore import QThread, pyqtSignal
+from src.logic.database import Database
+from src.logic.dedupe import find_duplicates
+from src.logic.library_import import import_files
+from src.logic.loudness import analyze_library
+from src.logic.scanner import scan_folder, rescan_watch_folders
+
+
+class LibraryThread(QThread):
+    # Runs work(database, progress=..., is_cancelled=...) off the GUI thread
+    # and reports its result or error through signals
+    progress = pyqtSignal(int, int)
+    completed = pyqtSignal(object)
+    failed = pyqtSignal(str)
+
+    def __init__(self, database: Database, work: Callable[..., object], parent=None) -> None:
+        super().__init__(parent)
+        self.database = database
+        self._work = work
+        self._cancel = threading.Event()
+
+    def cancel(self) -> None:
+        self._cancel.set()
+
+    def run(self) -> None:
+        try:
+            result = self._work(self.database, progress=self.progress.emit, is_cancelled=self._cancel.is_set)
+        except Exception as e:
+            self.failed.emit(str(e))
+        else:
+            self.completed.emit(result)
+
+
+class ImportThread(LibraryThread):
+    def __init__(self, database: Database, file_paths: list[str], parent=None) -> None:
+        super().__init__(database, partial(import_files, file_paths=file_paths), parent)
+
+
+def _watch_and_scan(database: Database, folder: str, **kwargs) -> object:
+    database.add_watch_folder(folder)
+    return scan_folder(database, folder, **kwargs)
+
+
+class ScanThread(LibraryThread):
+    # Rescans the watch folders, or adds `folder` to them and scans it
+    def __init__(self, database: Database, folder: str | None = None, parent=None) -> None:
+        work = rescan_watch_folders if folder is None else partial(_watch_and_scan, folder=folder)
+        super().__init__(database, work, parent)
+
+
+class DedupeThread(LibraryThread):
+    def __init__(self, database: Database, parent=None) -> None:
+        super().__init__(database, find_duplicates, parent)
+
+
+class LoudnessThread(LibraryThread):
+    def __init__(self, database: Database, parent=None) -> None:
+        super().__init__(database, analyze_library, parent)
+
+
+class PlaylistImportThread(LibraryThread):
+    def __init__(self, database: Database, file_path: str, name: str, parent=None) -> None:
+        from src.logic.playlist_import import import_playlist #Only loaded when importing
+
+        super().__init__(database, partial(import_playlist, file_path=file_path, name=name), parent)
@@ -0,0 +1,107 @@
+from PyQt6.QtCore import QAbstractListModel, QModelIndex, Qt, pyqtSignal
+from src.logic.database import SORT_ORDERS
+from src.logic.tags import format_duration
+from src.ui.query_runner import QueryRunner
+
+
+class LibraryModel(QAbstractListModel):
+    # Pages are read through QueryRunner and appended when they arrive;
+    # a reset drops whatever page of the previous listing is still on its way
+    page_loaded = pyqtSignal()
+
+    PAGE_SIZE = 500
+
+    def __init__(self, queries: QueryRunner, parent=None) -> None:
+        super().__init__(parent)
+        self.queries = queries
+        self.loading = False
+        self._generation = 0
+        self._songs: list[tuple] = []
+        self._details: list[tuple | None] = [] #(album, track, year, duration) per row
+        self._after: tuple | None = None
+        self._exhausted = True
+        self.order = "added"
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        if parent.isValid():
+            return 0
+        return len(self._songs)
+
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        song = self._songs[index.row()]
+        details = self._details[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            if details is None or self.order == "added":
+                return f"{song[1]} - {song[2]}"
+            album, track, year, duration = details
+            if self.order == "album" or self.order == "artist":
+                return f"{album or 'Unknown Album'} · {track or '-'}. {song[1]} - {song[2]}"
+            if self.order == "year":
+                return f"{year or '----'} · {song[1]} - {song[2]}"
+            return f"{format_duration(duration)} · {song[1]} - {song[2]}"
+        if role == Qt.ItemDataRole.ToolTipRole and details is not None:
+            album, track, year, duration = details
+            return f"{album or 'Unknown Album'} ({year or 'unknown year'}), track {track or '-'}, {format_duration(duration)}"
+        if role == Qt.ItemDataRole.UserRole:
+            return song
+        return None
+
+    def canFetchMore(self, parent: QModelIndex) -> bool:
+        return not parent.isValid() and not self._exhausted
+
+    def fetchMore(self, parent: QModelIndex) -> None:
+        if parent.isValid() or self._exhausted or self.loading:
+            return
+
+        # Keyset pagination: continue after the sort key of the last row
+        self.loading = True
+        generation = self._generation
+        self.queries.call(
+            "get_library_page", self.order, self._after, self.PAGE_SIZE, channel="library-page",
+            callback=lambda page: self._on_page(generation, page)
+        )
+
+    def _on_page(self, generation: int, page: list[tuple]) -> None:
+        if generation != self._generation:
+            return
+        self.loading = False
+        if len(page) < self.PAGE_SIZE:
+            self._exhausted = True
+        if page:
+            self._after = page[-1][10:]
+            first = len(self._songs)
+            self.beginInsertRows(QModelIndex(), first, first + len(page) - 1)
+            self._songs.extend(row[:6] for row in page)
+            self._details.extend(row[6:10] for row in page)
+            self.endInsertRows()
+        self.page_loaded.emit()
+
+    def set_order(self, order: str) -> None:
+        if order not in SORT_ORDERS:
+            raise ValueError(f"Unknown order: {order}")
+        self.order = order
+        self.show_library()
+
+    def _reset(self) -> None:
+        self._generation += 1
+        self.loading = False
+
+    def show_library(self) -> None:
+        self._reset()
+        self.beginResetModel()
+        self._songs = []
+        self._details = []
+        self._after = None
+        self._exhausted = False
+        self.endResetModel()
+        self.fetchMore(QModelIndex())
+
+    def show_songs(self, songs: list[tuple]) -> None:
+        self._reset()
+        self.beginResetModel()
+        self._songs = list(songs)
+        self._details = [None] * len(self._songs)
+        self._exhausted = True
+        self.endResetModel()
@@ -1,30 +1,131 @@
 import os
-import random
+import threading
 from PyQt6.QtWidgets import (
     QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
-    QPushButton, QListWidget, QLabel, QFileDialog, QSlider, QMessageBox, 
-    QLineEdit, QInputDialog, QAbstractItemView, QListWidgetItem, QSplitter
+    QPushButton, QListView, QLabel, QFileDialog, QSlider, QMessageBox, 
+    QLineEdit, QInputDialog, QAbstractItemView, QSplitter,
+    QProgressDialog, QComboBox
 )
-from PyQt6.QtCore import Qt
-from PyQt6.QtMultimedia import QMediaPlayer
+from PyQt6.QtCore import Qt, QModelIndex, QTimer, pyqtSignal
+from src.logic import instrumentation, startup
 from src.logic.database import Database
-from src.logic.player import AudioPlayer
-from mutagen.easyid3 import EasyID3
-import json
+from src.logic.play_queue import PlayQueue
+from src.logic.tags import AUDIO_EXTENSIONS, format_duration
+from src.logic.dedupe import DedupeResult, merge_duplicates
+from src.logic.file_cache import FileCache
+from src.logic.loudness import LoudnessResult, gain_factor
+from src.ui.import_worker import (
+    DedupeThread, ImportThread, LibraryThread, LoudnessThread, PlaylistImportThread, ScanThread
+)
+from src.ui.library_model import LibraryModel
+from src.ui.query_runner import QueryRunner
+from src.ui.queue_model import QueueModel
+
+LIBRARY_ORDERS = (
+    ("Recently added", "added"),
+    ("Album", "album"),
+    ("Artist", "artist"),
+    ("Year", "year"),
+    ("Duration", "duration"),
+)
+PREFETCH_AHEAD = 5
+EXPORT_FILTER = "JSON Playlist (*.json);;JSON Lines (*.jsonl);;M3U8 Playlist (*.m3u8)"
+
+
+def _track_gains(database: Database) -> dict[str, float]:
+    return {path: gain_factor(loudness, peak) for path, loudness, peak in database.get_all_loudness()}
+
+
+def _all_playlists(database: Database) -> list[tuple[str, int, bool]]:
+    # (display name, id, is smart) of every playlist
+    playlists = [(name, pid, False) for pid, name in database.get_playlists()]
+    playlists += [(f"⚡ {name}", pid, True) for pid, name, _ in database.get_smart_playlists()]
+    return playlists
+
 
 class MainWindow(QMainWindow):
-    def __init__(self) -> None:
+    file_cached = pyqtSignal(str)
+
+    def __init__(self, db_name: str = "music_player.db", file_cache: FileCache | None = None,
+                 api_port: int | None = None, crossfade_ms: int = 0) -> None:
         super().__init__()
         self.setWindowTitle("Spoopify")
         self.resize(1000, 600)
 
-        self.database = Database()
-        self.player = AudioPlayer()
-
-        self.player.player.mediaStatusChanged.connect(self.on_media_status_changed)
+        self.database = Database(db_name)
+        startup.mark("database opened")
+        self.player = None
+        self.file_cache = file_cache
+        if file_cache is not None:
+            file_cache.on_ready = self.file_cached.emit #Queued to the GUI thread
+            self.file_cached.connect(self._on_file_cached)
+        self.library_thread = None
+        self._painted = False
+        self._gains: dict[str, float] = {} #Per-track loudness gain by path
+        self.api_port = api_port
+        self.crossfade_ms = crossfade_ms
+        self.api_server = None
+        self.queries = QueryRunner(self.database, self)
+        self.queries.failed.connect(self._on_query_failed)
 
         self._setup_ui()
-        self._refresh_library_list() 
+        startup.mark("window built")
+
+    def paintEvent(self, event) -> None:
+        super().paintEvent(event)
+        if self._painted:
+            return
+        self._painted = True
+        startup.mark("first paint")
+        # Audio backend and library load once the first frame is on screen
+        QTimer.singleShot(0, self._finish_startup)
+
+    def _finish_startup(self) -> None:
+        self._init_audio()
+        self.library_model.page_loaded.connect(self._on_first_page)
+        self._refresh_library_list()
+        if self.api_port is not None:
+            self._start_api_server()
+        startup.mark("interactive")
+        threading.Thread(target=self.database.catalog.preload, daemon=True).start()
+        self._load_gains()
+
+    def _on_first_page(self) -> None:
+        self.library_model.page_loaded.disconnect(self._on_first_page)
+        startup.mark("library shown")
+
+    def _init_audio(self) -> None:
+        if self.player is not None:
+            return
+        from src.logic.player import AudioPlayer #Loads QtMultimedia
+
+        self.player = AudioPlayer(self.crossfade_ms)
+        self.player.track_gain = self._track_gain
+        if self.file_cache is not None:
+            self.player.resolve_path = self.file_cache.lookup
+        self.player.set_volume(self.slider_vol.value())
+        self.player.finished.connect(self.play_next)
+        self.player.advanced.connect(self.on_player_advanced)
+        self.player.switched.connect(lambda elapsed_ms: instrumentation.record("player: song switch", elapsed_ms))
+        self.btn_play.clicked.connect(self.player.play)
+        self.btn_pause.clicked.connect(self.player.pause)
+        self.btn_stop.clicked.connect(self.player.stop)
+        self.slider_vol.valueChanged.connect(self.player.set_volume)
+        startup.mark("audio ready")
+
+    def _start_api_server(self) -> None:
+        from src.logic.api_server import ApiServer
+        from src.ui.remote_control import RemoteControl
+
+        remote = RemoteControl(self, self)
+        server = ApiServer(self.database, remote, port=self.api_port)
+        try:
+            server.start()
+        except OSError as e:
+            QMessageBox.warning(self, "Error", f"Could not start the API server on port {self.api_port}: {e}")
+            return
+        remote.server = server
+        self.api_server = server
 
     def _setup_ui(self) -> None:
         central_widget = QWidget()
@@ -37,11 +138,31 @@ class MainWindow(QMainWindow):
         btn_add = QPushButton("➕ Add songs")
         btn_add.clicked.connect(self.add_files)
         
+        btn_add_folder = QPushButton("📁 Add folder")
+        btn_add_folder.clicked.connect(self.add_folder)
+
+        btn_rescan = QPushButton("🔄 Rescan")
+        btn_rescan.clicked.connect(self.rescan_folders)
+
+        btn_dedupe = QPushButton("👯 Duplicates")
+        btn_dedupe.clicked.connect(self.find_duplicates)
+
+        btn_loudness = QPushButton("🔊 Analyze loudness")
+        btn_loudness.clicked.connect(self.analyze_loudness)
+
         btn_stats = QPushButton("📊 Stats")
         btn_stats.clicked.connect(self.show_statistics)
 
         top_layout.addWidget(btn_add)
+        top_layout.addWidget(btn_add_folder)
+        top_layout.addWidget(btn_rescan)
+        top_layout.addWidget(btn_dedupe)
+        top_layout.addWidget(btn_loudness)
         top_layout.addWidget(btn_stats)
+        if instrumentation.is_enabled():
+            btn_diagnostics = QPushButton("🩺 Diagnostics")
+            btn_diagnostics.clicked.connect(self.show_diagnostics)
+            top_layout.addWidget(btn_diagnostics)
         top_layout.addStretch()
         main_layout.addLayout(top_layout)
 
@@ -57,22 +178,43 @@ class MainWindow(QMainWindow):
         self.search_bar = QLineEdit()
         self.search_bar.setPlaceholderText("Search library")
         self.search_bar.textChanged.connect(self.search_music) 
-        left_layout.addWidget(self.search_bar)
 
-        self.library_list = QListWidget()
+        self.sort_box = QComboBox()
+        for label, order in LIBRARY_ORDERS:
+            self.sort_box.addItem(label, order)
+        self.sort_box.currentIndexChanged.connect(self.sort_library)
+
+        search_layout = QHBoxLayout()
+        search_layout.addWidget(self.search_bar)
+        search_layout.addWidget(self.sort_box)
+        left_layout.addLayout(search_layout)
+
+        self.library_model = LibraryModel(self.queries, self)
+        self.library_list = QListView()
+        self.library_list.setModel(self.library_model)
+        self.library_list.setUniformItemSizes(True)
         self.library_list.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
-        self.library_list.itemDoubleClicked.connect(self.add_to_queue_and_play)
+        self.library_list.doubleClicked.connect(self.add_to_queue_and_play)
         left_layout.addWidget(self.library_list)
 
+        queue_btns = QHBoxLayout()
         btn_add_queue = QPushButton("➡️ Add to queue")
         btn_add_queue.clicked.connect(self.add_selection_to_queue)
-        left_layout.addWidget(btn_add_queue)
+        btn_play_next = QPushButton("↪️ Play next")
+        btn_play_next.clicked.connect(self.play_selection_next)
+        btn_radio = QPushButton("📻 Start radio")
+        btn_radio.clicked.connect(self.start_radio)
+        queue_btns.addWidget(btn_add_queue)
+        queue_btns.addWidget(btn_play_next)
+        queue_btns.addWidget(btn_radio)
+        left_layout.addLayout(queue_btns)
 
         #RIGHT
         right_widget = QWidget()
         right_layout = QVBoxLayout(right_widget)
 
-        right_layout.addWidget(QLabel("🎶 Queue"))
+        self.lbl_queue = QLabel("🎶 Queue")
+        right_layout.addWidget(self.lbl_queue)
 
         #PLAYLIST LAYOUT
         playlist_layout = QHBoxLayout()
@@ -82,10 +224,13 @@ class MainWindow(QMainWindow):
         btn_load.clicked.connect(self.load_playlist)
         btn_del = QPushButton("🗑️ Delete")
         btn_del.clicked.connect(self.delete_playlist)
+        btn_smart = QPushButton("⚡ Smart")
+        btn_smart.clicked.connect(self.create_smart_playlist)
         
         playlist_layout.addWidget(btn_save)
         playlist_layout.addWidget(btn_load)
         playlist_layout.addWidget(btn_del)
+        playlist_layout.addWidget(btn_smart)
         right_layout.addLayout(playlist_layout)
 
         file_btns = QHBoxLayout()
@@ -94,15 +239,26 @@ class MainWindow(QMainWindow):
         
         btn_import = QPushButton("⬇️ Import Playlist")
         btn_import.clicked.connect(self.import_playlist_from_file)
+
+        btn_export_all = QPushButton("📦 Export All")
+        btn_export_all.clicked.connect(self.export_all_to_file)
         
         file_btns.addWidget(btn_export)
         file_btns.addWidget(btn_import)
+        file_btns.addWidget(btn_export_all)
         right_layout.addLayout(file_btns)
 
-        self.queue_list = QListWidget()
+        self.queue = PlayQueue()
+        self.queue_model = QueueModel(self.queue, self)
+        self.queue_list = QListView()
+        self.queue_list.setModel(self.queue_model)
+        self.queue_list.setUniformItemSizes(True)
         self.queue_list.setDragDropMode(QAbstractItemView.DragDropMode.InternalMove)
         self.queue_list.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
-        self.queue_list.itemDoubleClicked.connect(self.play_from_queue)
+        self.queue_list.doubleClicked.connect(self.play_from_queue)
+        self.queue_model.rowsInserted.connect(self._update_queue_label)
+        self.queue_model.rowsRemoved.connect(self._update_queue_label)
+        self.queue_model.modelReset.connect(self._update_queue_label)
         right_layout.addWidget(self.queue_list)
 
         btn_clear_q = QPushButton("❌ Remove selected")
@@ -124,26 +280,23 @@ class MainWindow(QMainWindow):
         btn_prev = QPushButton("⏮️")
         btn_prev.clicked.connect(self.play_previous)
 
-        btn_play = QPushButton("▶️")
-        btn_play.clicked.connect(self.player.play)
-
-        btn_pause = QPushButton("⏸️")
-        btn_pause.clicked.connect(self.player.pause)
-        
-        btn_stop = QPushButton("⏹️")
-        btn_stop.clicked.connect(self.player.stop)
+        #Connected in _init_audio
+        self.btn_play = QPushButton("▶️")
+        self.btn_pause = QPushButton("⏸️")
+        self.btn_stop = QPushButton("⏹️")
 
         btn_next = QPushButton("⏭️")
         btn_next.clicked.connect(self.play_next)
 
         btn_shuffle = QPushButton("🔀 Shuffle")
-        btn_shuffle.clicked.connect(self.shuffle_queue)
+        btn_shuffle.setCheckable(True)
+        btn_shuffle.toggled.connect(self.shuffle_queue)
 
         controls_layout.addWidget(btn_shuffle)
         controls_layout.addWidget(btn_prev)
-        controls_layout.addWidget(btn_play)
-        controls_layout.addWidget(btn_pause)
-        controls_layout.addWidget(btn_stop)
+        controls_layout.addWidget(self.btn_play)
+        controls_layout.addWidget(self.btn_pause)
+        controls_layout.addWidget(self.btn_stop)
         controls_layout.addWidget(btn_next)
 
         main_layout.addLayout(controls_layout)
@@ -154,188 +307,391 @@ class MainWindow(QMainWindow):
         self.slider_vol = QSlider(Qt.Orientation.Horizontal)
         self.slider_vol.setRange(0, 100)
         self.slider_vol.setValue(50)
-        self.slider_vol.valueChanged.connect(self.player.set_volume)
         volume_layout.addWidget(lbl_vol)
         volume_layout.addWidget(self.slider_vol)
         main_layout.addLayout(volume_layout)
 
+
+    def closeEvent(self, event) -> None:
+        if self.library_thread is not None:
+            self.library_thread.cancel()
+            self.library_thread.wait()
+        if self.api_server is not None:
+            self.api_server.close()
+        if self.player is not None:
+            self.player.stop()
+        self.queries.close()
+        if self.file_cache is not None:
+            self.file_cache.close()
+        self.database.close()
+        super().closeEvent(event)
     
-    def on_media_status_changed(self, status) -> None:
-        if status == QMediaPlayer.MediaStatus.EndOfMedia:
+    def on_player_advanced(self, path: str) -> None:
+        # The player already started the preloaded song
+        next_row = self.queue.next_row()
+        if next_row is None:
+            return
+        data = self.queue.song_at(next_row)
+        if data[4] != path: #Queue changed since the song was preloaded
             self.play_next()
+            return
+        self.queue_model.set_current(next_row)
+        self._on_song_started(data)
 
     def add_files(self) -> None:
+        if self._library_busy():
+            return
+
         files, _ = QFileDialog.getOpenFileNames(
-            self, "Select Songs", os.path.expanduser("~"), "Audio (*.mp3 *.wav)"
+            self, "Select Songs", os.path.expanduser("~"), f"Audio ({' '.join('*' + extension for extension in AUDIO_EXTENSIONS)})"
         )
         if files:
-            count = 0
-            for file_path in files:
-                filename = os.path.basename(file_path)
-                title = os.path.splitext(filename)[0]
-                artist = "Unknown Artist"
-                genre = "Unknown Genre"
-                try:
-                    audio = EasyID3(file_path)
-                    if 'title' in audio: title = audio['title'][0]
-                    if 'artist' in audio: artist = audio['artist'][0]
-                    if 'genre' in audio: genre = audio['genre'][0]
-                except Exception:
-                    pass
-                self.database.add_song(title, artist, genre, file_path)
-                count += 1
-            
-            self._refresh_library_list()
-            QMessageBox.information(self, "Success", f"Added {count} songs!")
+            self._start_library_thread(ImportThread(self.database, files, self), "Importing songs...", len(files))
+
+    def add_folder(self) -> None:
+        if self._library_busy():
+            return
+
+        folder = QFileDialog.getExistingDirectory(self, "Select music folder", os.path.expanduser("~"))
+        if folder:
+            self._start_library_thread(ScanThread(self.database, folder, self), "Scanning folder...")
+
+    def rescan_folders(self) -> None:
+        if self._library_busy():
+            return
+
+        self.queries.call("get_watch_folders", callback=self._rescan_watch_folders)
+
+    def _rescan_watch_folders(self, folders: list[str]) -> None:
+        if not folders:
+            QMessageBox.information(self, "Info", "No folders added yet.")
+            return
+        if not self._library_busy():
+            self._start_library_thread(ScanThread(self.database, parent=self), "Scanning folders...")
+
+    def _track_gain(self, path: str) -> float:
+        # Called by the player on every load, so it only reads the gains
+        # loaded in the background
+        return self._gains.get(path, 1.0)
+
+    def _load_gains(self) -> None:
+        self.queries.call(_track_gains, channel="gains", callback=self._on_gains_loaded)
+
+    def _on_gains_loaded(self, gains: dict[str, float]) -> None:
+        self._gains = gains
+
+    def analyze_loudness(self) -> None:
+        if self._library_busy():
+            return
+        self._start_library_thread(LoudnessThread(self.database, self), "Analyzing loudness...")
+
+    def find_duplicates(self) -> None:
+        if self._library_busy():
+            return
+        self._start_library_thread(DedupeThread(self.database, self), "Looking for duplicates...")
+
+    def _merge_duplicates(self, result: DedupeResult) -> None:
+        if not result.groups:
+            QMessageBox.information(self, "Duplicates", "No duplicate songs found.")
+            return
+
+        duplicates = sum(len(group) - 1 for group in result.groups)
+        examples = "\n".join(f"{group[0].title} - {group[0].artist} ({len(group)} copies)" for group in result.groups[:10])
+        answer = QMessageBox.question(
+            self, "Duplicates",
+            f"Found {duplicates} duplicate songs:\n{examples}\n\n"
+            "Merge them? Play counts and playlists are kept on the oldest copy."
+        )
+        if answer == QMessageBox.StandardButton.Yes:
+            self.queries.call(merge_duplicates, result.groups, callback=self._on_duplicates_merged)
+
+    def _on_duplicates_merged(self, removed: int) -> None:
+        self._refresh_library_list()
+        QMessageBox.information(self, "Duplicates", f"Merged {removed} songs.")
+
+    def _library_busy(self) -> bool:
+        if self.library_thread is not None:
+            QMessageBox.warning(self, "Busy", "Library is already being updated.")
+            return True
+        return False
+
+    def _start_library_thread(self, thread: LibraryThread, label: str, total: int = 0, on_completed=None) -> None:
+        self.library_progress = QProgressDialog(label, "Cancel", 0, total, self)
+        self.library_progress.setWindowModality(Qt.WindowModality.WindowModal)
+
+        self.library_thread = thread
+        self.library_thread.progress.connect(self._on_library_progress)
+        self.library_thread.completed.connect(on_completed or self._on_library_completed)
+        self.library_thread.failed.connect(self._on_library_failed)
+        self.library_thread.finished.connect(self._on_library_thread_finished)
+        self.library_progress.canceled.connect(self.library_thread.cancel)
+        self.library_thread.start()
+
+    def _on_library_progress(self, done: int, total: int) -> None:
+        self.library_progress.setMaximum(total)
+        self.library_progress.setValue(done)
+
+    def _on_library_completed(self, result) -> None:
+        self.library_progress.close()
+        self._refresh_library_list()
+        if isinstance(result, int):
+            QMessageBox.information(self, "Success", f"Added {result} songs!")
+        elif isinstance(result, DedupeResult):
+            self._merge_duplicates(result)
+        elif isinstance(result, LoudnessResult):
+            message = f"Analyzed {result.analyzed} songs."
+            if result.failed:
+                message += f"\n{result.failed} songs could not be decoded."
+            if result.no_decoder:
+                message += f"\n{result.no_decoder} songs need ffmpeg to be analyzed."
+            self._load_gains()
+            QMessageBox.information(self, "Loudness", message)
+        else:
+            QMessageBox.information(
+                self, "Success",
+                f"Added {result.added}, updated {result.updated} and removed {result.removed} songs."
+            )
+
+    def _on_library_failed(self, message: str) -> None:
+        self.library_progress.close()
+        self._refresh_library_list()
+        QMessageBox.critical(self, "Error", f"Failed to update library: {message}")
+
+    def _on_library_thread_finished(self) -> None:
+        self.library_thread.deleteLater()
+        self.library_thread = None
 
     def _refresh_library_list(self, songs_data: list = None) -> None:
-        self.library_list.clear()
         if songs_data is None:
-            data = self.database.get_all_songs()
+            self.library_model.show_library()
         else:
-            data = songs_data
-        
-        for song in data:
-            text = f"{song[1]} - {song[2]}"
-            item = QListWidgetItem(text)
-            item.setData(Qt.ItemDataRole.UserRole, song)
-            self.library_list.addItem(item)
+            self.library_model.show_songs(songs_data)
+
+    def sort_library(self) -> None:
+        # Sorting applies to the whole library, so the search is dropped
+        self.search_bar.blockSignals(True)
+        self.search_bar.clear()
+        self.search_bar.blockSignals(False)
+        self.queries.cancel_search()
+        self.library_model.set_order(self.sort_box.currentData())
+
+    def _update_queue_label(self) -> None:
+        if not len(self.queue):
+            self.lbl_queue.setText("🎶 Queue")
+            return
+        count = len(self.queue)
+        self.queries.call(
+            "get_total_duration", self.queue.song_ids(), channel="queue-duration",
+            callback=lambda total: self.lbl_queue.setText(f"🎶 Queue · {count} songs · {format_duration(total)}")
+        )
 
     def search_music(self, text: str) -> None:
         if not text:
+            self.queries.cancel_search()
             self._refresh_library_list()
         else:
-            results = self.database.search_songs(text)
-            self._refresh_library_list(results)
+            self.queries.search(text, self._refresh_library_list)
 
-    def add_to_queue_and_play(self, item: QListWidgetItem) -> None:
-        song_data = item.data(Qt.ItemDataRole.UserRole)
-        new_item = self._add_item_to_queue(song_data)
-        self.queue_list.setCurrentItem(new_item)
-        self.play_from_queue()
+    def _on_query_failed(self, message: str) -> None:
+        QMessageBox.warning(self, "Error", f"Query failed: {message}")
+
+    def add_to_queue_and_play(self, index: QModelIndex) -> None:
+        song_data = index.data(Qt.ItemDataRole.UserRole)
+        self.queue_model.append([song_data])
+        self.play_from_queue(self.queue_model.index(len(self.queue) - 1))
+
+    def _selected_library_songs(self) -> list:
+        indexes = sorted(self.library_list.selectionModel().selectedIndexes(), key=lambda i: i.row())
+        return [index.data(Qt.ItemDataRole.UserRole) for index in indexes]
 
     def add_selection_to_queue(self) -> None:
-        items = self.library_list.selectedItems()
-        for item in items:
-            data = item.data(Qt.ItemDataRole.UserRole)
-            self._add_item_to_queue(data)
-
-    def _add_item_to_queue(self, song_data) -> QListWidgetItem:
-        text = f"{song_data[1]} - {song_data[2]}"
-        item = QListWidgetItem(text)
-        item.setData(Qt.ItemDataRole.UserRole, song_data)
-        self.queue_list.addItem(item)
-        return item
-
-    def play_from_queue(self) -> None:
-        item = self.queue_list.currentItem()
-        if item:
-            data = item.data(Qt.ItemDataRole.UserRole) 
-            self.lbl_now_playing.setText(f"Playing: {data[1]} - {data[2]}")
+        self.enqueue(self._selected_library_songs())
+
+    def play_selection_next(self) -> None:
+        self.enqueue(self._selected_library_songs(), after_current=True)
+
+    def enqueue(self, songs: list, after_current: bool = False, play: bool = False) -> None:
+        # Adds songs at the end of the queue or right after the current
+        # song, and optionally starts the first of them
+        first = self.queue.current + 1 if after_current else len(self.queue)
+        if after_current:
+            self.queue_model.insert_next(songs)
+        else:
+            self.queue_model.append(songs)
+        if play and songs:
+            self.play_from_queue(self.queue_model.index(first))
+        else:
+            self._preload_next()
+
+    def start_radio(self) -> None:
+        # Queues the selected song followed by songs picked around it and
+        # starts playing it
+        from src.logic.radio import build_radio
+
+        selected = self._selected_library_songs()
+        if not selected:
+            QMessageBox.information(self, "Radio", "Select a song to start a radio from.")
+            return
+        seed = selected[0]
+
+        def start(songs: list) -> None:
+            if not songs:
+                QMessageBox.information(self, "Radio", "No similar songs found yet.")
+                return
+            first = len(self.queue)
+            self.queue_model.append([seed, *songs])
+            self.play_from_queue(self.queue_model.index(first))
+
+        self.queries.call(build_radio, seed[0], 50, tuple(self.queue.song_ids()), callback=start, channel="radio")
+
+    def play_from_queue(self, index: QModelIndex | None = None) -> None:
+        if index is not None and index.isValid():
+            self.queue_model.set_current(index.row())
+        data = self.queue.current_song()
+        if data:
+            self._init_audio()
             self.player.load_song(data[4])
             self.player.play()
-            self.database.increment_play_count(data[0])
+            self._on_song_started(data)
+
+    def _on_song_started(self, data) -> None:
+        self.lbl_now_playing.setText(f"Playing: {data[1]} - {data[2]}")
+        self.database.increment_play_count(data[0])
+        self._preload_next()
+
+    def _preload_next(self) -> None:
+        next_row = self.queue.next_row()
+        if next_row is not None and self.queue.current >= 0:
+            self.player.preload(self.queue.song_at(next_row)[4])
+        if self.file_cache is not None and len(self.queue):
+            upcoming = range(self.queue.current + 1, self.queue.current + 1 + PREFETCH_AHEAD)
+            self.file_cache.prefetch(self.queue.song_at(row % len(self.queue))[4] for row in upcoming)
+
+    def _on_file_cached(self, path: str) -> None:
+        # The next song was preloaded from its source before the copy was ready
+        next_row = self.queue.next_row()
+        if self.player is not None and next_row is not None and self.queue.current >= 0 \
+                and self.queue.song_at(next_row)[4] == path:
+            self.player.preload(path, reload=True)
 
     def play_next(self) -> None:
-        count = self.queue_list.count()
-        if count == 0: return
+        next_row = self.queue.next_row()
+        if next_row is None: return
 
-        row = self.queue_list.currentRow()
-        if row < count - 1:
-            next_row = row + 1
-        else:
-            next_row = 0
-        
-        self.queue_list.setCurrentRow(next_row)
+        self.queue_model.set_current(next_row)
         self.play_from_queue()
 
     def play_previous(self) -> None:
-        count = self.queue_list.count()
-        if count == 0: return
+        prev_row = self.queue.previous_row()
+        if prev_row is None: return
 
-        row = self.queue_list.currentRow()
-        if row > 0:
-            prev_row = row - 1
-        else:
-            prev_row = count - 1
-        
-        self.queue_list.setCurrentRow(prev_row)
+        self.queue_model.set_current(prev_row)
         self.play_from_queue()
 
-    def shuffle_queue(self) -> None:
-        count = self.queue_list.count()
-        items_data = []
-        for i in range(count):
-            items_data.append(self.queue_list.item(i).data(Qt.ItemDataRole.UserRole))
-        
-        random.shuffle(items_data)
-        
-        self.queue_list.clear()
-        for data in items_data:
-            self._add_item_to_queue(data)
+    def shuffle_queue(self, enabled: bool) -> None:
+        if enabled:
+            self.queue_model.shuffle()
+        else:
+            self.queue_model.unshuffle()
+        self._preload_next()
 
     def remove_from_queue(self) -> None:
-        selected = self.queue_list.selectedItems()
-        for item in selected:
-            self.queue_list.takeItem(self.queue_list.row(item))
+        rows = [index.row() for index in self.queue_list.selectionModel().selectedIndexes()]
+        self.queue_model.remove_rows(rows)
+        self._preload_next()
             
     def save_playlist(self) -> None:
-        count = self.queue_list.count()
-        if count == 0:
+        if len(self.queue) == 0:
             QMessageBox.warning(self, "Error", "Queue is empty!")
             return
 
         name, ok = QInputDialog.getText(self, "Save playlist", "Enter playlist name:")
         if ok and name:
-            song_ids = []
-            for i in range(count):
-                item = self.queue_list.item(i)
-                data = item.data(Qt.ItemDataRole.UserRole)
-                song_ids.append(data[0])
-            
-            if self.database.create_playlist(name, song_ids):
-                QMessageBox.information(self, "Success", f"Saved {name}")
-            else:
-                QMessageBox.warning(self, "Error", "Name already exists.")
+            self.queries.call(
+                "create_playlist", name, self.queue.song_ids(), callback=lambda created: self._on_playlist_saved(name, created)
+            )
+
+    def _on_playlist_saved(self, name: str, created: bool) -> None:
+        if created:
+            QMessageBox.information(self, "Success", f"Saved {name}")
+        else:
+            QMessageBox.warning(self, "Error", "Name already exists.")
+
+    def create_smart_playlist(self) -> None:
+        from src.logic.smart_playlists import SMART_PLAYLIST_HELP, parse_smart_playlist
+
+        name, ok = QInputDialog.getText(self, "Smart playlist", "Enter playlist name:")
+        if not ok or not name:
+            return
+        definition, ok = QInputDialog.getMultiLineText(self, "Smart playlist", SMART_PLAYLIST_HELP, "genre = ")
+        if not ok or not definition.strip():
+            return
+        try:
+            parse_smart_playlist(definition) #Reported here rather than as a failed query
+        except ValueError as e:
+            QMessageBox.warning(self, "Error", str(e))
+            return
+        self.queries.call(
+            "create_smart_playlist", name, definition, callback=lambda created: self._on_playlist_saved(name, created)
+        )
 
     def load_playlist(self) -> None:
-        playlists = self.database.get_playlists()
+        self.queries.call(_all_playlists, callback=self._choose_playlist_to_load)
+
+    def _choose_playlist_to_load(self, playlists: list[tuple[str, int, bool]]) -> None:
         if not playlists:
             QMessageBox.information(self, "Info", "No playlists found.")
             return
 
-        names = [p[1] for p in playlists]
+        names = [p[0] for p in playlists]
         item, ok = QInputDialog.getItem(self, "Load playlist", "Choose:", names, 0, False)
         
         if ok and item:
-            pid = [p[0] for p in playlists if p[1] == item]
-            songs = self.database.get_playlist_songs(pid[0])
-            
-            for s in songs:
-                self._add_item_to_queue(s)
-            
-            QMessageBox.information(self, "Loaded", f"Added {len(songs)} songs to queue.")
+            _, pid, smart = playlists[names.index(item)]
+            query = "get_smart_playlist_songs" if smart else "get_playlist_songs"
+            self.queries.call(query, pid, callback=self._on_playlist_loaded)
+
+    def _on_playlist_loaded(self, songs: list) -> None:
+        self.queue_model.append(songs)
+        self._preload_next()
+        
+        QMessageBox.information(self, "Loaded", f"Added {len(songs)} songs to queue.")
 
     def delete_playlist(self) -> None:
-        playlists = self.database.get_playlists()
+        self.queries.call(_all_playlists, callback=self._choose_playlist_to_delete)
+
+    def _choose_playlist_to_delete(self, playlists: list[tuple[str, int, bool]]) -> None:
         if not playlists: return
 
-        names = [p[1] for p in playlists]
+        names = [p[0] for p in playlists]
         item, ok = QInputDialog.getItem(self, "Delete playlist", "Select:", names, 0, False)
         
         if ok and item:
-            playlist_id = [p[0] for p in playlists if p[1] == item]
-            self.database.delete_playlist(playlist_id[0])
-            QMessageBox.information(self, "Deleted", f"Playlist {item} deleted.")
+            _, playlist_id, smart = playlists[names.index(item)]
+            query = "delete_smart_playlist" if smart else "delete_playlist"
+            self.queries.call(
+                query, playlist_id, callback=lambda _: QMessageBox.information(self, "Deleted", f"Playlist {item} deleted.")
+            )
 
     def show_statistics(self) -> None:
-        report = self.database.get_statistics()
-        QMessageBox.information(self, "Statistics", report)
+        self.queries.call(
+            "get_statistics", callback=lambda report: QMessageBox.information(self, "Statistics", report)
+        )
+
+    def show_diagnostics(self) -> None:
+        from src.ui.diagnostics import DiagnosticsDialog
+
+        DiagnosticsDialog(self, self.queries.queries).exec()
 
     def import_playlist_from_file(self):
+        from src.logic.playlist_import import PLAYLIST_FORMATS
+
+        if self._library_busy():
+            return
+
         file_path, _ = QFileDialog.getOpenFileName(
             self, "Import playlist to database", "", 
-            "JSON Playlist (*.json)"
+            f"Playlists ({' '.join('*' + extension for extension in PLAYLIST_FORMATS)})"
         )
         
         if not file_path:
@@ -351,44 +707,36 @@ class MainWindow(QMainWindow):
         if not ok or not playlist_name:
             return
 
-        song_ids = []
-        missing_count = 0
+        self._start_library_thread(
+            PlaylistImportThread(self.database, file_path, playlist_name, self), "Importing playlist...",
+            on_completed=self._on_playlist_imported
+        )
 
-        try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                
-                for entry in data:
-                    title = entry.get("title", "Unknown")
-                    artist = entry.get("artist", "Unknown")
-                    
-                    local_song = self.database.get_song_by_meta(title, artist)
-                    
-                    if local_song:
-                        song_ids.append(local_song[0])
-                    else:
-                        missing_count += 1
-
-            if not song_ids:
-                QMessageBox.warning(self, "Error", "No matching songs found in your library!")
-                return
+    def _on_playlist_imported(self, result) -> None:
+        self.library_progress.close()
+        if result.cancelled:
+            return
 
-            success = self.database.create_playlist(playlist_name, song_ids)
-            
-            if success:
-                msg = f"Playlist {playlist_name} saved to database with {len(song_ids)} songs."
-                if missing_count > 0:
-                    msg += f"\n{missing_count} songs not found"
-                QMessageBox.information(self, "Success", msg)
-            else:
-                QMessageBox.warning(self, "Error", f"Playlist {playlist_name} already exists!")
+        if result.matched + result.fuzzy == 0:
+            QMessageBox.warning(self, "Error", "No matching songs found in your library!")
+            return
 
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"Failed to import: {e}")
+        if result.created:
+            msg = f"Playlist {', '.join(result.playlists)} saved to database with {result.matched + result.fuzzy} songs."
+            if result.fuzzy > 0:
+                msg += f"\n{result.fuzzy} songs matched approximately"
+            if result.missing > 0:
+                msg += f"\n{result.missing} songs not found"
+            if result.existing:
+                msg += f"\nSkipped existing playlists: {', '.join(result.existing)}"
+            QMessageBox.information(self, "Success", msg)
+        else:
+            QMessageBox.warning(self, "Error", f"Playlist {', '.join(result.existing)} already exists!")
 
     def export_playlist_to_file(self) -> None:
-        playlists = self.database.get_playlists()
-        
+        self.queries.call("get_playlists", callback=self._choose_playlist_to_export)
+
+    def _choose_playlist_to_export(self, playlists: list[tuple]) -> None:
         if not playlists:
             QMessageBox.warning(self, "Info", "No saved playlists to export.")
             return
@@ -398,29 +746,39 @@ class MainWindow(QMainWindow):
         
         if ok and item_name:
             playlist_id = [p[0] for p in playlists if p[1] == item_name][0]
-            
-            songs = self.database.get_playlist_songs(playlist_id)
-            
-            if not songs:
-                QMessageBox.warning(self, "Empty", "This playlist is empty.")
-                return
+            self.queries.call(
+                "get_playlist_size", playlist_id,
+                callback=lambda size: self._export_playlist(item_name, playlist_id, size)
+            )
+
+    def _export_playlist(self, name: str, playlist_id: int, size: int) -> None:
+        if size == 0:
+            QMessageBox.warning(self, "Empty", "This playlist is empty.")
+            return
 
-            default_filename = f"{item_name}.json"
-            file_path, _ = QFileDialog.getSaveFileName(
-                self, "Export Playlist", default_filename, "JSON Playlist (*.json)"
+        file_path, _ = QFileDialog.getSaveFileName(self, "Export Playlist", f"{name}.json", EXPORT_FILTER)
+        if file_path:
+            from src.logic.playlist_export import export_playlist
+
+            self.queries.call(
+                export_playlist, file_path, playlist_id,
+                callback=lambda _: QMessageBox.information(self, "Success", f"Exported {name}!")
             )
 
-            if file_path:
-                export_list = []
-                for song in songs:
-                    export_list.append({
-                        "title": song[1],
-                        "artist": song[2]
-                    })
-                
-                try:
-                    with open(file_path, "w", encoding="utf-8") as f:
-                        json.dump(export_list, f, indent=4, ensure_ascii=False)
-                    QMessageBox.information(self, "Success", f"Exported {item_name} to JSON!")
-                except Exception as e:
-                    QMessageBox.critical(self, "Error", f"Failed to save file: {e}")
\ No newline at end of file
+    def export_all_to_file(self) -> None:
+        choices = ["All playlists", "Whole library"]
+        choice, ok = QInputDialog.getItem(self, "Export", "What to export:", choices, 0, False)
+        if not ok or not choice:
+            return
+
+        default_filename = "playlists.jsonl" if choice == choices[0] else "library.jsonl"
+        file_path, _ = QFileDialog.getSaveFileName(self, "Export", default_filename, EXPORT_FILTER)
+        if not file_path:
+            return
+
+        from src.logic.playlist_export import export_library, export_playlist
+
+        self.queries.call(
+            export_playlist if choice == choices[0] else export_library, file_path,
+            callback=lambda count: QMessageBox.information(self, "Success", f"Exported {count} entries!")
+        )
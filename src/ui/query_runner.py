@@ -0,0 +1,68 @@
+from collections.abc import Callable
+from concurrent.futures import Future
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal
+from src.logic.async_database import AsyncDatabase, QueryCancelled
+from src.logic.database import Database
+
+
+class QueryRunner(QObject):
+    # Qt side of AsyncDatabase: callbacks run on the GUI thread once their
+    # query is done, superseded queries are silently dropped and errors
+    # are reported through `failed`. Search is debounced, so typing only
+    # queries once the text has been still for SEARCH_DELAY_MS.
+    failed = pyqtSignal(str)
+    _delivered = pyqtSignal(object, object)
+
+    SEARCH_DELAY_MS = 150
+
+    def __init__(self, database: Database, parent=None) -> None:
+        super().__init__(parent)
+        self.queries = AsyncDatabase(database)
+        self._delivered.connect(self._on_delivered) #Queued: emitted from worker threads
+        self._search = None
+        self._search_text = None
+        self._search_timer = QTimer(self)
+        self._search_timer.setSingleShot(True)
+        self._search_timer.setInterval(self.SEARCH_DELAY_MS)
+        self._search_timer.timeout.connect(self._run_search)
+
+    def call(self, query, *args, callback: Callable, channel: str | None = None) -> None:
+        future = self.queries.submit(query, *args, channel=channel)
+        future.add_done_callback(lambda done: self._delivered.emit(callback, done))
+
+    def search(self, text: str, callback: Callable) -> None:
+        self._search = (text, callback)
+        self._search_text = text
+        self._search_timer.start()
+
+    def cancel_search(self) -> None:
+        self._search = None
+        self._search_text = None
+        self._search_timer.stop()
+        self.queries.cancel("search")
+
+    def _run_search(self) -> None:
+        if self._search is None:
+            return
+        (text, callback), self._search = self._search, None
+
+        def deliver(results: list) -> None:
+            if text == self._search_text: #Results may arrive after the text changed
+                callback(results)
+
+        self.call("search_songs", text, callback=deliver, channel="search")
+
+    def _on_delivered(self, callback: Callable, future: Future) -> None:
+        if future.cancelled():
+            return
+        error = future.exception()
+        if isinstance(error, QueryCancelled):
+            return
+        if error is not None:
+            self.failed.emit(str(error))
+            return
+        callback(future.result())
+
+    def close(self) -> None:
+        self.cancel_search()
+        self.queries.close()
@@ -0,0 +1,101 @@
+from collections.abc import Iterable
+from PyQt6.QtCore import QAbstractListModel, QModelIndex, Qt
+from PyQt6.QtGui import QFont
+from src.logic.play_queue import PlayQueue
+
+
+class QueueModel(QAbstractListModel):
+    # Every change to the queue goes through this model so attached views
+    # only repaint what changed instead of being rebuilt
+
+    def __init__(self, queue: PlayQueue, parent=None) -> None:
+        super().__init__(parent)
+        self.queue = queue
+        self._bold = QFont()
+        self._bold.setBold(True)
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        if parent.isValid():
+            return 0
+        return len(self.queue)
+
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        if role == Qt.ItemDataRole.DisplayRole:
+            song = self.queue.song_at(index.row())
+            return f"{song[1]} - {song[2]}"
+        if role == Qt.ItemDataRole.UserRole:
+            return self.queue.song_at(index.row())
+        if role == Qt.ItemDataRole.FontRole and index.row() == self.queue.current:
+            return self._bold
+        return None
+
+    def flags(self, index: QModelIndex) -> Qt.ItemFlag:
+        flags = super().flags(index)
+        if index.isValid():
+            return flags | Qt.ItemFlag.ItemIsDragEnabled
+        return flags | Qt.ItemFlag.ItemIsDropEnabled
+
+    def supportedDropActions(self) -> Qt.DropAction:
+        return Qt.DropAction.MoveAction
+
+    def moveRows(self, source_parent: QModelIndex, source_row: int, count: int,
+                 destination_parent: QModelIndex, destination_child: int) -> bool:
+        if source_parent.isValid() or destination_parent.isValid():
+            return False
+        if not self.beginMoveRows(source_parent, source_row, source_row + count - 1,
+                                  destination_parent, destination_child):
+            return False
+        self.queue.move_rows(source_row, count, destination_child)
+        self.endMoveRows()
+        return True
+
+    def set_current(self, row: int) -> None:
+        previous = self.queue.current
+        self.queue.current = row
+        for changed in (previous, row):
+            if 0 <= changed < len(self.queue):
+                index = self.index(changed)
+                self.dataChanged.emit(index, index, [Qt.ItemDataRole.FontRole])
+
+    def append(self, songs: Iterable[tuple]) -> None:
+        songs = list(songs)
+        if not songs:
+            return
+        first = len(self.queue)
+        self.beginInsertRows(QModelIndex(), first, first + len(songs) - 1)
+        self.queue.append(songs)
+        self.endInsertRows()
+
+    def insert_next(self, songs: Iterable[tuple]) -> None:
+        songs = list(songs)
+        if not songs:
+            return
+        first = self.queue.current + 1
+        self.beginInsertRows(QModelIndex(), first, first + len(songs) - 1)
+        self.queue.insert_next(songs)
+        self.endInsertRows()
+
+    def remove_rows(self, rows: Iterable[int]) -> None:
+        rows = sorted(set(rows))
+        if not rows:
+            return
+        if rows[-1] - rows[0] + 1 == len(rows):
+            self.beginRemoveRows(QModelIndex(), rows[0], rows[-1])
+            self.queue.remove_rows(rows)
+            self.endRemoveRows()
+        else:
+            self.beginResetModel()
+            self.queue.remove_rows(rows)
+            self.endResetModel()
+
+    def shuffle(self) -> None:
+        self.beginResetModel()
+        self.queue.shuffle()
+        self.endResetModel()
+
+    def unshuffle(self) -> None:
+        self.beginResetModel()
+        self.queue.unshuffle()
+        self.endResetModel()
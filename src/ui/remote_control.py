@@ -0,0 +1,111 @@
+import time
+from concurrent.futures import Future
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal
+from src.logic.api_server import ApiServer, song_json
+
+
+class RemoteControl(QObject):
+    # Player side of ApiServer. Commands are requested from the server's
+    # thread and run on the GUI thread. state() is served from a snapshot
+    # taken on the GUI thread whenever the player, queue or volume changes,
+    # so polling /player never waits on the GUI; changed snapshots are also
+    # pushed to /events.
+    _requested = pyqtSignal(object, str, tuple)
+
+    def __init__(self, window, parent=None) -> None:
+        super().__init__(parent)
+        self.window = window
+        self.server: ApiServer | None = None
+        self._snapshot = ({}, 0, time.monotonic()) #(state, position ms, taken at)
+        self._requested.connect(self._run) #Queued: emitted from the server thread
+        self._commands = {
+            "play": self._play,
+            "pause": self._pause,
+            "stop": self._stop,
+            "next": window.play_next,
+            "previous": window.play_previous,
+            "volume": window.slider_vol.setValue,
+            "queue": self._queue,
+            "enqueue": window.enqueue,
+        }
+
+        # Many changes come in bursts (advancing sets the row, swaps decks
+        # and starts playing), they are folded into one snapshot
+        self._refresh_timer = QTimer(self)
+        self._refresh_timer.setSingleShot(True)
+        self._refresh_timer.setInterval(0)
+        self._refresh_timer.timeout.connect(self._refresh)
+
+        model = window.queue_model
+        for signal in (model.rowsInserted, model.rowsRemoved, model.rowsMoved, model.modelReset,
+                       model.layoutChanged, model.dataChanged):
+            signal.connect(self._schedule_refresh)
+        window.slider_vol.valueChanged.connect(self._schedule_refresh)
+        window.player.state_changed.connect(self._schedule_refresh)
+        self._refresh()
+
+    def state(self) -> dict:
+        # Thread-safe: the snapshot tuple is replaced, never modified
+        state, position, taken_at = self._snapshot
+        if state.get("state") == "playing":
+            position += int((time.monotonic() - taken_at) * 1000)
+        return {**state, "position_ms": position}
+
+    def call(self, command: str, *args) -> Future:
+        future = Future()
+        self._requested.emit(future, command, args)
+        return future
+
+    def _run(self, future: Future, command: str, args: tuple) -> None:
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            if command not in self._commands:
+                raise ValueError(f"Unknown command: {command}")
+            result = self._commands[command](*args)
+        except Exception as e:
+            future.set_exception(e)
+            return
+        self._refresh() #The reply includes the new state
+        future.set_result(result)
+
+    def _schedule_refresh(self, *_) -> None:
+        self._refresh_timer.start()
+
+    def _refresh(self) -> None:
+        window = self.window
+        song = window.queue.current_song()
+        previous = self._snapshot[0]
+        state = {
+            "state": window.player.state,
+            "song": song_json(song) if song else None,
+            "row": window.queue.current if song else None,
+            "queue_length": len(window.queue),
+            "volume": window.slider_vol.value(),
+        }
+        self._snapshot = (state, window.player.player.position(), time.monotonic())
+        if state != previous and self.server is not None:
+            self.server.publish("player", self.state())
+
+    def _play(self, row: int | None = None) -> None:
+        window = self.window
+        if row is not None:
+            if not 0 <= row < len(window.queue):
+                raise ValueError(f"No row {row} in the queue")
+            window.play_from_queue(window.queue_model.index(row))
+        elif window.player.state == "paused":
+            window.player.play()
+        elif window.player.state == "stopped":
+            if window.queue.current < 0 and len(window.queue):
+                window.play_from_queue(window.queue_model.index(0))
+            else:
+                window.play_from_queue()
+
+    def _pause(self) -> None:
+        self.window.player.pause()
+
+    def _stop(self) -> None:
+        self.window.player.stop()
+
+    def _queue(self) -> tuple[int, list[tuple]]:
+        return self.window.queue.current, list(self.window.queue.songs())
@@ -0,0 +1,15 @@
+import pytest
+from src.logic.database import Database
+
+
+@pytest.fixture
+def database(tmp_path):
+    database = Database(str(tmp_path / "library.db"))
+    yield database
+    database.close()
+
+
+def add_songs(database: Database, count: int, genre: str = "Rock") -> list[int]:
+    # Adds songs "Song i" by "Artist i" at /music/i.mp3 and returns their ids
+    database.add_songs((f"Song {i}", f"Artist {i}", genre, f"/music/{i}.mp3") for i in range(count))
+    return [song[0] for song in database.get_songs_page(limit=1000)]
@@ -0,0 +1,144 @@
+import http.client
+import json
+from concurrent.futures import Future
+import pytest
+from src.logic.api_server import ApiServer
+from tests.conftest import add_songs
+
+
+class FakeController:
+    # Completes every player command right away, as if the GUI had run it
+    def __init__(self):
+        self.calls = []
+        self.volume = 50
+
+    def state(self):
+        return {"state": "stopped", "volume": self.volume}
+
+    def call(self, command, *args):
+        self.calls.append((command, *args))
+        if command == "volume":
+            self.volume = args[0]
+        future = Future()
+        future.set_result((-1, []) if command == "queue" else None)
+        return future
+
+
+@pytest.fixture
+def serve(database):
+    servers = []
+
+    def serve(**kwargs):
+        server = ApiServer(database, port=0, **kwargs)
+        server.start()
+        servers.append(server)
+        return server
+
+    yield serve
+    for server in servers:
+        server.close()
+
+
+def get(server, path, **headers):
+    connection = http.client.HTTPConnection("127.0.0.1", server.port, timeout=5)
+    connection.request("GET", path, headers=headers)
+    return connection.getresponse().status
+
+
+def call(server, method, path, body=None):
+    connection = http.client.HTTPConnection("127.0.0.1", server.port, timeout=5)
+    connection.request(method, path, body=body if body is None or isinstance(body, str) else json.dumps(body))
+    response = connection.getresponse()
+    return response.status, json.loads(response.read())
+
+
+def test_only_local_host_headers_are_accepted(serve):
+    server = serve()
+    assert get(server, "/stats") == 200
+    assert get(server, "/stats", Host="attacker.example") == 403
+    assert get(server, "/stats", Origin="http://attacker.example") == 403
+
+
+def test_remote_hosts_are_an_explicit_opt_in(database, serve):
+    with pytest.raises(ValueError):
+        ApiServer(database, host="0.0.0.0", port=0)
+    server = serve(host="0.0.0.0", allow_remote=True)
+    assert get(server, "/stats", Host="player.lan") == 200
+
+
+def test_close_with_an_open_connection(serve, caplog):
+    server = serve()
+    connection = http.client.HTTPConnection("127.0.0.1", server.port, timeout=5)
+    connection.request("GET", "/stats")
+    assert connection.getresponse().status == 200
+
+    server.close() #The keep-alive connection is still open
+    assert not [record for record in caplog.records if record.name == "asyncio"]
+
+
+def test_library_pages_and_songs(database, serve):
+    song_ids = add_songs(database, 5)
+    server = serve()
+
+    status, first = call(server, "GET", "/songs?limit=2")
+    assert status == 200 and [song["title"] for song in first] == ["Song 0", "Song 1"]
+    _, second = call(server, "GET", f"/songs?limit=2&after={first[-1]['id']}")
+    assert [song["title"] for song in second] == ["Song 2", "Song 3"]
+    assert call(server, "GET", "/songs?q=song%204")[1][0]["id"] == song_ids[4]
+    assert call(server, "GET", f"/songs/{song_ids[1]}") == (200, {
+        "id": song_ids[1], "title": "Song 1", "artist": "Artist 1", "genre": "Rock",
+        "file_path": "/music/1.mp3", "play_count": 0,
+    })
+    assert call(server, "GET", "/songs/999")[0] == 404
+    assert call(server, "GET", "/songs?limit=many")[0] == 400
+
+
+def test_playlist_crud(database, serve):
+    song_ids = add_songs(database, 3)
+    server = serve()
+
+    status, created = call(server, "POST", "/playlists", {"name": "Mix", "song_ids": [song_ids[2], song_ids[0]]})
+    assert status == 200
+    playlist = f"/playlists/{created['id']}"
+    assert [song["title"] for song in call(server, "GET", playlist)[1]] == ["Song 2", "Song 0"]
+    assert call(server, "GET", "/playlists")[1] == [{"id": created["id"], "name": "Mix", "smart": False}]
+
+    assert call(server, "PUT", playlist, {"name": "Renamed", "song_ids": [song_ids[1]]})[0] == 200
+    assert [song["title"] for song in call(server, "GET", playlist)[1]] == ["Song 1"]
+    assert database.get_playlists() == [(created["id"], "Renamed")]
+
+    assert call(server, "DELETE", playlist)[0] == 200
+    assert call(server, "GET", playlist)[0] == 404
+    assert call(server, "DELETE", playlist)[0] == 404
+
+
+def test_error_statuses(database, serve):
+    song_ids = add_songs(database, 1)
+    server = serve()
+    call(server, "POST", "/playlists", {"name": "Mix", "song_ids": song_ids})
+
+    assert call(server, "GET", "/nothing-here")[0] == 404
+    assert call(server, "DELETE", "/songs")[0] == 405
+    assert call(server, "POST", "/playlists", {"name": "Mix", "song_ids": []})[0] == 409
+    assert call(server, "POST", "/playlists", {"name": "Other", "song_ids": [999]})[0] == 400
+    assert call(server, "POST", "/playlists", {"song_ids": []})[0] == 400
+    assert call(server, "POST", "/playlists", "{not json")[0] == 400
+    assert call(server, "POST", "/smart-playlists", {"name": "Bad", "definition": "tempo ~ fast"})[0] == 400
+    assert database.get_playlists()[0][1] == "Mix" and len(database.get_playlists()) == 1
+
+
+def test_player_endpoints(database, serve):
+    song_ids = add_songs(database, 2)
+    assert call(serve(), "GET", "/player")[0] == 503
+
+    controller = FakeController()
+    server = serve(controller=controller)
+    assert call(server, "GET", "/player") == (200, {"state": "stopped", "volume": 50})
+    assert call(server, "PUT", "/player/volume", {"volume": 40}) == (200, {"state": "stopped", "volume": 40})
+    assert call(server, "PUT", "/player/volume", {"volume": 400})[0] == 400
+    assert call(server, "POST", "/player/play", {"row": 1})[0] == 200
+    assert call(server, "POST", "/queue", {"song_ids": song_ids, "next": True}) == (200, {"queued": 2})
+    assert call(server, "GET", "/queue") == (200, {"current": None, "songs": []})
+
+    assert [command[0] for command in controller.calls] == ["volume", "play", "enqueue", "queue"]
+    assert controller.calls[1] == ("play", 1)
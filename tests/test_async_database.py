@@ -0,0 +1,121 @@
+import threading
+import pytest
+from src.logic.async_database import AsyncDatabase, QueryCancelled
+from tests.conftest import add_songs
+
+ENDLESS = "WITH RECURSIVE n(i) AS (SELECT started() UNION ALL SELECT i + 1 FROM n) SELECT COUNT(*) FROM n"
+
+
+@pytest.fixture
+def queries(database):
+    queries = AsyncDatabase(database, workers=1)
+    yield queries
+    queries.close()
+
+
+@pytest.fixture
+def gate():
+    # Holds the single worker until the test opens it
+    gate = threading.Event()
+    yield gate
+    gate.set()
+
+
+def wait_for(gate, result=None):
+    def query(database):
+        assert gate.wait(5)
+        return result
+    return query
+
+
+def endless_read(started):
+    # Signals from inside SQLite, so an interrupt can't arrive before the
+    # statement runs
+    def query(database):
+        with database._connections.read() as conn:
+            conn.create_function("started", 0, lambda: started.set() or 1)
+            return conn.execute(ENDLESS).fetchone()
+    return query
+
+
+def test_identical_queries_are_coalesced(queries, gate, database):
+    add_songs(database, 3)
+    queries.submit(wait_for(gate))
+    first = queries.submit("get_songs_page", 0, 2)
+    second = queries.submit("get_songs_page", 0, 2)
+    unhashable = queries.submit("get_songs", [1, 2])
+    again = queries.submit("get_songs", [1, 2])
+    gate.set()
+
+    assert first is second and unhashable is not again
+    assert [song[1] for song in first.result(5)] == ["Song 0", "Song 1"]
+    assert again.result(5) == unhashable.result(5)
+    assert queries.counters["submitted"] == 5 and queries.counters["coalesced"] == 1
+    assert queries.counters["completed"] == 4
+
+
+def test_new_query_on_a_channel_cancels_the_queued_one(queries, gate):
+    queries.submit(wait_for(gate))
+    old = queries.submit(wait_for(gate, "old"), channel="search")
+    new = queries.submit(wait_for(gate, "new"), channel="search")
+    gate.set()
+
+    assert old.cancelled() and new.result(5) == "new"
+    assert queries.counters["cancelled"] == 1
+
+
+def test_superseded_running_query_is_dropped(queries, gate):
+    running = threading.Event()
+
+    def slow(database):
+        running.set()
+        assert gate.wait(5)
+        return "old"
+
+    old = queries.submit(slow, channel="page")
+    assert running.wait(5)
+    new = queries.submit(wait_for(gate, "new"), channel="page")
+    gate.set()
+
+    with pytest.raises(QueryCancelled):
+        old.result(5)
+    assert new.result(5) == "new"
+    assert queries.counters["dropped"] == 1 and queries.counters["completed"] == 1
+
+
+def test_superseded_read_is_interrupted(queries):
+    started = threading.Event()
+    old = queries.submit(endless_read(started), channel="search")
+    assert started.wait(5)
+    new = queries.submit("get_songs_page", channel="search")
+
+    with pytest.raises(QueryCancelled):
+        old.result(5)
+    assert new.result(5) == []
+    assert queries.counters["interrupted"] == 1
+
+
+def test_cancel_and_errors(queries, gate):
+    queries.submit(wait_for(gate))
+    queued = queries.submit(wait_for(gate), channel="search")
+    queries.cancel("search")
+    failing = queries.submit("no_such_query")
+    gate.set()
+
+    assert queued.cancelled()
+    with pytest.raises(AttributeError):
+        failing.result(5)
+    assert queries.counters["failed"] == 1
+    assert "cancelled 1" in queries.report()
+
+
+def test_close_interrupts_running_reads(database):
+    queries = AsyncDatabase(database, workers=1)
+    started = threading.Event()
+    running = queries.submit(endless_read(started), channel="search")
+    assert started.wait(5)
+
+    queries.close()
+
+    with pytest.raises(QueryCancelled):
+        running.result(0)
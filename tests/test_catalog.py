@@ -0,0 +1,64 @@
+from src.logic.catalog import Song, SongCatalog
+from tests.conftest import add_songs
+
+
+def test_songs_are_compact_tuples(database):
+    song_id = add_songs(database, 1)[0]
+    song = database.get_songs([song_id])[0]
+
+    assert isinstance(song, Song) and not hasattr(song, "__dict__")
+    assert song == (song_id, "Song 0", "Artist 0", "Rock", "/music/0.mp3", 0)
+
+
+def test_writes_update_the_catalog(database):
+    song_ids = add_songs(database, 3)
+    database.catalog.preload()
+
+    database.add_song("New", "Artist", "Jazz", "/music/new.mp3")
+    database.increment_play_count(song_ids[0])
+    database.flush()
+    database.remove_songs_by_path(["/music/1.mp3"])
+
+    titles = [song.title for song in database.get_songs([song_ids[0], song_ids[1], song_ids[2] + 1])]
+    assert titles == ["Song 0", "New"]
+    assert database.get_songs([song_ids[0]])[0].play_count == 1
+
+
+def test_playlists_resolve_in_order(database):
+    song_ids = add_songs(database, 4)
+    database.create_playlist("Mix", [song_ids[2], song_ids[0], song_ids[3]])
+    playlist_id = database.get_playlists()[0][0]
+
+    assert [song.id for song in database.get_playlist_songs(playlist_id)] == [song_ids[2], song_ids[0], song_ids[3]]
+
+
+def test_large_libraries_keep_only_recent_songs(database):
+    song_ids = add_songs(database, 10)
+    catalog = SongCatalog(database._connections, capacity=4)
+
+    assert [song.id for song in catalog.get_many(reversed(song_ids))] == song_ids[::-1]
+    assert len(catalog._songs) == 4
+    assert [song.title for song in catalog.get_many(song_ids[:2])] == ["Song 0", "Song 1"]
+
+
+def test_filter_needs_the_whole_library(database):
+    song_ids = add_songs(database, 10)
+
+    assert [song.id for song in database.catalog.filter(lambda song: song.title.endswith("1"))] == [song_ids[1]]
+    assert len(database.catalog.filter(lambda song: True, limit=3)) == 3
+    assert SongCatalog(database._connections, capacity=4).filter(lambda song: True) is None
+
+
+def test_substring_search_is_served_from_memory(database, monkeypatch):
+    database.add_song("Night Drive", "Synth Club", "Synthwave", "/music/a.mp3")
+    database.add_song("Rock & Roll", "The Band", "Rock", "/music/b.mp3")
+    database.catalog.preload()
+    database.has_fts = False
+
+    def no_reads():
+        raise AssertionError("read from SQLite")
+
+    monkeypatch.setattr(database._connections, "read", no_reads)
+    assert [song.title for song in database.search_songs("& ro")] == ["Rock & Roll"]
+    assert [song.title for song in database.search_songs("synth club")] == ["Night Drive"]
+    assert database.search_songs("zzzz") == []
@@ -0,0 +1,15 @@
+import json
+from src.cli import main
+
+
+def test_non_object_json_entries_are_reported(tmp_path, capsys):
+    path = tmp_path / "list.json"
+    path.write_text(json.dumps(["Song 0", 3]))
+
+    assert main(["--db", str(tmp_path / "library.db"), "playlist-import", str(path)]) == 1
+    assert "must be JSON objects" in capsys.readouterr().err
+
+
+def test_serve_refuses_non_local_host(tmp_path, capsys):
+    assert main(["--db", str(tmp_path / "library.db"), "serve", "--host", "0.0.0.0", "--port", "0"]) == 1
+    assert "allow_remote" in capsys.readouterr().err
@@ -0,0 +1,87 @@
+import sqlite3
+import threading
+import pytest
+from src.logic.connection import ConnectionManager
+
+
+@pytest.fixture
+def connections(tmp_path):
+    connections = ConnectionManager(str(tmp_path / "test.db"), max_readers=2)
+    with connections.transaction() as conn:
+        conn.execute("CREATE TABLE items (value INTEGER)")
+    yield connections
+    connections.close()
+
+
+def values(connections):
+    with connections.read() as conn:
+        return [row[0] for row in conn.execute("SELECT value FROM items ORDER BY value")]
+
+
+def test_nested_transactions_commit_or_roll_back_together(connections):
+    with pytest.raises(ValueError):
+        with connections.transaction() as conn:
+            conn.execute("INSERT INTO items VALUES (1)")
+            with connections.transaction() as inner:
+                inner.execute("INSERT INTO items VALUES (2)")
+                raise ValueError()
+    assert values(connections) == []
+
+    with connections.transaction() as conn:
+        conn.execute("INSERT INTO items VALUES (1)")
+        try:
+            with connections.transaction() as inner: #Joins the outer one, no savepoint
+                inner.execute("INSERT INTO items VALUES (2)")
+                raise ValueError()
+        except ValueError:
+            pass
+        assert values(connections) == [] #Not committed yet
+    assert values(connections) == [1, 2]
+
+
+def test_readers_are_reused_up_to_max_readers(connections):
+    with connections.read() as first:
+        pass
+    with connections.read() as again:
+        assert again is first
+        with pytest.raises(sqlite3.OperationalError):
+            again.execute("INSERT INTO items VALUES (1)") #Read-only
+
+    with connections.read() as a, connections.read() as b, connections.read() as c:
+        assert len({id(a), id(b), id(c)}) == 3
+    assert len(connections._readers) == 2
+
+
+def test_interrupt_aborts_the_read_of_one_thread(connections):
+    started = threading.Event()
+    errors = []
+
+    def slow_read():
+        try:
+            with connections.read() as conn:
+                started.set()
+                conn.execute("WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n) SELECT COUNT(*) FROM n").fetchone()
+        except sqlite3.OperationalError as e:
+            errors.append(str(e))
+
+    assert not connections.interrupt(threading.get_ident())
+    thread = threading.Thread(target=slow_read)
+    thread.start()
+    assert started.wait(5)
+    while thread.is_alive(): #An interrupt before the query starts has no effect
+        connections.interrupt(thread.ident)
+        thread.join(0.01)
+
+    assert errors == ["interrupted"]
+    assert values(connections) == [] #The connection is still usable
+    assert connections._busy == {}
+
+
+def test_closed_manager_refuses_new_work(connections):
+    connections.close()
+    with pytest.raises(sqlite3.ProgrammingError):
+        with connections.read():
+            pass
+    with pytest.raises(sqlite3.ProgrammingError):
+        with connections.transaction():
+            pass
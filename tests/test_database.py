@@ -0,0 +1,16 @@
+from tests.conftest import add_songs
+
+
+def test_add_songs_counts_only_new_songs(database):
+    assert database.add_songs((f"Song {i}", "Artist", "Rock", f"/music/{i}.mp3") for i in range(30)) == 30
+    # Known paths are ignored
+    assert database.add_songs((f"Song {i}", "Artist", "Rock", f"/music/{i}.mp3") for i in range(25, 35)) == 5
+    assert len(database.get_songs_page(limit=1000)) == 35
+
+
+def test_search_finds_added_songs_by_word_prefix(database):
+    add_songs(database, 3)
+    database.add_song("Night Drive", "The Band", "Synthwave", "/music/night.mp3")
+    assert [song[1] for song in database.search_songs("night dri")] == ["Night Drive"]
+    assert [song[1] for song in database.search_songs("synth")] == ["Night Drive"]
+    assert database.search_songs("zzzz") == []
@@ -0,0 +1,66 @@
+from datetime import date
+from src.logic.database import Database
+from src.logic.dedupe import merge_duplicates
+from tests.conftest import add_songs
+
+
+def build_library(database, merged):
+    # Songs 0-2 plus, unless merged, song 3: a copy of song 2 that the
+    # playlists and plays use in place of song 2. Merging it has to leave
+    # the same state as a library where song 2 was used all along.
+    song_ids = add_songs(database, 3 if merged else 4)
+    a, b, keep = song_ids[:3]
+    copy = keep if merged else song_ids[3]
+    database.create_playlist("One", [a, copy, b, keep])
+    database.create_playlist("Two", [copy, a])
+    database.record_plays([(a, 1000), (copy, 1100), (b, 1200), (copy, 1300), (keep, 1400)])
+    return song_ids
+
+
+def affinity(database, song_ids):
+    neighbors = database.get_neighbors(song_ids[:3])
+    return {song_id: sorted((b, round(weight, 9)) for b, weight in row) for song_id, row in neighbors.items()}
+
+
+def test_merge_moves_plays_playlists_and_affinity_to_the_kept_song(database, tmp_path):
+    song_ids = build_library(database, merged=False)
+    database.save_content_hashes([(song_ids[2], b"same"), (song_ids[3], b"same")])
+
+    groups = database.get_duplicate_groups()
+    assert [[song.id for song in group] for group in groups] == [song_ids[2:]]
+    assert merge_duplicates(database, groups) == 1
+
+    expected = Database(str(tmp_path / "expected.db"))
+    try:
+        build_library(expected, merged=True)
+        for name in ("One", "Two"):
+            playlist_id = next(pid for pid, playlist in database.get_playlists() if playlist == name)
+            expected_id = next(pid for pid, playlist in expected.get_playlists() if playlist == name)
+            assert [song.id for song in database.get_playlist_songs(playlist_id)] == \
+                [song.id for song in expected.get_playlist_songs(expected_id)]
+        assert sorted(database.get_top_songs()) == sorted(expected.get_top_songs()) == [
+            ("Song 0", "Artist 0", 1), ("Song 1", "Artist 1", 1), ("Song 2", "Artist 2", 3)
+        ]
+        since = date(1970, 1, 1)
+        assert sorted(database.get_top_songs(since=since)) == sorted(expected.get_top_songs(since=since))
+        assert affinity(database, song_ids) == affinity(expected, song_ids)
+        assert affinity(database, song_ids)[song_ids[2]] != []
+
+        # Affinity goes back to nothing once the playlists are gone
+        for db in (database, expected):
+            for playlist_id, _ in db.get_playlists():
+                db.delete_playlist(playlist_id)
+        assert affinity(database, song_ids) == affinity(expected, song_ids)
+    finally:
+        expected.close()
+
+
+def test_merged_paths_are_remembered_as_aliases(database):
+    song_ids = add_songs(database, 3)
+    database.save_content_hashes([(song_id, b"same") for song_id in song_ids])
+
+    assert merge_duplicates(database, database.get_duplicate_groups()) == 2
+
+    assert [song[0] for song in database.get_songs_page()] == song_ids[:1]
+    assert database.get_aliases("/music") == {"/music/1.mp3", "/music/2.mp3"}
+    assert database.get_songs(song_ids) == database.get_songs(song_ids[:1])
@@ -0,0 +1,102 @@
+import os
+import pytest
+from src.logic import file_cache
+from src.logic.file_cache import FileCache
+
+
+@pytest.fixture
+def sources(tmp_path):
+    directory = tmp_path / "music"
+    directory.mkdir()
+    paths = []
+    for i in range(3):
+        path = directory / f"{i}.mp3"
+        path.write_bytes(bytes([i]) * 1000)
+        paths.append(str(path))
+    return paths
+
+
+@pytest.fixture
+def open_cache(tmp_path):
+    caches = []
+
+    def open_cache(max_bytes=1024 * 1024):
+        cache = FileCache(str(tmp_path / "cache"), max_bytes)
+        caches.append(cache)
+        return cache
+
+    yield open_cache
+    for cache in caches:
+        cache.close()
+
+
+def test_prefetched_copies_are_used(open_cache, sources):
+    cache = open_cache()
+    assert cache.lookup(sources[0]) == sources[0]
+
+    cache.prefetch(sources)
+    assert cache.wait(5)
+
+    for path in sources:
+        cached = cache.lookup(path)
+        assert cached != path and open(cached, "rb").read() == open(path, "rb").read()
+
+
+def test_lookup_never_reads_the_source_or_hashes(open_cache, sources, monkeypatch):
+    cache = open_cache()
+    cache.prefetch(sources[:1])
+    assert cache.wait(5)
+    cache.close()
+
+    cache = open_cache() #Next session: the copy isn't verified yet
+    monkeypatch.setattr(os, "stat", lambda *args, **kwargs: pytest.fail("stat on lookup"))
+    monkeypatch.setattr(file_cache, "_file_digest", lambda path: pytest.fail("hash on lookup"))
+    assert cache.lookup(sources[0]) == sources[0]
+
+
+def test_earlier_copies_are_verified_in_the_background(open_cache, sources):
+    cache = open_cache()
+    cache.prefetch(sources[:2])
+    assert cache.wait(5)
+    cache.close()
+
+    cache = open_cache()
+    corrupted = os.path.join(cache.directory, FileCache.cached_name(sources[1]))
+    with open(corrupted, "r+b") as f:
+        f.write(b"x")
+    ready = []
+    cache.on_ready = ready.append
+    cache.prefetch(sources[:2])
+    assert cache.wait(5)
+
+    assert cache.lookup(sources[0]) != sources[0]
+    assert cache.lookup(sources[1]) != sources[1] #Copied again
+    assert open(cache.lookup(sources[1]), "rb").read() == open(sources[1], "rb").read()
+    assert sorted(ready) == sources[:2]
+
+
+def test_changed_source_is_copied_again_when_it_reenters_the_window(open_cache, sources):
+    cache = open_cache()
+    cache.prefetch(sources[:1])
+    assert cache.wait(5)
+    cache.prefetch([])
+
+    with open(sources[0], "wb") as f:
+        f.write(b"changed")
+    cache.prefetch(sources[:1])
+    assert cache.wait(5)
+
+    assert open(cache.lookup(sources[0]), "rb").read() == b"changed"
+
+
+def test_least_recently_used_copies_are_evicted(open_cache, sources):
+    cache = open_cache(max_bytes=2000)
+    cache.prefetch(sources[:2])
+    assert cache.wait(5)
+    cache.lookup(sources[0]) #sources[1] is now the least recently used
+
+    cache.prefetch(sources[2:])
+    assert cache.wait(5)
+
+    assert cache.contains(sources[0]) and cache.contains(sources[2])
+    assert not cache.contains(sources[1])
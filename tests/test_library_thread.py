@@ -0,0 +1,32 @@
+from src.ui.import_worker import LibraryThread
+
+
+def run(thread):
+    # run() on the calling thread, so the signals are delivered right away
+    results = []
+    thread.completed.connect(lambda result: results.append(("completed", result)))
+    thread.failed.connect(lambda message: results.append(("failed", message)))
+    thread.run()
+    return results
+
+
+def test_work_gets_the_database_progress_and_cancellation(database):
+    progress = []
+
+    def work(database, progress, is_cancelled):
+        progress(1, 2)
+        return (database, is_cancelled())
+
+    thread = LibraryThread(database, work)
+    thread.progress.connect(lambda done, total: progress.append((done, total)))
+    thread.cancel()
+
+    assert run(thread) == [("completed", (database, True))]
+    assert progress == [(1, 2)]
+
+
+def test_errors_are_reported(database):
+    def work(database, progress, is_cancelled):
+        raise OSError("disk gone")
+
+    assert run(LibraryThread(database, work)) == [("failed", "disk gone")]
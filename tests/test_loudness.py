@@ -0,0 +1,60 @@
+import math
+import sqlite3
+import struct
+import wave
+import pytest
+from src.logic import migrations
+from src.logic.database import Database
+from src.logic.loudness import analyze_library, gain_factor
+
+
+def write_sine(path, amplitude, seconds=1.0, rate=48000):
+    frames = b"".join(
+        struct.pack("<h", int(amplitude * 32767 * math.sin(2 * math.pi * 1000 * i / rate)))
+        for i in range(int(seconds * rate))
+    )
+    with wave.open(str(path), "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(rate)
+        f.writeframes(frames)
+
+
+@pytest.fixture
+def library(database, tmp_path):
+    write_sine(tmp_path / "loud.wav", 0.5)
+    write_sine(tmp_path / "quiet.wav", 0.05)
+    (tmp_path / "song.mp3").write_bytes(b"\xff\xfb" + bytes(1000))
+    database.add_songs((name, "Artist", "Rock", str(tmp_path / name)) for name in ("loud.wav", "quiet.wav", "song.mp3"))
+    return database
+
+
+def test_songs_are_analyzed_once(library, tmp_path, monkeypatch):
+    monkeypatch.setenv("PATH", str(tmp_path)) #No ffmpeg
+    result = analyze_library(library, workers=1)
+    assert (result.analyzed, result.failed, result.no_decoder) == (2, 0, 1)
+
+    gains = {path.rpartition("/")[2]: gain_factor(loudness, peak) for path, loudness, peak in library.get_all_loudness()}
+    assert set(gains) == {"loud.wav", "quiet.wav"}
+    assert gains["quiet.wav"] == pytest.approx(10 * gains["loud.wav"], rel=0.01)
+
+    # Only the song that needs ffmpeg is tried again
+    assert analyze_library(library, workers=1).no_decoder == 1
+    assert analyze_library(library, workers=1).analyzed == 0
+
+
+def test_failures_stored_by_older_versions_are_retried(tmp_path):
+    path = str(tmp_path / "library.db")
+    Database(path).close()
+    conn = sqlite3.connect(path)
+    conn.execute("INSERT INTO songs (title, artist, genre, file_path) VALUES ('A', 'B', 'C', '/a.mp3')")
+    conn.execute("INSERT INTO song_loudness VALUES (1, 10, 20, NULL, NULL)")
+    conn.execute(f"PRAGMA user_version = {migrations.SCHEMA_VERSION - 1}")
+    conn.commit()
+    conn.close()
+
+    database = Database(path)
+    try:
+        assert database.get_loudness_state() == [(1, "/a.mp3", None, None)]
+    finally:
+        database.close()
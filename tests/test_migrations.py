@@ -0,0 +1,103 @@
+import sqlite3
+import pytest
+from src.logic import migrations
+from src.logic.database import Database
+
+# Schema written by the release before migrations existed
+BASELINE_SCHEMA = """
+CREATE TABLE songs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    title TEXT NOT NULL,
+    artist TEXT,
+    genre TEXT,
+    file_path TEXT NOT NULL UNIQUE,
+    play_count INTEGER DEFAULT 0
+);
+CREATE TABLE playlists (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE playlist_songs (
+    playlist_id INTEGER,
+    song_id INTEGER,
+    FOREIGN KEY(playlist_id) REFERENCES playlists(id),
+    FOREIGN KEY(song_id) REFERENCES songs(id)
+);
+"""
+
+
+@pytest.fixture
+def baseline_db(tmp_path):
+    path = str(tmp_path / "baseline.db")
+    conn = sqlite3.connect(path)
+    conn.executescript(BASELINE_SCHEMA)
+    conn.executemany(
+        "INSERT INTO songs (title, artist, genre, file_path, play_count) VALUES (?, ?, ?, ?, ?)",
+        [("Night Drive", "Neon", "Synth", "/music/1.mp3", 4),
+         ("Morning", "Sun", "Folk", "/music/2.mp3", 0),
+         ("Evening", "Moon", "Folk", "/music/3.mp3", 2)]
+    )
+    conn.execute("INSERT INTO playlists (name) VALUES ('Mix')")
+    # Insertion order is the playlist order; song 9 and playlist 5 don't exist
+    conn.executemany("INSERT INTO playlist_songs VALUES (?, ?)", [(1, 3), (1, 9), (1, 1), (5, 2), (1, 2)])
+    conn.commit()
+    conn.close()
+    return path
+
+
+def user_version(path):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("PRAGMA user_version").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_baseline_database_is_migrated(baseline_db):
+    database = Database(baseline_db)
+    try:
+        assert user_version(baseline_db) == migrations.SCHEMA_VERSION
+        assert [song[1] for song in database.get_songs([1, 2, 3])] == ["Night Drive", "Morning", "Evening"]
+        assert [song[4] for song in database.get_playlist_songs(1)] == ["/music/3.mp3", "/music/1.mp3", "/music/2.mp3"]
+        assert [song[1] for song in database.search_songs("night")] == ["Night Drive"]
+    finally:
+        database.close()
+
+    database = Database(baseline_db) #Already up to date
+    try:
+        assert database.get_playlist_size(1) == 3
+    finally:
+        database.close()
+
+
+def test_failed_step_keeps_the_previous_version(baseline_db, monkeypatch):
+    def broken(conn):
+        conn.execute("CREATE TABLE half_done (id INTEGER)")
+        raise sqlite3.OperationalError("broken step")
+
+    monkeypatch.setattr(migrations, "MIGRATIONS", migrations.MIGRATIONS[:2] + (broken,))
+    monkeypatch.setattr(migrations, "SCHEMA_VERSION", 3)
+    with pytest.raises(sqlite3.OperationalError, match="broken step"):
+        Database(baseline_db)
+
+    assert user_version(baseline_db) == 0
+    conn = sqlite3.connect(baseline_db)
+    try:
+        assert conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'half_done'").fetchone() is None
+        assert conn.execute("SELECT COUNT(*) FROM playlist_songs").fetchone()[0] == 5
+    finally:
+        conn.close()
+
+
+def test_removing_songs_and_playlists_cascades(database):
+    database.add_songs([("A", "X", "Rock", "/music/a.mp3"), ("B", "X", "Rock", "/music/b.mp3")])
+    song_ids = [song[0] for song in database.get_songs_page()]
+    database.create_playlist("One", song_ids)
+    database.create_playlist("Two", song_ids)
+    one, two = (playlist_id for playlist_id, _ in sorted(database.get_playlists()))
+
+    database.remove_songs_by_path(["/music/a.mp3"])
+    database.delete_playlist(one)
+
+    assert [song[1] for song in database.get_playlist_songs(two)] == ["B"]
+    assert database.get_playlist_size(one) == 0
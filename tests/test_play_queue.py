@@ -0,0 +1,121 @@
+import random
+from src.logic.play_queue import PlayQueue
+
+
+def songs(*ids):
+    return [(i, f"Song {i}", "Artist", "Rock", f"/music/{i}.mp3", 0) for i in ids]
+
+
+def make_queue(count=5, current=-1):
+    queue = PlayQueue()
+    queue.append(songs(*range(count)))
+    queue.current = current
+    return queue
+
+
+def check(queue):
+    # Play order is a permutation of the queued songs, and it is the
+    # queued order itself outside shuffle mode
+    assert sorted(queue._order) == list(range(len(queue._ids)))
+    if not queue.shuffled:
+        assert queue._order == list(range(len(queue._ids)))
+    assert -1 <= queue.current < max(len(queue), 1)
+    assert set(queue._songs) == set(queue._ids)
+
+
+def test_navigation_wraps_around():
+    queue = make_queue(3)
+    assert queue.current_song() is None
+    assert queue.next_row() == 0
+    queue.current = 2
+    assert (queue.next_row(), queue.previous_row()) == (0, 1)
+    queue.current = 0
+    assert queue.previous_row() == 2
+    assert PlayQueue().next_row() is None
+
+
+def test_insert_next_plays_after_the_current_song():
+    queue = make_queue(4, current=1)
+    assert queue.insert_next(songs(10, 11)) == (2, 2)
+    assert queue.song_ids() == [0, 1, 10, 11, 2, 3]
+    assert queue.current_song()[0] == 1
+    check(queue)
+
+
+def test_removing_rows_keeps_the_current_song_or_the_one_before_it():
+    queue = make_queue(6, current=3)
+    queue.remove_rows([0, 5])
+    assert queue.song_ids() == [1, 2, 3, 4]
+    assert queue.current_song()[0] == 3
+    check(queue)
+
+    queue.remove_rows([2]) #The current song itself: next plays what followed it
+    assert queue.current_song()[0] == 2
+    assert queue.song_at(queue.next_row())[0] == 4
+    check(queue)
+
+
+def test_moving_rows_keeps_the_current_song():
+    queue = make_queue(5, current=1)
+    queue.move_rows(0, 2, 4) #Rows 0-1 go before row 4
+    assert queue.song_ids() == [2, 3, 0, 1, 4]
+    assert queue.current_song()[0] == 1
+    queue.move_rows(3, 1, 0)
+    assert queue.song_ids() == [1, 2, 3, 0, 4]
+    assert queue.current == 0
+    check(queue)
+
+
+def test_shuffle_puts_the_current_song_first_and_unshuffle_restores_the_order():
+    random.seed(1)
+    queue = make_queue(50, current=20)
+    queue.shuffle()
+    assert queue.current == 0 and queue.current_song()[0] == 20
+    assert sorted(queue.song_ids()) == list(range(50))
+    check(queue)
+
+    queue.unshuffle()
+    assert queue.song_ids() == list(range(50))
+    assert queue.current_song()[0] == 20
+    check(queue)
+
+
+def test_same_song_can_be_queued_twice():
+    queue = make_queue(2)
+    queue.append(songs(0))
+    queue.remove_rows([0])
+    assert queue.song_ids() == [1, 0]
+    check(queue)
+
+
+def test_random_edits_keep_the_invariants():
+    rng = random.Random(7)
+    queue = make_queue(20, current=5)
+    next_id = 20
+    for _ in range(500):
+        action = rng.randrange(6)
+        if action == 0:
+            queue.append(songs(next_id))
+            next_id += 1
+        elif action == 1:
+            queue.insert_next(songs(next_id, next_id + 1))
+            next_id += 2
+        elif action == 2 and len(queue) > 1:
+            queue.remove_rows(rng.sample(range(len(queue)), rng.randint(1, 2)))
+        elif action == 3 and len(queue) > 1:
+            source = rng.randrange(len(queue))
+            count = rng.randint(1, max(1, len(queue) - source - 1))
+            destination = rng.choice([row for row in range(len(queue) + 1)
+                                      if not source <= row <= source + count])
+            before = queue.current_song()
+            queue.move_rows(source, count, destination)
+            assert queue.current_song() == before
+        elif action == 4:
+            before = queue.current_song()
+            queue.shuffle()
+            assert queue.current_song() == before
+        else:
+            before = queue.current_song()
+            queue.unshuffle()
+            assert queue.current_song() == before
+        check(queue)
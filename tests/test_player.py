@@ -0,0 +1,203 @@
+import importlib
+import sys
+import types
+import pytest
+from PyQt6.QtCore import QCoreApplication, QObject, QUrl, pyqtSignal
+
+
+class FakeMediaPlayer(QObject):
+    # Scripted stand-in for QMediaPlayer: no audio device or decoding, the
+    # tests move the position and end the media themselves
+    class MediaStatus:
+        LoadedMedia = "loaded"
+        EndOfMedia = "end"
+
+    class PlaybackState:
+        StoppedState = "stopped"
+        PlayingState = "playing"
+        PausedState = "paused"
+
+    mediaStatusChanged = pyqtSignal(object)
+    positionChanged = pyqtSignal(int)
+    playbackStateChanged = pyqtSignal(object)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.url = QUrl()
+        self.output = None
+        self.state = self.PlaybackState.StoppedState
+
+    def setAudioOutput(self, output):
+        self.output = output
+
+    def setSource(self, url):
+        self.url = url
+        self.mediaStatusChanged.emit(self.MediaStatus.LoadedMedia)
+
+    def source(self):
+        return self.url
+
+    def duration(self):
+        return 10000
+
+    def playbackState(self):
+        return self.state
+
+    def _set_state(self, state):
+        self.state = state
+        self.playbackStateChanged.emit(state)
+
+    def play(self):
+        self._set_state(self.PlaybackState.PlayingState)
+
+    def pause(self):
+        self._set_state(self.PlaybackState.PausedState)
+
+    def stop(self):
+        self._set_state(self.PlaybackState.StoppedState)
+
+
+class FakeAudioOutput(QObject):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.level = 1.0
+
+    def setVolume(self, volume):
+        self.level = volume
+
+    def volume(self):
+        return self.level
+
+
+@pytest.fixture
+def player_module(monkeypatch):
+    QCoreApplication.instance() or QCoreApplication([])
+    multimedia = types.ModuleType("PyQt6.QtMultimedia")
+    multimedia.QMediaPlayer = FakeMediaPlayer
+    multimedia.QAudioOutput = FakeAudioOutput
+    monkeypatch.setitem(sys.modules, "PyQt6.QtMultimedia", multimedia)
+    monkeypatch.delitem(sys.modules, "src.logic.player", raising=False)
+    yield importlib.import_module("src.logic.player")
+    sys.modules.pop("src.logic.player", None)
+
+
+def test_preloaded_song_is_swapped_in_at_end_of_media(player_module):
+    player = player_module.AudioPlayer()
+    advanced = []
+    player.advanced.connect(advanced.append)
+    player.load_song("/music/a.mp3")
+    player.play()
+    player.preload("/music/b.mp3")
+    first = player.player
+    standby = next(deck for deck, _ in player._decks if deck is not first)
+    assert standby.source().toLocalFile() == "/music/b.mp3"
+
+    first.mediaStatusChanged.emit(FakeMediaPlayer.MediaStatus.EndOfMedia)
+
+    assert advanced == ["/music/b.mp3"]
+    assert player.player is standby and player.current_path == "/music/b.mp3"
+    assert standby.playbackState() == FakeMediaPlayer.PlaybackState.PlayingState
+    assert first.playbackState() == FakeMediaPlayer.PlaybackState.StoppedState
+    assert first.source().isEmpty()
+
+
+def test_end_of_media_without_preload_finishes(player_module):
+    player = player_module.AudioPlayer()
+    finished = []
+    player.finished.connect(lambda: finished.append(True))
+    player.load_song("/music/a.mp3")
+    player.play()
+
+    player.player.mediaStatusChanged.emit(FakeMediaPlayer.MediaStatus.EndOfMedia)
+
+    assert finished == [True] and player.current_path == "/music/a.mp3"
+
+
+def test_loading_the_preloaded_song_swaps_instead_of_opening(player_module):
+    player = player_module.AudioPlayer()
+    player.load_song("/music/a.mp3")
+    player.preload("/music/b.mp3")
+    first = player.player
+
+    player.load_song("/music/b.mp3")
+
+    assert player.player is not first
+    assert player.player.source().toLocalFile() == "/music/b.mp3"
+    assert first.source().isEmpty()
+
+
+def test_switch_latency_is_reported_once_audio_starts(player_module):
+    player = player_module.AudioPlayer()
+    switched = []
+    player.switched.connect(switched.append)
+    player.load_song("/music/a.mp3")
+    player.play()
+
+    player.player.positionChanged.emit(0)
+    assert switched == []
+    player.player.positionChanged.emit(40)
+    player.player.positionChanged.emit(80)
+    assert len(switched) == 1 and switched[0] >= 0
+
+
+def test_gains_scale_the_volume_of_each_deck(player_module):
+    player = player_module.AudioPlayer()
+    player.track_gain = {"/music/a.mp3": 0.5, "/music/b.mp3": 1.5}.get
+    player.set_volume(40)
+    player.load_song("/music/a.mp3")
+    assert player.audio_output.volume() == pytest.approx(0.2)
+
+    player.preload("/music/b.mp3")
+    player.player.mediaStatusChanged.emit(FakeMediaPlayer.MediaStatus.EndOfMedia)
+    assert player.audio_output.volume() == pytest.approx(0.6)
+
+
+def test_crossfade_overlaps_the_decks(player_module):
+    player = player_module.AudioPlayer(crossfade_ms=2000)
+    advanced = []
+    player.advanced.connect(advanced.append)
+    player.load_song("/music/a.mp3")
+    player.play()
+    player.preload("/music/b.mp3")
+    first, first_output = player.player, player.audio_output
+
+    first.positionChanged.emit(7000) #3 s left: not fading yet
+    assert advanced == []
+    first.positionChanged.emit(8000)
+
+    assert advanced == ["/music/b.mp3"]
+    second, second_output = player.player, player.audio_output
+    assert second is not first
+    assert second.playbackState() == FakeMediaPlayer.PlaybackState.PlayingState
+    assert first.playbackState() == FakeMediaPlayer.PlaybackState.PlayingState #Still fading out
+    assert second_output.volume() == 0.0
+
+    player._fade_started -= 1.0 #Halfway
+    player._fade_step()
+    assert second_output.volume() == pytest.approx(0.25, abs=0.02)
+    assert first_output.volume() == pytest.approx(0.25, abs=0.02)
+
+    player.preload("/music/c.mp3") #The standby deck is still fading out
+    assert first.source().toLocalFile() == "/music/a.mp3"
+
+    player._fade_started -= 1.0
+    player._fade_step()
+    assert second_output.volume() == pytest.approx(0.5)
+    assert first.playbackState() == FakeMediaPlayer.PlaybackState.StoppedState
+    assert first.source().toLocalFile() == "/music/c.mp3"
+    assert not player._fade_timer.isActive()
+
+
+def test_pausing_during_a_crossfade_stops_the_fading_deck(player_module):
+    player = player_module.AudioPlayer(crossfade_ms=2000)
+    player.load_song("/music/a.mp3")
+    player.play()
+    player.preload("/music/b.mp3")
+    first = player.player
+    first.positionChanged.emit(9000)
+
+    player.pause()
+
+    assert first.playbackState() == FakeMediaPlayer.PlaybackState.StoppedState
+    assert player.state == "paused"
+    assert player.audio_output.volume() == pytest.approx(0.5)
@@ -0,0 +1,66 @@
+import json
+import pytest
+from src.logic.playlist_export import export_playlist
+from src.logic.playlist_import import import_playlist, read_playlist_entries
+from tests.conftest import add_songs
+
+
+@pytest.fixture
+def library(database):
+    song_ids = add_songs(database, 6)
+    database.create_playlist("Morning", song_ids[:3])
+    database.create_playlist("Evening", song_ids[3:])
+    return database
+
+
+def playlist_songs(database, name):
+    playlist_id = next(pid for pid, playlist_name in database.get_playlists() if playlist_name == name)
+    return [song[1] for song in database.get_playlist_songs(playlist_id)]
+
+
+@pytest.mark.parametrize("extension", [".json", ".jsonl", ".m3u8"])
+def test_exported_playlist_imports_back(library, tmp_path, extension):
+    morning = next(pid for pid, name in library.get_playlists() if name == "Morning")
+    path = str(tmp_path / f"morning{extension}")
+    assert export_playlist(library, path, morning) == 3
+
+    result = import_playlist(library, path, "Morning again")
+
+    assert (result.created, result.matched, result.missing) == (True, 3, 0)
+    assert playlist_songs(library, "Morning again") == ["Song 0", "Song 1", "Song 2"]
+
+
+@pytest.mark.parametrize("extension", [".json", ".jsonl", ".m3u8"])
+def test_all_playlists_export_imports_as_separate_playlists(library, tmp_path, extension):
+    path = str(tmp_path / f"all{extension}")
+    export_playlist(library, path)
+    for playlist_id, _ in library.get_playlists():
+        library.delete_playlist(playlist_id)
+
+    result = import_playlist(library, path, "Unused")
+
+    assert sorted(result.playlists) == ["Evening", "Morning"]
+    assert playlist_songs(library, "Evening") == ["Song 3", "Song 4", "Song 5"]
+
+
+def test_existing_playlists_are_skipped(library, tmp_path):
+    path = str(tmp_path / "all.jsonl")
+    export_playlist(library, path)
+    library.delete_playlist(next(pid for pid, name in library.get_playlists() if name == "Evening"))
+
+    result = import_playlist(library, path, "Unused")
+
+    assert (result.playlists, result.existing) == (["Evening"], ["Morning"])
+
+
+def test_json_entries_must_be_objects(database, tmp_path):
+    path = tmp_path / "list.json"
+    path.write_text(json.dumps([{"title": "Song 0"}, "Song 1"]))
+
+    with pytest.raises(ValueError):
+        list(read_playlist_entries(str(path)))
+
+
+def test_unsupported_format(tmp_path):
+    with pytest.raises(ValueError):
+        read_playlist_entries(str(tmp_path / "list.txt"))
@@ -0,0 +1,104 @@
+import json
+import pytest
+from src.logic import playlist_import
+from src.logic.playlist_import import PlaylistEntry, import_playlist, read_playlist_entries
+from tests.conftest import add_songs
+
+
+@pytest.fixture
+def library(database):
+    add_songs(database, 6)
+    database.add_song("Halo", "Beyoncé", "Pop", "/music/halo.mp3")
+    return database
+
+
+def playlist_songs(database, name):
+    playlist_id = next(pid for pid, playlist_name in database.get_playlists() if playlist_name == name)
+    return [song[1] for song in database.get_playlist_songs(playlist_id)]
+
+
+def test_matching_by_path_then_title_and_artist(library, tmp_path):
+    path = tmp_path / "mix.json"
+    path.write_text(json.dumps([
+        {"title": "Renamed", "artist": "Nobody", "file_path": "/music/4.mp3"},
+        {"title": "song 1", "artist": "ARTIST 1"},
+        {"title": "Song 2"},
+        {"title": "Sogn 3", "artist": "Artist 3"},
+        {"title": "Missing", "artist": "Nobody"},
+    ]), encoding="utf-8")
+
+    result = import_playlist(library, str(path), "Mix")
+
+    assert (result.matched, result.fuzzy, result.missing) == (3, 1, 1)
+    assert playlist_songs(library, "Mix") == ["Song 4", "Song 1", "Song 2", "Song 3"]
+
+
+def test_exact_import_skips_fuzzy_matches(library, tmp_path):
+    path = tmp_path / "mix.m3u"
+    path.write_text("#EXTM3U\n#EXTINF:-1,Artist 3 - Sogn 3\n/elsewhere/3.mp3\n", encoding="utf-8")
+
+    result = import_playlist(library, str(path), "Mix", fuzzy=False)
+
+    assert (result.created, result.missing) == (False, 1)
+
+
+def test_match_keys_ignore_case_accents_and_punctuation(library):
+    ids = library.match_songs([("HALO!", "beyonce", None), ("song-0", "Artist 0.", None), ("Song 9", None, None)])
+    assert [song[1] for song in library.get_songs(ids[:2])] == ["Halo", "Song 0"]
+    assert ids[2] is None
+
+
+def test_m3u_and_xspf_locations(tmp_path):
+    m3u = tmp_path / "list.m3u8"
+    m3u.write_text("#EXTM3U\n#EXTINF:200,Artist 1 - Song 1\nsub/1.mp3\n#EXTINF:100,Untitled\n/abs/2.mp3\n", encoding="utf-8")
+    xspf = tmp_path / "list.xspf"
+    xspf.write_text(
+        '<?xml version="1.0"?><playlist version="1" xmlns="http://xspf.org/ns/0/"><trackList>'
+        "<track><location>file:///music/a%20b.mp3</location><title>A B</title><creator>X</creator></track>"
+        "<track><title>Only title</title></track>"
+        "</trackList></playlist>", encoding="utf-8")
+
+    assert list(read_playlist_entries(str(m3u))) == [
+        PlaylistEntry("Song 1", "Artist 1", str(tmp_path / "sub" / "1.mp3")),
+        PlaylistEntry("Untitled", None, "/abs/2.mp3"),
+    ]
+    assert list(read_playlist_entries(str(xspf))) == [
+        PlaylistEntry("A B", "X", "/music/a b.mp3"),
+        PlaylistEntry("Only title", None, None),
+    ]
+
+
+def test_large_json_is_streamed_in_chunks(library, tmp_path, monkeypatch):
+    monkeypatch.setattr(playlist_import, "READ_CHUNK", 64) #Entries straddle reads
+    path = tmp_path / "big.json"
+    entries = [{"title": f"Song {i % 6}", "artist": f"Artist {i % 6}"} for i in range(1000)]
+    path.write_text(json.dumps(entries, indent=1), encoding="utf-8")
+
+    assert len(list(read_playlist_entries(str(path)))) == 1000
+    result = import_playlist(library, str(path), "Big", chunk_size=128, fuzzy=False)
+
+    assert (result.matched, result.missing) == (1000, 0)
+    assert playlist_songs(library, "Big")[:7] == ["Song 0", "Song 1", "Song 2", "Song 3", "Song 4", "Song 5", "Song 0"]
+
+
+def test_fuzzy_fallback_is_bounded_on_mostly_unknown_files(database, tmp_path, monkeypatch):
+    add_songs(database, 2000)
+    searches = []
+    search_songs = database.search_songs
+    monkeypatch.setattr(database, "search_songs", lambda text, limit: searches.append(text) or search_songs(text, limit))
+    monkeypatch.setattr(playlist_import, "FUZZY_MAX_ENTRIES", 500)
+    path = tmp_path / "big.jsonl"
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(20000):
+            if i % 10 == 0: #Typos of a few known songs, repeated
+                entry = {"title": f"Sogn {i % 50}", "artist": f"Artist {i % 50}"}
+            else:
+                entry = {"title": f"Unknown {i}", "artist": f"Artist {i % 100}"}
+            f.write(json.dumps(entry) + "\n")
+
+    result = import_playlist(database, str(path), "Big")
+
+    assert (result.matched, result.fuzzy, result.missing) == (0, 2000, 18000)
+    assert len(searches) == len(set(searches)) #Every title and artist searched once
+    assert len(searches) <= 500 + 100
+    assert playlist_songs(database, "Big")[:3] == ["Song 0", "Song 10", "Song 20"]
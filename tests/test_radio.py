@@ -0,0 +1,48 @@
+import pytest
+from src.logic import radio
+from src.logic.radio import build_radio
+
+
+@pytest.fixture
+def library(database):
+    # Seed "S" with one playlist neighbour "A", "B" two steps away through
+    # A, "C" by the same artist, two more rock songs and an unrelated one
+    songs = [
+        ("S", "Band", "Rock"), ("A", "Other", "Jazz"), ("B", "Other", "Jazz"), ("C", "Band", "Pop"),
+        ("D", "Third", "Rock"), ("Popular", "Fourth", "Rock"), ("E", "Fifth", "Blues"),
+    ]
+    database.add_songs((title, artist, genre, f"/music/{title}.mp3") for title, artist, genre in songs)
+    ids = {song[1]: song[0] for song in database.get_songs_page()}
+    database.create_playlist("One", [ids["S"], ids["A"]])
+    database.create_playlist("Two", [ids["A"], ids["B"]])
+    database.record_plays([(ids["Popular"], 100), (ids["Popular"], 5000)])
+    return ids
+
+
+def titles(songs):
+    return [song.title for song in songs]
+
+
+def test_candidates_are_ranked_by_affinity_then_similarity(database, library, monkeypatch):
+    monkeypatch.setattr(radio, "TEMPERATURE", 1e-6) #Sampling no longer reorders
+
+    assert titles(build_radio(database, library["S"], random_seed=0)) == ["A", "B", "C", "Popular", "D"]
+    assert titles(build_radio(database, library["S"], length=2, random_seed=0)) == ["A", "B"]
+
+
+def test_seed_and_excluded_songs_are_left_out(database, library):
+    for random_seed in range(20):
+        songs = titles(build_radio(database, library["S"], exclude=[library["A"], library["C"]], random_seed=random_seed))
+        assert sorted(songs) == ["B", "D", "Popular"]
+
+
+def test_sampling_is_reproducible_with_a_random_seed(database, library):
+    orders = {tuple(titles(build_radio(database, library["S"], random_seed=seed))) for seed in range(20)}
+
+    assert len(orders) > 1
+    assert titles(build_radio(database, library["S"], random_seed=7)) == \
+        titles(build_radio(database, library["S"], random_seed=7))
+
+
+def test_song_without_neighbours_or_similar_songs(database, library):
+    assert build_radio(database, library["E"], random_seed=0) == []
@@ -0,0 +1,21 @@
+from src.logic.scanner import scan_folder
+
+
+def test_scan_adds_every_supported_format(database, tmp_path):
+    for name in ("a.flac", "b.ogg", "c.m4a", "d.MP3", "e.wav", "notes.txt"):
+        (tmp_path / name).write_bytes(b"not really audio")
+
+    result = scan_folder(database, str(tmp_path))
+
+    assert result.added == 5
+    paths = sorted(song[4] for song in database.get_songs_page(limit=1000))
+    assert [path.rsplit("/", 1)[1] for path in paths] == ["a.flac", "b.ogg", "c.m4a", "d.MP3", "e.wav"]
+
+
+def test_rescan_of_unchanged_folder_adds_nothing(database, tmp_path):
+    (tmp_path / "a.flac").write_bytes(b"not really audio")
+    scan_folder(database, str(tmp_path))
+
+    result = scan_folder(database, str(tmp_path))
+
+    assert (result.added, result.unchanged) == (0, 1)
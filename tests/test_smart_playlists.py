@@ -0,0 +1,85 @@
+import operator
+import sqlite3
+import time
+from datetime import datetime, timedelta
+import pytest
+from src.logic.smart_playlists import Rule, _days_since, compile_playlist, parse_smart_playlist
+from tests.conftest import add_songs
+
+OPERATORS = {"=": operator.eq, "!=": operator.ne, "<": operator.lt, "<=": operator.le, ">": operator.gt, ">=": operator.ge}
+
+
+def test_parse_rules_and_options():
+    playlist = parse_smart_playlist("# Heavy rotation\nGenre = Rock\nplays >= 5\n\nMATCH any\norder plays\nlimit 20\n")
+    assert playlist.rules == (Rule("genre", "=", "Rock"), Rule("plays", ">=", 5))
+    assert (playlist.match_all, playlist.order, playlist.limit) == (False, "plays", 20)
+
+
+@pytest.mark.parametrize("definition", [
+    "",
+    "tempo > 100",
+    "genre > Rock",
+    "plays >= five",
+    "genre = Rock\norder random",
+    "genre = Rock\nlimit 0",
+])
+def test_invalid_definitions_are_rejected(definition):
+    with pytest.raises(ValueError):
+        parse_smart_playlist(definition)
+
+
+def test_values_are_bound_not_spliced():
+    hostile = "Rock') OR 1=1; DROP TABLE songs; --"
+    compiled = compile_playlist(parse_smart_playlist(f"genre = {hostile}\nartist != The Beatles!\nlimit 5"))
+
+    assert hostile not in compiled.sql and "Beatles" not in compiled.sql
+    assert compiled.sql.count("?") == len(compiled.params)
+    assert compiled.params == (hostile, "the beatles", 5)
+    assert compiled.columns == ("album", "artist_key", "genre", "track")
+
+
+def test_any_rule_matches():
+    compiled = compile_playlist(parse_smart_playlist("genre = Jazz\nyear < 1970\nmatch any"))
+    assert "(genre = ?) OR (year < ?)" in compiled.sql
+
+
+@pytest.mark.parametrize("op", list(OPERATORS))
+@pytest.mark.parametrize("days", [0, 1, 3])
+def test_days_since_counts_calendar_days(op, days):
+    now = datetime.now().replace(hour=12, minute=0, second=0, microsecond=0)
+    midnight = now.replace(hour=0)
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE t (ago INTEGER, at INTEGER)")
+    for ago in range(6):
+        for hour in (0, 23):
+            conn.execute("INSERT INTO t VALUES (?, ?)", (ago, int((midnight - timedelta(days=ago, hours=-hour)).timestamp())))
+
+    condition, params = _days_since("at", op, days, now.timestamp())
+    found = {row[0] for row in conn.execute(f"SELECT ago FROM t WHERE {condition}", params)}
+
+    assert found == {ago for ago in range(6) if OPERATORS[op](ago, days)}
+
+
+def test_results_are_cached_until_a_rule_column_changes(database):
+    rock = add_songs(database, 3)
+    database.add_song("Blue", "Miles", "Jazz", "/music/blue.mp3")
+    database.create_smart_playlist("Rock", "genre = Rock\norder added")
+    playlist_id = database.get_smart_playlists()[0][0]
+
+    def stale():
+        conn = sqlite3.connect(database.db_name)
+        try:
+            return conn.execute("SELECT stale FROM smart_playlists WHERE id = ?", (playlist_id,)).fetchone()[0]
+        finally:
+            conn.close()
+
+    assert [song[0] for song in database.get_smart_playlist_songs(playlist_id)] == rock[::-1]
+    assert stale() == 0
+    database.increment_play_count(rock[0], time.time())
+    database.flush()
+    assert stale() == 0 #play_count isn't one of its columns
+
+    database.remove_songs_by_path(["/music/1.mp3"])
+    assert stale() == 1
+    assert [song[0] for song in database.get_smart_playlist_songs(playlist_id)] == [rock[2], rock[0]]
+    assert stale() == 0
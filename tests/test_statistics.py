@@ -0,0 +1,59 @@
+import sqlite3
+import time
+from datetime import date, timedelta
+from src.logic.database import Database
+from tests.conftest import add_songs
+from tests.test_migrations import BASELINE_SCHEMA
+
+DAY = 24 * 60 * 60
+
+
+def play(database, song_id, times, days_ago=0):
+    for _ in range(times):
+        database.increment_play_count(song_id, time.time() - days_ago * DAY)
+
+
+def test_top_lists_follow_the_play_log(database):
+    rock = add_songs(database, 2)
+    database.add_song("Song J", "Artist J", "Jazz", "/music/j.mp3")
+    jazz = database.get_songs_page(after_id=rock[-1])[0][0]
+    play(database, rock[0], 2)
+    play(database, rock[1], 1)
+    play(database, jazz, 4)
+
+    assert database.get_top_songs(2) == [("Song J", "Artist J", 4), ("Song 0", "Artist 0", 2)]
+    assert database.get_top_artists() == [("Artist J", 4), ("Artist 0", 2), ("Artist 1", 1)]
+    assert database.get_top_genres() == [("Jazz", 4), ("Rock", 3)]
+    assert database.get_songs([rock[0]])[0].play_count == 2
+
+
+def test_windowed_top_lists_skip_older_plays(database):
+    old, new = add_songs(database, 2)
+    play(database, old, 5, days_ago=40)
+    play(database, new, 1)
+    week = date.today() - timedelta(days=7)
+
+    assert database.get_top_songs(since=week) == [("Song 1", "Artist 1", 1)]
+    assert database.get_top_artists(since=week) == [("Artist 1", 1)]
+    assert database.get_top_artists()[0] == ("Artist 0", 5)
+
+
+def test_statistics_without_plays(database):
+    add_songs(database, 2)
+    assert "Top songs:\nno data" in database.get_statistics()
+
+
+def test_counts_from_before_the_play_log_seed_the_totals(tmp_path):
+    path = str(tmp_path / "baseline.db")
+    conn = sqlite3.connect(path)
+    conn.executescript(BASELINE_SCHEMA)
+    conn.execute("INSERT INTO songs (title, artist, genre, file_path, play_count) VALUES ('Old', 'Band', 'Rock', '/a.mp3', 7)")
+    conn.commit()
+    conn.close()
+
+    database = Database(path)
+    try:
+        assert database.get_top_artists() == [("Band", 7)]
+        assert database.get_top_artists(since=date.today()) == []
+    finally:
+        database.close()
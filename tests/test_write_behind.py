@@ -0,0 +1,74 @@
+import threading
+import pytest
+from src.logic.write_behind import WriteBehindQueue
+from tests.conftest import add_songs
+
+
+def test_flush_writes_pending_items_in_one_batch():
+    batches = []
+    queue = WriteBehindQueue(batches.append, max_items=100, max_delay=60)
+    for i in range(3):
+        queue.put(i)
+    queue.flush()
+    assert batches == [[0, 1, 2]]
+    assert queue.pending() == 0
+    queue.close()
+
+
+def test_full_batch_is_written_by_the_background_thread():
+    written = threading.Event()
+    batches = []
+
+    def write(items):
+        batches.append(items)
+        written.set()
+
+    queue = WriteBehindQueue(write, max_items=2, max_delay=60)
+    queue.put("a")
+    queue.put("b")
+    assert written.wait(5)
+    assert batches == [["a", "b"]]
+    queue.close()
+
+
+def test_close_writes_the_rest_and_rejects_new_items():
+    batches = []
+    queue = WriteBehindQueue(batches.append, max_items=100, max_delay=60)
+    queue.put(1)
+    queue.close()
+    assert batches == [[1]]
+    with pytest.raises(RuntimeError):
+        queue.put(2)
+    queue.close() #Closing twice is harmless
+
+
+def test_failed_batch_is_kept_for_the_next_flush():
+    calls = []
+
+    def write(items):
+        calls.append(list(items))
+        if len(calls) == 1:
+            raise OSError("disk busy")
+
+    queue = WriteBehindQueue(write, max_items=100, max_delay=60)
+    queue.put(1)
+    with pytest.raises(OSError):
+        queue.flush()
+    assert queue.pending() == 1
+    queue.put(2)
+    queue.flush()
+    assert calls == [[1], [1, 2]]
+    queue.close()
+
+
+def test_buffered_play_of_removed_song_is_dropped(database):
+    # A song removed (e.g. by a rescan) before its play is flushed must not
+    # make the whole batch fail on the plays foreign key
+    removed, kept = add_songs(database, 2)
+    database.increment_play_count(removed)
+    database.remove_songs_by_path(["/music/0.mp3"])
+    database.increment_play_count(kept)
+
+    assert "Song 1 - Artist 1 (1 times streamed)" in database.get_statistics()
+    assert database.get_songs([kept])[0].play_count == 1
+    database.close() #Must not raise either